@@ -15,16 +15,17 @@ import argparse
 import asyncio
 import logging
 import sys
-from datetime import datetime, timedelta
-from pathlib import Path
+from datetime import date, datetime, timedelta
 from zoneinfo import ZoneInfo
 
 sys.stdout.reconfigure(encoding="utf-8", errors="replace")
-sys.path.insert(0, str(Path(__file__).parent))
 
 KST = ZoneInfo("Asia/Seoul")
 
-from config.settings import Settings
+# 동시에 분류할 날짜 수
+DATE_CONCURRENCY = 3
+
+from config.settings import BASE_DIR, get_settings
 from db.database import Database
 from db.migrations import run_migrations
 from db.repository import Repository
@@ -32,27 +33,17 @@ from src.analyzer import StockAnalyzer
 from src.classifier import ThemeClassifier
 from src.collector import MessageCollector
 from src.reporter import ReportGenerator
+from utils.log_utils import setup_queued_logging
 from utils.rate_limiter import RateLimiter
 from utils.stock_registry import StockRegistry
 
 
 def setup_logging():
-    log_dir = Path(__file__).parent / "logs"
+    log_dir = BASE_DIR / "logs"
     log_dir.mkdir(exist_ok=True)
-
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s [%(name)s] %(levelname)s: %(message)s",
-        handlers=[
-            logging.StreamHandler(),
-            logging.FileHandler(
-                log_dir / f"backfill_{datetime.now(KST).strftime('%Y%m%d_%H%M')}.log",
-                encoding="utf-8",
-            ),
-        ],
+    setup_queued_logging(
+        log_dir / f"backfill_{datetime.now(KST).strftime('%Y%m%d_%H%M')}.log"
     )
-    logging.getLogger("telethon").setLevel(logging.WARNING)
-    logging.getLogger("httpx").setLevel(logging.WARNING)
 
 
 async def main(dates: list[str], skip_collect: bool, lookback_hours: int):
@@ -62,20 +53,25 @@ async def main(dates: list[str], skip_collect: bool, lookback_hours: int):
     logger.info(f"Backfill 시작: {dates[0]} ~ {dates[-1]} ({len(dates)}일)")
     logger.info(f"skip_collect: {skip_collect}")
 
-    settings = Settings()
+    settings = get_settings()
     settings.lookback_hours = lookback_hours
+    # backfill은 같은 시스템 프롬프트로 장시간 호출 → 1시간 캐시
+    settings.claude_cache_ttl = "1h"
 
     settings.image_dir.mkdir(parents=True, exist_ok=True)
     settings.export_dir.mkdir(parents=True, exist_ok=True)
     settings.db_path.parent.mkdir(parents=True, exist_ok=True)
 
-    db = Database(settings.db_path)
+    db = Database(settings.db_path, settings.db_synchronous)
     await db.initialize()
     await run_migrations(db)
     repo = Repository(db)
 
     rate_limiter = RateLimiter()
     rate_limiter.add_bucket("claude", rate=settings.claude_rpm / 60, capacity=5)
+    rate_limiter.add_bucket(
+        "claude_tokens", rate=settings.claude_tpm / 60, capacity=settings.claude_tpm
+    )
     rate_limiter.add_bucket("telegram", rate=0.5, capacity=5)
 
     registry = StockRegistry(repo)
@@ -91,7 +87,7 @@ async def main(dates: list[str], skip_collect: bool, lookback_hours: int):
             logger.info("=" * 60)
             collector = MessageCollector(settings, repo)
             await collector.initialize()
-            stats = await collector.collect_all_channels()
+            stats = await collector.collect_all_channels(full_scan=True)
             logger.info(
                 f"수집 완료: {stats['total_messages']}메시지 / "
                 f"{stats['total_channels']}채널"
@@ -113,34 +109,44 @@ async def main(dates: list[str], skip_collect: bool, lookback_hours: int):
             f"종목 {analysis['stocks_extracted']}개"
         )
 
-        # ── Step 3~4: 날짜별 분류 + 리포트 ──
+        # ── Step 3: 날짜별 분류 (동시 실행, Claude RPM은 RateLimiter가 제한) ──
+        logger.info("=" * 60)
+        logger.info(f"STEP 3: 날짜별 분류 ({len(dates)}일, 동시 {DATE_CONCURRENCY}개)")
+        logger.info("=" * 60)
         classifier = ThemeClassifier(settings, repo, rate_limiter)
         reporter = ReportGenerator(settings, repo)
+        mentions_by_date = await repo.get_daily_stock_mentions_range(dates[0], dates[-1])
+        sem = asyncio.Semaphore(DATE_CONCURRENCY)
 
-        results = []
-
-        for report_date in dates:
-            logger.info("=" * 60)
-            logger.info(f"STEP 3-4: [{report_date}] 분류 + 리포트")
-            logger.info("=" * 60)
-
-            mentions = await repo.get_daily_stock_mentions(report_date)
+        async def _classify_date(report_date: str) -> dict | None:
+            mentions = mentions_by_date.get(report_date)
             if not mentions:
                 logger.info(f"[{report_date}] 종목 언급 없음 → 건너뜀")
+                return None
+            async with sem:
+                logger.info(f"[{report_date}] 종목 {len(mentions)}개 → 분류")
+                return await classifier.classify_daily(report_date)
+
+        classifications = await asyncio.gather(*(_classify_date(d) for d in dates))
+
+        # ── Step 4: 리포트 (히스토리/강도 CSV 누적 순서 보장을 위해 날짜순) ──
+        results = []
+
+        for report_date, classification in zip(dates, classifications):
+            if classification is None:
                 results.append((report_date, 0, 0, 0, 0))
                 continue
 
-            logger.info(f"[{report_date}] 종목 {len(mentions)}개 → 분류")
-            classification = await classifier.classify_daily(report_date)
-
+            logger.info(f"STEP 4: [{report_date}] 리포트")
             message, csv_path = await reporter.generate_daily_report(
                 report_date, classification
             )
 
-            kr_themes = len(classification.get("kr", {}))
-            us_themes = len(classification.get("us", {}))
-            total_kr = sum(len(v) for v in classification.get("kr", {}).values())
-            total_us = sum(len(v) for v in classification.get("us", {}).values())
+            kr = classification.get("kr", {})
+            us = classification.get("us", {})
+            kr_themes, us_themes = len(kr), len(us)
+            total_kr = sum(map(len, kr.values()))
+            total_us = sum(map(len, us.values()))
 
             results.append((report_date, kr_themes, total_kr, us_themes, total_us))
             logger.info(
@@ -154,8 +160,8 @@ async def main(dates: list[str], skip_collect: bool, lookback_hours: int):
         print(f"{'=' * 55}")
         print(f"  {'날짜':<12} {'KR테마':>6} {'KR종목':>6} {'US테마':>6} {'US종목':>6}")
         print(f"  {'-' * 48}")
-        for date, kr_t, kr_s, us_t, us_s in results:
-            print(f"  {date:<12} {kr_t:>6} {kr_s:>6} {us_t:>6} {us_s:>6}")
+        for day, kr_t, kr_s, us_t, us_s in results:
+            print(f"  {day:<12} {kr_t:>6} {kr_s:>6} {us_t:>6} {us_s:>6}")
         print(f"{'=' * 55}")
 
     finally:
@@ -187,18 +193,15 @@ if __name__ == "__main__":
         start = today - timedelta(days=args.days)
         end = today - timedelta(days=1)
     else:
-        start = datetime.strptime(args.from_date, "%Y-%m-%d").date()
+        start = date.fromisoformat(args.from_date)
         end = (
-            datetime.strptime(args.to_date, "%Y-%m-%d").date()
+            date.fromisoformat(args.to_date)
             if args.to_date
             else today - timedelta(days=1)
         )
 
-    dates = []
-    d = start
-    while d <= end:
-        dates.append(d.strftime("%Y-%m-%d"))
-        d += timedelta(days=1)
+    n_days = (end - start).days + 1
+    dates = [(start + timedelta(days=i)).isoformat() for i in range(n_days)]
 
     if not dates:
         print("backfill할 날짜가 없습니다.")
@@ -1,67 +1,68 @@
 """DB 현황 확인"""
 import asyncio
 import sys
-from pathlib import Path
 
 sys.stdout.reconfigure(encoding="utf-8", errors="replace")
-sys.path.insert(0, str(Path(__file__).parent))
 
+from config.settings import get_settings
 from db.database import Database
-from config.settings import Settings
-
-
-async def check():
-    s = Settings()
-    db = Database(s.db_path)
-    await db.initialize()
-    conn = await db.get_connection()
 
+QUERIES = {
     # Total messages
-    cur = await conn.execute("SELECT COUNT(*) FROM messages")
-    total = (await cur.fetchone())[0]
-    print(f"DB 전체 메시지: {total}건")
-
+    "total": "SELECT COUNT(*) FROM messages",
     # Messages by date
-    cur = await conn.execute(
-        "SELECT DATE(message_date) as d, COUNT(*) as c "
+    "by_date": (
+        "SELECT message_day as d, COUNT(*) as c "
         "FROM messages GROUP BY d ORDER BY d DESC LIMIT 5"
-    )
-    rows = await cur.fetchall()
-    for r in rows:
-        print(f"  {r[0]}: {r[1]}건")
-
+    ),
     # Stock mentions
-    cur = await conn.execute("SELECT COUNT(*) FROM stock_mentions")
-    sm = (await cur.fetchone())[0]
-    print(f"\n종목 멘션: {sm}건")
-
+    "mentions": "SELECT COUNT(*) FROM stock_mentions",
     # Mentions by date
-    cur = await conn.execute(
-        "SELECT DATE(m.message_date) as d, COUNT(DISTINCT sm.stock_name) "
+    "mentions_by_date": (
+        "SELECT m.message_day as d, COUNT(DISTINCT sm.stock_id) "
         "FROM stock_mentions sm JOIN messages m ON sm.message_id = m.id "
         "GROUP BY d ORDER BY d DESC LIMIT 5"
-    )
-    rows = await cur.fetchall()
-    for r in rows:
-        print(f"  {r[0]}: {r[1]}개 종목")
-
+    ),
     # Daily stock themes
-    cur = await conn.execute(
+    "themes": (
         "SELECT report_date, COUNT(*) FROM daily_stock_themes "
         "GROUP BY report_date ORDER BY report_date DESC LIMIT 5"
-    )
-    rows = await cur.fetchall()
+    ),
+    # Channels
+    "channels": "SELECT username, is_active FROM channels",
+}
+
+
+async def _fetch(db: Database, sql: str) -> list:
+    """읽기 전용 커넥션 풀에서 조회 (WAL 스냅샷에서 병렬 스캔)."""
+    async with db.acquire_read() as conn:
+        return await conn.execute_fetchall(sql)
+
+
+async def check():
+    s = get_settings()
+    db = Database(s.db_path)
+    await db.initialize()
+
+    results = await asyncio.gather(*(_fetch(db, sql) for sql in QUERIES.values()))
+    r = dict(zip(QUERIES, results))
+
+    print(f"DB 전체 메시지: {r['total'][0][0]}건")
+    for row in r["by_date"]:
+        print(f"  {row[0]}: {row[1]}건")
+
+    print(f"\n종목 멘션: {r['mentions'][0][0]}건")
+    for row in r["mentions_by_date"]:
+        print(f"  {row[0]}: {row[1]}개 종목")
+
     print(f"\n테마 분류:")
-    for r in rows:
-        print(f"  {r[0]}: {r[1]}건")
+    for row in r["themes"]:
+        print(f"  {row[0]}: {row[1]}건")
 
-    # Channels
-    cur = await conn.execute("SELECT username, is_active FROM channels")
-    rows = await cur.fetchall()
-    print(f"\n채널 ({len(rows)}개):")
-    for r in rows:
-        status = "active" if r[1] else "inactive"
-        print(f"  @{r[0]} [{status}]")
+    print(f"\n채널 ({len(r['channels'])}개):")
+    for row in r["channels"]:
+        status = "active" if row[1] else "inactive"
+        print(f"  @{row[0]} [{status}]")
 
     await db.close()
 
@@ -1,9 +1,13 @@
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic import Field
 from pydantic_settings import BaseSettings
 
+# 프로젝트 루트 (settings.py 기준 상위 디렉토리) - 모듈 로드 시 1회 계산
+BASE_DIR = Path(__file__).resolve().parent.parent
+
 
 class Settings(BaseSettings):
     # Telegram User API (Telethon)
@@ -21,9 +25,14 @@ class Settings(BaseSettings):
     claude_model: str = "claude-sonnet-4-20250514"
     claude_vision_model: str = "claude-sonnet-4-20250514"
     claude_max_tokens: int = 8192
+    claude_cache_ttl: str = "5m"  # prompt caching TTL: 5m / 1h (backfill 등 장시간 실행)
+    use_batch_api: bool = False  # 분류 요청을 Message Batches API로 (비용 50%↓, 결과까지 수 분 이상)
 
     # Rate limits
     claude_rpm: int = 50
+    claude_tpm: int = 30000  # 분당 입력 토큰 한도 (추정치 기준으로 호출 전 대기)
+    claude_concurrency: int = 4  # 동시에 진행할 Claude 요청 수 (RPM은 RateLimiter가 별도 제한)
+    claude_vision_concurrency: int = 2  # 그중 Vision 요청 상한 (이미지 전처리/업로드가 무거움)
     claude_daily_limit: int = 1000
     telegram_collection_interval_min: int = 30
 
@@ -33,18 +42,21 @@ class Settings(BaseSettings):
     timezone: str = "Asia/Seoul"
 
     # Paths - 프로젝트 루트 자동 감지 (settings.py 기준 상위 디렉토리)
-    base_dir: Path = Path(__file__).resolve().parent.parent
+    base_dir: Path = BASE_DIR
     db_path: Optional[Path] = None
     image_dir: Optional[Path] = None
     export_dir: Optional[Path] = None
 
+    # SQLite PRAGMA synchronous (WAL에서는 NORMAL 권장, 배치 스크립트는 OFF 가능)
+    db_synchronous: Literal["OFF", "NORMAL", "FULL", "EXTRA"] = "NORMAL"
+
     # Processing
     max_image_size_kb: int = 1024
     lookback_hours: int = 24
     batch_size: int = 10
 
     model_config = {
-        "env_file": str(Path(__file__).resolve().parent.parent / ".env"),
+        "env_file": str(BASE_DIR / ".env"),
         "env_file_encoding": "utf-8",
     }
 
@@ -55,3 +67,9 @@ class Settings(BaseSettings):
             self.image_dir = self.base_dir / "data" / "images"
         if self.export_dir is None:
             self.export_dir = self.base_dir / "data" / "exports"
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """프로세스 전체에서 공유하는 Settings 인스턴스 (.env 파싱/검증 1회)."""
+    return Settings()
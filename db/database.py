@@ -1,21 +1,80 @@
+import asyncio
 import logging
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from pathlib import Path
+from typing import AsyncIterator
 
 import aiosqlite
 
 logger = logging.getLogger(__name__)
 
+# WAL 모드에서 쓰기 커넥션과 별개로 병렬 조회에 쓰는 읽기 전용 커넥션 수
+READ_POOL_SIZE = 4
+
+# 커넥션별 prepared statement 캐시 크기 (sqlite3 기본 128)
+STATEMENT_CACHE_SIZE = 256
+
+# PRAGMA synchronous에 허용하는 값 (문장에 그대로 넣으므로 그 외 값은 거부)
+SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+# 현재 태스크가 이미 트랜잭션 안에 있는지 (중첩 transaction()은 바깥 블록에 합류)
+_in_transaction: ContextVar[bool] = ContextVar("_in_transaction", default=False)
+
+
+async def fetch_one(
+    conn: aiosqlite.Connection, sql: str, params: tuple | list = ()
+) -> aiosqlite.Row | None:
+    """execute + fetchone을 execute_fetchall 한 번으로 (커넥션 스레드 왕복 1회). 결과가 1행 이하인 조회용."""
+    rows = await conn.execute_fetchall(sql, params)
+    return rows[0] if rows else None
+
 
 class Database:
-    def __init__(self, db_path: Path):
+    def __init__(
+        self,
+        db_path: Path,
+        synchronous: str = "NORMAL",
+        read_pool_size: int = READ_POOL_SIZE,
+        read_only: bool = False,
+    ):
         self.db_path = db_path
+        # True면 쓰기 커넥션을 열지 않음 (acquire_read만 사용하는 조회 도구용)
+        self.read_only = read_only
+        if synchronous.upper() not in SYNCHRONOUS_MODES:
+            raise ValueError(
+                f"synchronous must be one of {', '.join(SYNCHRONOUS_MODES)}: {synchronous!r}"
+            )
+        self.synchronous = synchronous.upper()
+        self.read_pool_size = read_pool_size
         self._connection: aiosqlite.Connection | None = None
+        self._read_pool: asyncio.Queue[aiosqlite.Connection] = asyncio.Queue()
+        # 연 읽기 커넥션 수 (열고 있는 중 포함) / 연 커넥션 전체 (대여 중 포함 → close에서 모두 닫음)
+        self._readers_opened = 0
+        self._readers: list[aiosqlite.Connection] = []
+        self._tx_lock = asyncio.Lock()
 
     async def initialize(self):
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        self._connection = await aiosqlite.connect(str(self.db_path))
+        # autocommit 모드: 단일 문장은 즉시 커밋, 묶을 쓰기는 transaction()으로 명시
+        self._connection = await aiosqlite.connect(
+            str(self.db_path),
+            isolation_level=None,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
         self._connection.row_factory = aiosqlite.Row
-        await self._connection.execute("PRAGMA journal_mode=WAL")
+        cursor = await self._connection.execute("PRAGMA journal_mode=WAL")
+        journal_mode = (await cursor.fetchone())[0]
+        if journal_mode.lower() != "wal":
+            # 네트워크 드라이브 등 WAL 미지원 환경 → 읽기 풀이 쓰기와 막힐 수 있음
+            logger.warning(f"WAL mode unavailable, journal_mode={journal_mode}")
+        # WAL 모드에서는 NORMAL도 안전 (체크포인트 시에만 fsync)
+        await self._connection.execute(f"PRAGMA synchronous={self.synchronous}")
+        await self._connection.execute("PRAGMA temp_store=MEMORY")
+        await self._connection.execute("PRAGMA cache_size=-64000")  # 64MB
+        await self._connection.execute("PRAGMA mmap_size=268435456")  # 256MB
+        await self._connection.execute("PRAGMA wal_autocheckpoint=1000")
+        await self._connection.execute("PRAGMA busy_timeout=5000")
         await self._connection.execute("PRAGMA foreign_keys=ON")
         logger.info(f"Database initialized: {self.db_path}")
 
@@ -24,7 +83,107 @@ class Database:
             await self.initialize()
         return self._connection
 
+    async def _open_reader(self) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(
+            f"file:{self.db_path.as_posix()}?mode=ro",
+            uri=True,
+            isolation_level=None,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        conn.row_factory = aiosqlite.Row
+        try:
+            await conn.execute("PRAGMA query_only=1")
+            await conn.execute("PRAGMA temp_store=MEMORY")
+            await conn.execute("PRAGMA cache_size=-16000")  # 16MB
+            await conn.execute("PRAGMA mmap_size=268435456")
+            await conn.execute("PRAGMA busy_timeout=5000")
+        except BaseException:
+            await conn.close()
+            raise
+        return conn
+
+    @asynccontextmanager
+    async def acquire_read(self) -> AsyncIterator[aiosqlite.Connection]:
+        """
+        읽기 전용 커넥션 대여. WAL 스냅샷이라 쓰기 커넥션과 막히지 않고
+        여러 조회가 동시에 진행됨. 커밋된 데이터만 보임.
+        """
+        if self._connection is None and not self.read_only:
+            await self.initialize()
+        if self._read_pool.empty() and self._readers_opened < self.read_pool_size:
+            self._readers_opened += 1
+            try:
+                conn = await self._open_reader()
+            except BaseException:
+                # 열기 실패 시 자리를 돌려놓음 (안 그러면 풀이 비어 이후 get()이 영원히 대기)
+                self._readers_opened -= 1
+                raise
+            self._readers.append(conn)
+        else:
+            conn = await self._read_pool.get()
+        try:
+            yield conn
+        finally:
+            # close() 이후 반납된 커넥션은 이미 닫혔으므로 풀에 넣지 않음
+            if conn in self._readers:
+                self._read_pool.put_nowait(conn)
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[aiosqlite.Connection]:
+        """
+        BEGIN IMMEDIATE ... COMMIT 블록. 예외 시 ROLLBACK. 트랜잭션끼리는 직렬화.
+        같은 태스크에서 중첩 호출하면 새 BEGIN 없이 바깥 트랜잭션에 합류.
+        """
+        conn = await self.get_connection()
+        if _in_transaction.get():
+            yield conn
+            return
+        async with self._tx_lock:
+            token = _in_transaction.set(True)
+            await conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                await conn.execute("ROLLBACK")
+                raise
+            else:
+                await conn.execute("COMMIT")
+            finally:
+                _in_transaction.reset(token)
+
+    @asynccontextmanager
+    async def write(self) -> AsyncIterator[aiosqlite.Connection]:
+        """
+        단일 쓰기 문장용 (BEGIN 없이 autocommit). 공유 커넥션이라 다른 태스크의
+        transaction() 도중에 그냥 쓰면 그 트랜잭션에 섞여 함께 롤백될 수 있으므로
+        트랜잭션 락을 잡고 실행. 이미 transaction() 안이면 그대로 합류.
+        """
+        conn = await self.get_connection()
+        if _in_transaction.get():
+            yield conn
+            return
+        async with self._tx_lock:
+            # 블록 안에서 transaction()을 부르면 락을 다시 잡지 않고 합류
+            token = _in_transaction.set(True)
+            try:
+                yield conn
+            finally:
+                _in_transaction.reset(token)
+
+    async def executemany(self, sql: str, rows: list[tuple]) -> int:
+        """여러 row를 한 트랜잭션으로 실행 (커밋/fsync 1회). 변경된 row 수 반환."""
+        if not rows:
+            return 0
+        async with self.transaction() as conn:
+            cursor = await conn.executemany(sql, rows)
+        return cursor.rowcount
+
     async def close(self):
+        readers, self._readers = self._readers, []
+        self._read_pool = asyncio.Queue()
+        self._readers_opened = 0
+        for conn in readers:
+            await conn.close()
         if self._connection:
             await self._connection.close()
             self._connection = None
@@ -1,12 +1,12 @@
 import logging
 
-from db.database import Database
+from db.database import Database, fetch_one
 
 logger = logging.getLogger(__name__)
 
 SCHEMA_SQL = """
 CREATE TABLE IF NOT EXISTS channels (
-    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    id            INTEGER PRIMARY KEY,
     telegram_id   INTEGER UNIQUE NOT NULL,
     username      TEXT,
     title         TEXT NOT NULL,
@@ -18,20 +18,21 @@ CREATE TABLE IF NOT EXISTS channels (
 );
 
 CREATE TABLE IF NOT EXISTS messages (
-    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    id              INTEGER PRIMARY KEY,
     channel_id      INTEGER NOT NULL REFERENCES channels(id),
     telegram_msg_id INTEGER NOT NULL,
     message_text    TEXT,
     has_image       INTEGER NOT NULL DEFAULT 0,
     image_path      TEXT,
     message_date    TEXT NOT NULL,
+    message_day     TEXT,
     collected_at    TEXT NOT NULL DEFAULT (datetime('now')),
     is_analyzed     INTEGER NOT NULL DEFAULT 0,
     UNIQUE(channel_id, telegram_msg_id)
 );
 
 CREATE TABLE IF NOT EXISTS stocks (
-    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    id         INTEGER PRIMARY KEY,
     ticker     TEXT NOT NULL,
     name_ko    TEXT,
     name_en    TEXT,
@@ -42,7 +43,7 @@ CREATE TABLE IF NOT EXISTS stocks (
 );
 
 CREATE TABLE IF NOT EXISTS stock_mentions (
-    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    id              INTEGER PRIMARY KEY,
     message_id      INTEGER NOT NULL REFERENCES messages(id),
     stock_id        INTEGER NOT NULL REFERENCES stocks(id),
     mention_context TEXT,
@@ -52,7 +53,7 @@ CREATE TABLE IF NOT EXISTS stock_mentions (
 );
 
 CREATE TABLE IF NOT EXISTS themes (
-    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    id         INTEGER PRIMARY KEY,
     name_ko    TEXT NOT NULL,
     name_en    TEXT,
     market     TEXT NOT NULL,
@@ -64,7 +65,7 @@ CREATE TABLE IF NOT EXISTS themes (
 );
 
 CREATE TABLE IF NOT EXISTS daily_stock_themes (
-    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    id            INTEGER PRIMARY KEY,
     report_date   TEXT NOT NULL,
     stock_id      INTEGER NOT NULL REFERENCES stocks(id),
     theme_id      INTEGER NOT NULL REFERENCES themes(id),
@@ -74,8 +75,31 @@ CREATE TABLE IF NOT EXISTS daily_stock_themes (
     UNIQUE(report_date, stock_id, theme_id)
 );
 
+-- 날짜별 종목 언급 집계 (get_daily_stock_mentions 결과 캐시)
+CREATE TABLE IF NOT EXISTS daily_stock_mentions_rollup (
+    report_date        TEXT NOT NULL,
+    stock_id           INTEGER NOT NULL REFERENCES stocks(id),
+    mention_count      INTEGER NOT NULL,
+    aggregated_context TEXT,
+    dominant_sentiment TEXT,
+    avg_confidence     REAL,
+    PRIMARY KEY (report_date, stock_id)
+) WITHOUT ROWID;
+
+-- 집계가 최신인 날짜. 해당 날짜의 언급이 추가/삭제되면 트리거가 삭제
+CREATE TABLE IF NOT EXISTS daily_rollup_built (
+    report_date TEXT PRIMARY KEY
+) WITHOUT ROWID;
+
+-- Claude 응답 캐시: SHA256(모델 + 프롬프트) → 응답 텍스트 (같은 입력 재분류 시 API 호출 생략)
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key        TEXT PRIMARY KEY,
+    response   TEXT NOT NULL,
+    created_at TEXT NOT NULL DEFAULT (datetime('now'))
+) WITHOUT ROWID;
+
 CREATE TABLE IF NOT EXISTS daily_reports (
-    id                      INTEGER PRIMARY KEY AUTOINCREMENT,
+    id                      INTEGER PRIMARY KEY,
     report_date             TEXT NOT NULL UNIQUE,
     total_messages_analyzed INTEGER NOT NULL DEFAULT 0,
     total_stocks_found      INTEGER NOT NULL DEFAULT 0,
@@ -86,41 +110,104 @@ CREATE TABLE IF NOT EXISTS daily_reports (
 );
 
 CREATE INDEX IF NOT EXISTS idx_messages_date ON messages(message_date);
-CREATE INDEX IF NOT EXISTS idx_messages_analyzed ON messages(is_analyzed);
+CREATE INDEX IF NOT EXISTS idx_messages_unanalyzed
+    ON messages(has_image, message_date) WHERE is_analyzed = 0;
 CREATE INDEX IF NOT EXISTS idx_stock_mentions_stock ON stock_mentions(stock_id);
-CREATE INDEX IF NOT EXISTS idx_stock_mentions_message ON stock_mentions(message_id);
+CREATE INDEX IF NOT EXISTS idx_sm_message_stock
+    ON stock_mentions(message_id, stock_id, sentiment, confidence);
 CREATE INDEX IF NOT EXISTS idx_daily_stock_themes_date ON daily_stock_themes(report_date);
 CREATE INDEX IF NOT EXISTS idx_daily_stock_themes_theme ON daily_stock_themes(theme_id);
 CREATE INDEX IF NOT EXISTS idx_stocks_market ON stocks(market);
+CREATE INDEX IF NOT EXISTS idx_llm_cache_created ON llm_cache(created_at);
 """
 
 
+# 적용 여부는 PRAGMA user_version(= 적용된 문장 수)으로 관리 → 새 마이그레이션은 항상 끝에 추가
 MIGRATIONS = [
     # v1: daily_stock_themes에 sector 컬럼 추가
     "ALTER TABLE daily_stock_themes ADD COLUMN sector TEXT NOT NULL DEFAULT 'other'",
     # v2: stocks에 industry 컬럼 추가 (yfinance 업종 캐싱)
     "ALTER TABLE stocks ADD COLUMN industry TEXT",
+    # v3: idx_sm_message_stock(message_id, ...)가 대체하는 단일 컬럼 인덱스 제거
+    "DROP INDEX IF EXISTS idx_stock_mentions_message",
+    # v4: messages.message_day (= DATE(message_date)) 저장 컬럼 + 인덱스 + 자동 채움 트리거
+    "ALTER TABLE messages ADD COLUMN message_day TEXT",
+    "UPDATE messages SET message_day = DATE(message_date) WHERE message_day IS NULL",
+    "DROP INDEX IF EXISTS idx_messages_date_day",
+    "CREATE INDEX IF NOT EXISTS idx_messages_day ON messages(message_day)",
+    """CREATE TRIGGER IF NOT EXISTS trg_messages_day AFTER INSERT ON messages
+       WHEN NEW.message_day IS NULL
+       BEGIN
+         UPDATE messages SET message_day = DATE(NEW.message_date) WHERE id = NEW.id;
+       END""",
+    # v5: themes(name_ko, market) 유니크 → get_or_create_theme 단일 upsert
+    #     기존 중복 테마는 가장 작은 id로 합친 뒤 제거
+    """UPDATE OR IGNORE daily_stock_themes SET theme_id = (
+         SELECT MIN(t2.id) FROM themes t1
+         JOIN themes t2 ON t2.name_ko = t1.name_ko AND t2.market = t1.market
+         WHERE t1.id = daily_stock_themes.theme_id)
+       WHERE theme_id NOT IN (SELECT MIN(id) FROM themes GROUP BY name_ko, market)""",
+    """DELETE FROM daily_stock_themes
+       WHERE theme_id NOT IN (SELECT MIN(id) FROM themes GROUP BY name_ko, market)""",
+    """UPDATE themes SET parent_id = (
+         SELECT MIN(t2.id) FROM themes t1
+         JOIN themes t2 ON t2.name_ko = t1.name_ko AND t2.market = t1.market
+         WHERE t1.id = themes.parent_id)
+       WHERE parent_id NOT IN (SELECT MIN(id) FROM themes GROUP BY name_ko, market)""",
+    """DELETE FROM themes
+       WHERE id NOT IN (SELECT MIN(id) FROM themes GROUP BY name_ko, market)""",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_themes_name_market ON themes(name_ko, market)",
+    # v6: 언급 추가 시 해당 날짜 rollup 무효화
+    """CREATE TRIGGER IF NOT EXISTS trg_sm_rollup_stale AFTER INSERT ON stock_mentions
+       BEGIN
+         DELETE FROM daily_rollup_built
+         WHERE report_date = (SELECT message_day FROM messages WHERE id = NEW.message_id);
+       END""",
+    # v7: 미분석 메시지 조회는 partial 인덱스 idx_messages_unanalyzed가 대체
+    "DROP INDEX IF EXISTS idx_messages_analyzed",
+    # v8: 언급 삭제 시에도 해당 날짜 rollup 무효화 (삭제된 언급이 집계에 남지 않도록)
+    """CREATE TRIGGER IF NOT EXISTS trg_sm_rollup_stale_del AFTER DELETE ON stock_mentions
+       BEGIN
+         DELETE FROM daily_rollup_built
+         WHERE report_date = (SELECT message_day FROM messages WHERE id = OLD.message_id);
+       END""",
 ]
 
 
 async def run_migrations(db: Database):
-    conn = await db.get_connection()
-    for statement in SCHEMA_SQL.strip().split(";"):
-        statement = statement.strip()
-        if statement:
-            await conn.execute(statement)
-    await conn.commit()
-
-    # 추가 마이그레이션 (ALTER TABLE 등)
-    for migration in MIGRATIONS:
+    # 스키마 전체를 하나의 트랜잭션으로 실행 (fsync 1회)
+    async with db.write() as conn:
         try:
-            await conn.execute(migration)
-            await conn.commit()
-            logger.info(f"Migration applied: {migration[:60]}...")
-        except Exception as e:
-            if "duplicate column" in str(e).lower():
-                pass  # 이미 적용됨
-            else:
-                logger.debug(f"Migration skipped: {e}")
+            await conn.executescript(f"BEGIN IMMEDIATE;\n{SCHEMA_SQL}\nCOMMIT;")
+        except Exception:
+            # 중간 문장이 실패하면 COMMIT 전에 멈추므로 열린 트랜잭션을 정리
+            if conn.in_transaction:
+                await conn.execute("ROLLBACK")
+            raise
+
+    # 추가 마이그레이션 (ALTER TABLE 등) - 한 트랜잭션으로 묶어 커밋 1회
+    # user_version = 적용된 MIGRATIONS 개수 → 일회성 backfill/정리 문장은 재시작마다 다시 돌지 않음
+    row = await fetch_one(conn, "PRAGMA user_version")
+    applied = row[0]
+    pending = MIGRATIONS[applied:]
+    if pending:
+        async with db.transaction():
+            for migration in pending:
+                try:
+                    await conn.execute(migration)
+                    logger.info(f"Migration applied: {migration[:60]}...")
+                except Exception as e:
+                    if "duplicate column" in str(e).lower():
+                        continue  # 이미 적용됨
+                    # 그 외 실패는 적용된 것으로 기록하지 않도록 전체 롤백 (다음 시작 때 재시도)
+                    logger.error(f"Migration failed: {migration[:60]}... ({e})")
+                    raise
+            await conn.execute(f"PRAGMA user_version = {len(MIGRATIONS)}")
+
+        # 인덱스가 바뀐 직후에만 전체 통계 갱신 → 플래너가 covering 인덱스를 선택하도록
+        await conn.execute("ANALYZE")
+    else:
+        # 평소에는 필요한 테이블만 통계 갱신
+        await conn.execute("PRAGMA optimize")
 
     logger.info("Database migrations completed")
@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional
 
@@ -16,15 +17,18 @@ class Channel(BaseModel):
     updated_at: Optional[datetime] = None
 
 
-class Message(BaseModel):
+# 아래 Message / StockMention / DailyStockTheme는 DB row에서 대량 생성되는 내부 모델이라
+# pydantic 검증 없이 slots dataclass로 정의. 날짜 컬럼은 DB TEXT(ISO 8601) 그대로 보관.
+@dataclass(slots=True, kw_only=True)
+class Message:
     id: Optional[int] = None
     channel_id: int
     telegram_msg_id: int
     message_text: Optional[str] = None
     has_image: bool = False
     image_path: Optional[str] = None
-    message_date: datetime
-    collected_at: Optional[datetime] = None
+    message_date: str
+    collected_at: Optional[str] = None
     is_analyzed: bool = False
 
 
@@ -38,7 +42,8 @@ class Stock(BaseModel):
     created_at: Optional[datetime] = None
 
 
-class StockMention(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class StockMention:
     id: Optional[int] = None
     message_id: int
     stock_id: Optional[int] = None
@@ -47,7 +52,7 @@ class StockMention(BaseModel):
     mention_context: Optional[str] = None
     sentiment: str = "neutral"  # positive, negative, neutral
     confidence: float = 0.0
-    extracted_at: Optional[datetime] = None
+    extracted_at: Optional[str] = None
 
 
 class Theme(BaseModel):
@@ -62,14 +67,16 @@ class Theme(BaseModel):
     updated_at: Optional[datetime] = None
 
 
-class DailyStockTheme(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class DailyStockTheme:
     id: Optional[int] = None
     report_date: str  # YYYY-MM-DD
     stock_id: int
     theme_id: int
     mention_count: int = 1
     reason: Optional[str] = None
-    assigned_at: Optional[datetime] = None
+    sector: str = "other"
+    assigned_at: Optional[str] = None
 
 
 class DailyReport(BaseModel):
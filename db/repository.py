@@ -1,24 +1,64 @@
+import json
 import logging
-from typing import Optional
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
 
-from db.database import Database
+import aiosqlite
+
+from db.database import Database, fetch_one
 
 logger = logging.getLogger(__name__)
 
+# 구버전 SQLite 호환 바인딩 파라미터 상한 (SQLITE_MAX_VARIABLE_NUMBER 기본값)
+SQLITE_MAX_PARAMS = 999
+
+# 테마/채널 목록 캐시 유지 시간 (초)
+LIST_CACHE_TTL = 300
+
+
+def _is_fresh(cache: Optional[tuple[float, list]]) -> bool:
+    return cache is not None and time.monotonic() - cache[0] < LIST_CACHE_TTL
+
 
 class Repository:
     def __init__(self, database: Database):
         self.db = database
+        # (ticker, market) / (name_ko, market) → 저장된 row (id + COALESCE로 채워지는 컬럼)
+        self._stock_id_cache: dict[tuple[str, str], dict] = {}
+        self._theme_id_cache: dict[tuple[str, str], dict] = {}
+        # 하루 단위로만 바뀌는 목록 캐시 (적재 시각, rows). 관련 쓰기 메서드가 None으로 무효화,
+        # 다른 프로세스(run_pipeline 등)의 변경은 LIST_CACHE_TTL 후 반영
+        self._themes_cache: Optional[tuple[float, list[aiosqlite.Row]]] = None
+        self._channels_cache: Optional[tuple[float, list[dict]]] = None
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[aiosqlite.Connection]:
+        """여러 쓰기를 한 트랜잭션으로 묶음 (Database.transaction 위임)."""
+        try:
+            async with self.db.transaction() as conn:
+                yield conn
+        except BaseException:
+            # 롤백된 INSERT의 id가 캐시에 남지 않도록
+            self._stock_id_cache.clear()
+            self._theme_id_cache.clear()
+            raise
+        finally:
+            # 트랜잭션 중에 읽기 풀로 적재된 목록은 커밋 전 상태일 수 있음
+            self._themes_cache = None
+            self._channels_cache = None
 
     # ── Channel operations ──
 
     async def get_active_channels(self) -> list[dict]:
-        conn = await self.db.get_connection()
-        cursor = await conn.execute(
-            "SELECT * FROM channels WHERE is_active = 1"
-        )
-        rows = await cursor.fetchall()
-        return [dict(r) for r in rows]
+        if not _is_fresh(self._channels_cache):
+            async with self.db.acquire_read() as conn:
+                rows = await conn.execute_fetchall(
+                    "SELECT * FROM channels WHERE is_active = 1"
+                )
+            self._channels_cache = (time.monotonic(), [dict(r) for r in rows])
+        # 호출 측 수정이 캐시에 남지 않도록 사본 반환
+        return [c.copy() for c in self._channels_cache[1]]
 
     async def upsert_channel(
         self,
@@ -28,58 +68,81 @@ class Repository:
         market_focus: str = "BOTH",
         language: str = "ko",
     ) -> int:
-        conn = await self.db.get_connection()
-        await conn.execute(
-            """INSERT INTO channels (telegram_id, username, title, market_focus, language)
-               VALUES (?, ?, ?, ?, ?)
-               ON CONFLICT(telegram_id) DO UPDATE SET
-                 username = excluded.username,
-                 title = excluded.title,
-                 market_focus = excluded.market_focus,
-                 language = excluded.language,
-                 updated_at = datetime('now')""",
-            (telegram_id, username, title, market_focus, language),
-        )
-        await conn.commit()
-        cursor = await conn.execute(
-            "SELECT id FROM channels WHERE telegram_id = ?", (telegram_id,)
-        )
-        row = await cursor.fetchone()
+        async with self.db.write() as conn:
+            row = await fetch_one(
+                conn,
+                """INSERT INTO channels (telegram_id, username, title, market_focus, language)
+                   VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT(telegram_id) DO UPDATE SET
+                     username = excluded.username,
+                     title = excluded.title,
+                     market_focus = excluded.market_focus,
+                     language = excluded.language,
+                     updated_at = datetime('now')
+                   RETURNING id""",
+                (telegram_id, username, title, market_focus, language),
+            )
+        self._channels_cache = None
         return row["id"]
 
     async def deactivate_channel(self, username: str) -> bool:
-        conn = await self.db.get_connection()
-        cursor = await conn.execute(
-            "UPDATE channels SET is_active = 0, updated_at = datetime('now') WHERE username = ?",
-            (username,),
-        )
-        await conn.commit()
+        async with self.db.write() as conn:
+            cursor = await conn.execute(
+                "UPDATE channels SET is_active = 0, updated_at = datetime('now') WHERE username = ?",
+                (username,),
+            )
+        self._channels_cache = None
         return cursor.rowcount > 0
 
     async def activate_channel(self, username: str) -> bool:
-        conn = await self.db.get_connection()
-        cursor = await conn.execute(
-            "UPDATE channels SET is_active = 1, updated_at = datetime('now') WHERE username = ?",
-            (username,),
-        )
-        await conn.commit()
+        async with self.db.write() as conn:
+            cursor = await conn.execute(
+                "UPDATE channels SET is_active = 1, updated_at = datetime('now') WHERE username = ?",
+                (username,),
+            )
+        self._channels_cache = None
         return cursor.rowcount > 0
 
     async def get_all_channels(self) -> list[dict]:
-        conn = await self.db.get_connection()
-        cursor = await conn.execute("SELECT * FROM channels ORDER BY is_active DESC, title")
-        rows = await cursor.fetchall()
+        async with self.db.acquire_read() as conn:
+            rows = await conn.execute_fetchall("SELECT * FROM channels ORDER BY is_active DESC, title")
         return [dict(r) for r in rows]
 
     # ── Message operations ──
 
     async def message_exists(self, channel_id: int, telegram_msg_id: int) -> bool:
         conn = await self.db.get_connection()
-        cursor = await conn.execute(
+        row = await fetch_one(
+            conn,
             "SELECT 1 FROM messages WHERE channel_id = ? AND telegram_msg_id = ?",
             (channel_id, telegram_msg_id),
         )
-        return await cursor.fetchone() is not None
+        return row is not None
+
+    async def get_message_id_range(self, channel_id: int) -> tuple[int, Optional[str]]:
+        """채널에 저장된 (가장 큰 telegram_msg_id, 가장 오래된 message_date). 없으면 (0, None)."""
+        async with self.db.acquire_read() as conn:
+            row = await fetch_one(
+                conn,
+                "SELECT MAX(telegram_msg_id), MIN(message_date) FROM messages WHERE channel_id = ?",
+                (channel_id,),
+            )
+        return row[0] or 0, row[1]
+
+    async def filter_new_messages(
+        self, channel_id: int, telegram_msg_ids: list[int]
+    ) -> set[int]:
+        """telegram_msg_ids 중 아직 저장되지 않은 id 집합 (message_exists의 배치 버전)."""
+        if not telegram_msg_ids:
+            return set()
+        async with self.db.acquire_read() as conn:
+            rows = await conn.execute_fetchall(
+                """SELECT telegram_msg_id FROM messages
+                   WHERE channel_id = ?
+                     AND telegram_msg_id IN (SELECT value FROM json_each(?))""",
+                (channel_id, json.dumps(telegram_msg_ids)),
+            )
+        return set(telegram_msg_ids) - {r[0] for r in rows}
 
     async def insert_message(
         self,
@@ -89,49 +152,58 @@ class Repository:
         has_image: bool,
         image_path: Optional[str],
         message_date: str,
-    ) -> int:
-        conn = await self.db.get_connection()
-        cursor = await conn.execute(
-            """INSERT OR IGNORE INTO messages
+    ) -> Optional[int]:
+        """새 메시지면 id 반환, 이미 있으면 None."""
+        async with self.db.write() as conn:
+            row = await fetch_one(
+                conn,
+                """INSERT INTO messages
+                   (channel_id, telegram_msg_id, message_text, has_image, image_path, message_date)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(channel_id, telegram_msg_id) DO NOTHING
+                   RETURNING id""",
+                (channel_id, telegram_msg_id, message_text, int(has_image), image_path, message_date),
+            )
+        return row["id"] if row else None
+
+    async def insert_messages(self, messages: list[dict]) -> int:
+        """insert_message의 배치 버전. 각 dict는 insert_message 인자와 같은 키를 가짐."""
+        return await self.db.executemany(
+            """INSERT INTO messages
                (channel_id, telegram_msg_id, message_text, has_image, image_path, message_date)
-               VALUES (?, ?, ?, ?, ?, ?)""",
-            (channel_id, telegram_msg_id, message_text, int(has_image), image_path, message_date),
+               VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT(channel_id, telegram_msg_id) DO NOTHING""",
+            [
+                (m["channel_id"], m["telegram_msg_id"], m["message_text"],
+                 int(m["has_image"]), m["image_path"], m["message_date"])
+                for m in messages
+            ],
         )
-        await conn.commit()
-        return cursor.lastrowid
 
     async def get_unanalyzed_messages(
         self, has_image: Optional[bool] = None, limit: int = 500
-    ) -> list[dict]:
-        conn = await self.db.get_connection()
-        query = "SELECT * FROM messages WHERE is_analyzed = 0"
-        params: list = []
-        if has_image is not None:
-            query += " AND has_image = ?"
-            params.append(int(has_image))
-        query += " ORDER BY message_date ASC LIMIT ?"
-        params.append(limit)
-        cursor = await conn.execute(query, params)
-        rows = await cursor.fetchall()
-        return [dict(r) for r in rows]
-
-    async def mark_message_analyzed(self, message_id: int):
-        conn = await self.db.get_connection()
-        await conn.execute(
-            "UPDATE messages SET is_analyzed = 1 WHERE id = ?", (message_id,)
-        )
-        await conn.commit()
+    ) -> list[aiosqlite.Row]:
+        async with self.db.acquire_read() as conn:
+            query = "SELECT * FROM messages WHERE is_analyzed = 0"
+            params: list = []
+            if has_image is not None:
+                query += " AND has_image = ?"
+                params.append(int(has_image))
+            query += " ORDER BY message_date ASC LIMIT ?"
+            params.append(limit)
+            rows = await conn.execute_fetchall(query, params)
+        return rows
 
     async def mark_messages_analyzed(self, message_ids: list[int]):
         if not message_ids:
             return
-        conn = await self.db.get_connection()
-        placeholders = ",".join("?" for _ in message_ids)
-        await conn.execute(
-            f"UPDATE messages SET is_analyzed = 1 WHERE id IN ({placeholders})",
-            message_ids,
-        )
-        await conn.commit()
+        async with self.db.write() as conn:
+            # id 목록을 JSON 배열 하나로 바인딩 → 개수와 무관하게 SQL 텍스트가 같아 statement 캐시 재사용
+            await conn.execute(
+                "UPDATE messages SET is_analyzed = 1"
+                " WHERE id IN (SELECT value FROM json_each(?))",
+                (json.dumps(message_ids),),
+            )
 
     # ── Stock operations ──
 
@@ -143,40 +215,105 @@ class Repository:
         market: str,
         exchange: Optional[str] = None,
     ) -> int:
-        conn = await self.db.get_connection()
-        cursor = await conn.execute(
-            "SELECT id FROM stocks WHERE ticker = ? AND market = ?",
-            (ticker, market),
-        )
-        row = await cursor.fetchone()
-        if row:
-            return row["id"]
-
-        cursor = await conn.execute(
-            """INSERT INTO stocks (ticker, name_ko, name_en, market, exchange)
-               VALUES (?, ?, ?, ?, ?)""",
-            (ticker, name_ko, name_en, market, exchange),
-        )
-        await conn.commit()
-        return cursor.lastrowid
+        key = (ticker, market)
+        cached = self._stock_id_cache.get(key)
+        # 새로 채울 값이 없을 때만 캐시로 응답 (있으면 upsert로 빈 컬럼 채움)
+        if cached and all(
+            new is None or cached[col] is not None
+            for col, new in (("name_ko", name_ko), ("name_en", name_en), ("exchange", exchange))
+        ):
+            return cached["id"]
+        async with self.db.write() as conn:
+            # 이미 있으면 비어 있는 이름/거래소만 채우고 기존 id 반환
+            row = await fetch_one(
+                conn,
+                """INSERT INTO stocks (ticker, name_ko, name_en, market, exchange)
+                   VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT(ticker, market) DO UPDATE SET
+                     name_ko = COALESCE(stocks.name_ko, excluded.name_ko),
+                     name_en = COALESCE(stocks.name_en, excluded.name_en),
+                     exchange = COALESCE(stocks.exchange, excluded.exchange)
+                   RETURNING id, name_ko, name_en, exchange""",
+                (ticker, name_ko, name_en, market, exchange),
+            )
+        self._stock_id_cache[key] = dict(row)
+        return row["id"]
 
-    async def update_stock_industry(self, stock_id: int, industry: str):
-        conn = await self.db.get_connection()
-        await conn.execute(
+    async def get_or_create_stocks(
+        self, stocks: list[dict]
+    ) -> dict[tuple[str, str], int]:
+        """get_or_create_stock의 배치 버전. 각 dict는 같은 키를 가짐.
+
+        캐시로 답할 수 없는 종목만 multi-row upsert 한 번으로 처리. (ticker, market) → id.
+        """
+        result: dict[tuple[str, str], int] = {}
+        # 같은 종목이 여러 번 오면 비어 있지 않은 값을 합쳐 한 row로
+        merged: dict[tuple[str, str], dict] = {}
+        for s in stocks:
+            key = (s["ticker"], s["market"])
+            if key in merged:
+                m = merged[key]
+                for col in ("name_ko", "name_en", "exchange"):
+                    if m.get(col) is None:
+                        m[col] = s.get(col)
+            else:
+                merged[key] = dict(s)
+
+        rows = []
+        for key, s in merged.items():
+            cached = self._stock_id_cache.get(key)
+            if cached and all(
+                s.get(col) is None or cached[col] is not None
+                for col in ("name_ko", "name_en", "exchange")
+            ):
+                result[key] = cached["id"]
+            else:
+                rows.append(
+                    (s["ticker"], s.get("name_ko"), s.get("name_en"),
+                     s["market"], s.get("exchange"))
+                )
+        if not rows:
+            return result
+
+        chunk_size = SQLITE_MAX_PARAMS // 5
+        async with self.transaction() as conn:
+            for i in range(0, len(rows), chunk_size):
+                chunk = rows[i : i + chunk_size]
+                values = ", ".join(["(?, ?, ?, ?, ?)"] * len(chunk))
+                returned = await conn.execute_fetchall(
+                    f"""INSERT INTO stocks (ticker, name_ko, name_en, market, exchange)
+                        VALUES {values}
+                        ON CONFLICT(ticker, market) DO UPDATE SET
+                          name_ko = COALESCE(stocks.name_ko, excluded.name_ko),
+                          name_en = COALESCE(stocks.name_en, excluded.name_en),
+                          exchange = COALESCE(stocks.exchange, excluded.exchange)
+                        RETURNING id, ticker, market, name_ko, name_en, exchange""",
+                    [v for row in chunk for v in row],
+                )
+                for row in returned:
+                    key = (row["ticker"], row["market"])
+                    self._stock_id_cache[key] = {
+                        "id": row["id"], "name_ko": row["name_ko"],
+                        "name_en": row["name_en"], "exchange": row["exchange"],
+                    }
+                    result[key] = row["id"]
+        return result
+
+    async def update_stock_industries(self, industries: dict[int, str]) -> int:
+        """stock_id → industry 일괄 저장 (커밋 1회)."""
+        return await self.db.executemany(
             "UPDATE stocks SET industry = ? WHERE id = ?",
-            (industry, stock_id),
+            [(industry, stock_id) for stock_id, industry in industries.items()],
         )
-        await conn.commit()
 
     async def search_stock(self, query: str) -> list[dict]:
         conn = await self.db.get_connection()
         pattern = f"%{query}%"
-        cursor = await conn.execute(
+        rows = await conn.execute_fetchall(
             """SELECT * FROM stocks
                WHERE name_ko LIKE ? OR name_en LIKE ? OR ticker LIKE ?""",
             (pattern, pattern, pattern),
         )
-        rows = await cursor.fetchall()
         return [dict(r) for r in rows]
 
     # ── Stock mention operations ──
@@ -189,56 +326,176 @@ class Repository:
         sentiment: str = "neutral",
         confidence: float = 0.0,
     ) -> int:
-        conn = await self.db.get_connection()
-        cursor = await conn.execute(
-            """INSERT INTO stock_mentions
-               (message_id, stock_id, mention_context, sentiment, confidence)
-               VALUES (?, ?, ?, ?, ?)""",
-            (message_id, stock_id, mention_context, sentiment, confidence),
-        )
-        await conn.commit()
+        async with self.db.write() as conn:
+            cursor = await conn.execute(
+                """INSERT INTO stock_mentions
+                   (message_id, stock_id, mention_context, sentiment, confidence)
+                   VALUES (?, ?, ?, ?, ?)""",
+                (message_id, stock_id, mention_context, sentiment, confidence),
+            )
         return cursor.lastrowid
 
+    async def insert_stock_mentions(
+        self, mentions: list[dict], batch_mode: bool = False
+    ) -> int:
+        """
+        insert_stock_mention의 배치 버전. 각 dict는 insert_stock_mention 인자와 같은 키를 가짐.
+        batch_mode=True면 executemany 대신 multi-VALUES INSERT 한 문장으로 (청크당 1회 실행).
+        """
+        rows = [
+            (m["message_id"], m["stock_id"], m.get("mention_context"),
+             m.get("sentiment", "neutral"), m.get("confidence", 0.0))
+            for m in mentions
+        ]
+        if not rows:
+            return 0
+        if not batch_mode:
+            return await self.db.executemany(
+                """INSERT INTO stock_mentions
+                   (message_id, stock_id, mention_context, sentiment, confidence)
+                   VALUES (?, ?, ?, ?, ?)""",
+                rows,
+            )
+
+        inserted = 0
+        chunk_size = SQLITE_MAX_PARAMS // 5
+        async with self.transaction() as conn:
+            for i in range(0, len(rows), chunk_size):
+                chunk = rows[i : i + chunk_size]
+                values = ", ".join(["(?, ?, ?, ?, ?)"] * len(chunk))
+                cursor = await conn.execute(
+                    f"""INSERT INTO stock_mentions
+                        (message_id, stock_id, mention_context, sentiment, confidence)
+                        VALUES {values}""",
+                    [v for row in chunk for v in row],
+                )
+                inserted += cursor.rowcount
+        return inserted
+
+    async def refresh_daily_rollup(self, report_date: str):
+        """해당 날짜의 종목별 언급 집계를 daily_stock_mentions_rollup에 다시 계산."""
+        async with self.transaction() as conn:
+            await conn.execute(
+                "DELETE FROM daily_stock_mentions_rollup WHERE report_date = ?",
+                (report_date,),
+            )
+            # 수치 집계만 SQL에서, 문맥 문자열은 아래에서 Python으로 합침
+            await conn.execute(
+                """INSERT INTO daily_stock_mentions_rollup
+                     (report_date, stock_id, mention_count,
+                      dominant_sentiment, avg_confidence)
+                   SELECT
+                     m.message_day, sm.stock_id,
+                     COUNT(sm.id),
+                     CASE
+                       WHEN SUM(CASE WHEN sm.sentiment = 'positive' THEN 1 ELSE 0 END) >=
+                            SUM(CASE WHEN sm.sentiment = 'negative' THEN 1 ELSE 0 END)
+                       THEN 'positive' ELSE 'negative'
+                     END,
+                     AVG(sm.confidence)
+                   FROM stock_mentions sm
+                   JOIN messages m ON sm.message_id = m.id
+                   WHERE m.message_day = ?
+                   GROUP BY sm.stock_id
+                   HAVING AVG(sm.confidence) >= 0.2 OR COUNT(sm.id) >= 1""",
+                (report_date,),
+            )
+            rows = await conn.execute_fetchall(
+                """SELECT sm.stock_id, sm.mention_context
+                   FROM stock_mentions sm
+                   JOIN messages m ON sm.message_id = m.id
+                   WHERE m.message_day = ? AND sm.mention_context IS NOT NULL
+                   ORDER BY sm.id""",
+                (report_date,),
+            )
+            contexts: dict[int, list[str]] = {}
+            for stock_id, context in rows:
+                contexts.setdefault(stock_id, []).append(context)
+            await conn.executemany(
+                """UPDATE daily_stock_mentions_rollup SET aggregated_context = ?
+                   WHERE report_date = ? AND stock_id = ?""",
+                [
+                    (" | ".join(parts), report_date, stock_id)
+                    for stock_id, parts in contexts.items()
+                ],
+            )
+            await conn.execute(
+                "INSERT OR IGNORE INTO daily_rollup_built (report_date) VALUES (?)",
+                (report_date,),
+            )
+
     async def get_daily_stock_mentions(self, report_date: str) -> list[dict]:
-        conn = await self.db.get_connection()
-        cursor = await conn.execute(
-            """SELECT
-                 s.id as stock_id, s.ticker, s.name_ko, s.name_en, s.market, s.exchange, s.industry,
-                 COUNT(sm.id) as mention_count,
-                 GROUP_CONCAT(sm.mention_context, ' | ') as aggregated_context,
-                 CASE
-                   WHEN SUM(CASE WHEN sm.sentiment = 'positive' THEN 1 ELSE 0 END) >=
-                        SUM(CASE WHEN sm.sentiment = 'negative' THEN 1 ELSE 0 END)
-                   THEN 'positive' ELSE 'negative'
-                 END as dominant_sentiment,
-                 AVG(sm.confidence) as avg_confidence
-               FROM stock_mentions sm
-               JOIN messages m ON sm.message_id = m.id
-               JOIN stocks s ON sm.stock_id = s.id
-               WHERE DATE(m.message_date) = ?
-               GROUP BY s.id
-               HAVING AVG(sm.confidence) >= 0.2 OR COUNT(sm.id) >= 1
-               ORDER BY COUNT(sm.id) DESC""",
-            (report_date,),
-        )
-        rows = await cursor.fetchall()
-        return [dict(r) for r in rows]
+        # 읽기 전용 커넥션 풀 사용 → 날짜별 동시 조회가 실제로 병렬 실행
+        async with self.db.acquire_read() as conn:
+            built = await fetch_one(
+                conn,
+                "SELECT 1 FROM daily_rollup_built WHERE report_date = ?",
+                (report_date,),
+            )
+        # 집계가 없거나 언급이 추가/삭제되어 무효화된 날짜만 재계산
+        if built is None:
+            await self.refresh_daily_rollup(report_date)
+
+        async with self.db.acquire_read() as conn:
+            rows = await conn.execute_fetchall(
+                """SELECT
+                     s.id as stock_id, s.ticker, s.name_ko, s.name_en, s.market, s.exchange, s.industry,
+                     r.mention_count, r.aggregated_context, r.dominant_sentiment, r.avg_confidence
+                   FROM daily_stock_mentions_rollup r
+                   JOIN stocks s ON r.stock_id = s.id
+                   WHERE r.report_date = ?
+                   ORDER BY r.mention_count DESC, r.stock_id""",
+                (report_date,),
+            )
+            return [dict(r) for r in rows]
+
+    async def get_daily_stock_mentions_range(
+        self, start_date: str, end_date: str
+    ) -> dict[str, list[dict]]:
+        """start_date~end_date(포함) 날짜별 get_daily_stock_mentions 결과를 한 번에 조회."""
+        async with self.db.acquire_read() as conn:
+            rows = await conn.execute_fetchall(
+                """SELECT DISTINCT message_day FROM messages
+                   WHERE message_day BETWEEN ? AND ?
+                     AND message_day NOT IN (SELECT report_date FROM daily_rollup_built)""",
+                (start_date, end_date),
+            )
+            stale_days = [r[0] for r in rows]
+        for day in stale_days:
+            await self.refresh_daily_rollup(day)
+
+        async with self.db.acquire_read() as conn:
+            rows = await conn.execute_fetchall(
+                """SELECT
+                     r.report_date,
+                     s.id as stock_id, s.ticker, s.name_ko, s.name_en, s.market, s.exchange, s.industry,
+                     r.mention_count, r.aggregated_context, r.dominant_sentiment, r.avg_confidence
+                   FROM daily_stock_mentions_rollup r
+                   JOIN stocks s ON r.stock_id = s.id
+                   WHERE r.report_date BETWEEN ? AND ?
+                   ORDER BY r.report_date, r.mention_count DESC, r.stock_id""",
+                (start_date, end_date),
+            )
+
+        result: dict[str, list[dict]] = {}
+        for row in rows:
+            mention = dict(row)
+            result.setdefault(mention.pop("report_date"), []).append(mention)
+        return result
 
     # ── Theme operations ──
 
-    async def get_themes(self, market: Optional[str] = None) -> list[dict]:
-        conn = await self.db.get_connection()
+    async def get_themes(self, market: Optional[str] = None) -> list[aiosqlite.Row]:
+        if not _is_fresh(self._themes_cache):
+            async with self.db.acquire_read() as conn:
+                rows = await conn.execute_fetchall(
+                    "SELECT * FROM themes WHERE is_active = 1"
+                )
+                self._themes_cache = (time.monotonic(), rows)
+        themes = self._themes_cache[1]
         if market:
-            cursor = await conn.execute(
-                "SELECT * FROM themes WHERE is_active = 1 AND (market = ? OR market = 'BOTH')",
-                (market,),
-            )
-        else:
-            cursor = await conn.execute(
-                "SELECT * FROM themes WHERE is_active = 1"
-            )
-        rows = await cursor.fetchall()
-        return [dict(r) for r in rows]
+            return [t for t in themes if t["market"] in (market, "BOTH")]
+        return list(themes)
 
     async def get_or_create_theme(
         self,
@@ -247,64 +504,66 @@ class Repository:
         market: str,
         parent_id: Optional[int] = None,
     ) -> int:
-        conn = await self.db.get_connection()
-        cursor = await conn.execute(
-            "SELECT id FROM themes WHERE name_ko = ? AND market = ?",
-            (name_ko, market),
-        )
-        row = await cursor.fetchone()
-        if row:
-            return row["id"]
-
-        cursor = await conn.execute(
-            """INSERT INTO themes (name_ko, name_en, market, parent_id)
-               VALUES (?, ?, ?, ?)""",
-            (name_ko, name_en, market, parent_id),
-        )
-        await conn.commit()
-        return cursor.lastrowid
+        key = (name_ko, market)
+        cached = self._theme_id_cache.get(key)
+        if cached and (name_en is None or cached["name_en"] is not None):
+            return cached["id"]
+        async with self.db.write() as conn:
+            row = await fetch_one(
+                conn,
+                """INSERT INTO themes (name_ko, name_en, market, parent_id)
+                   VALUES (?, ?, ?, ?)
+                   ON CONFLICT(name_ko, market) DO UPDATE SET
+                     name_en = COALESCE(themes.name_en, excluded.name_en)
+                   RETURNING id, name_en""",
+                (name_ko, name_en, market, parent_id),
+            )
+        self._theme_id_cache[key] = dict(row)
+        self._themes_cache = None
+        return row["id"]
 
     # ── Daily classification operations ──
 
-    async def insert_daily_stock_theme(
-        self,
-        report_date: str,
-        stock_id: int,
-        theme_id: int,
-        mention_count: int = 1,
-        reason: Optional[str] = None,
-        sector: str = "other",
-    ):
-        conn = await self.db.get_connection()
-        await conn.execute(
-            """INSERT OR REPLACE INTO daily_stock_themes
+    async def insert_daily_stock_themes(self, rows: list[dict]) -> int:
+        """일일 종목-테마 배정 일괄 upsert (커밋 1회).
+
+        각 dict 키: report_date, stock_id, theme_id, mention_count, reason, sector.
+        """
+        return await self.db.executemany(
+            """INSERT INTO daily_stock_themes
                (report_date, stock_id, theme_id, mention_count, reason, sector)
-               VALUES (?, ?, ?, ?, ?, ?)""",
-            (report_date, stock_id, theme_id, mention_count, reason, sector),
+               VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT(report_date, stock_id, theme_id) DO UPDATE SET
+                 mention_count = excluded.mention_count,
+                 reason = excluded.reason,
+                 sector = excluded.sector,
+                 assigned_at = datetime('now')""",
+            [
+                (r["report_date"], r["stock_id"], r["theme_id"],
+                 r.get("mention_count", 1), r.get("reason"), r.get("sector", "other"))
+                for r in rows
+            ],
         )
-        await conn.commit()
 
     async def get_daily_classification(self, report_date: str) -> dict:
-        conn = await self.db.get_connection()
-        cursor = await conn.execute(
-            """SELECT
-                 dst.report_date, dst.mention_count, dst.reason, dst.sector,
-                 s.ticker, s.name_ko, s.name_en, s.market, s.exchange,
-                 t.name_ko as theme_name_ko, t.name_en as theme_name_en, t.market as theme_market
-               FROM daily_stock_themes dst
-               JOIN stocks s ON dst.stock_id = s.id
-               JOIN themes t ON dst.theme_id = t.id
-               WHERE dst.report_date = ?
-               ORDER BY t.market, t.name_ko, dst.mention_count DESC""",
-            (report_date,),
-        )
-        rows = await cursor.fetchall()
+        async with self.db.acquire_read() as conn:
+            rows = await conn.execute_fetchall(
+                """SELECT
+                     dst.report_date, dst.mention_count, dst.reason, dst.sector,
+                     s.ticker, s.name_ko, s.name_en, s.market, s.exchange,
+                     t.name_ko as theme_name_ko, t.name_en as theme_name_en, t.market as theme_market
+                   FROM daily_stock_themes dst
+                   JOIN stocks s ON dst.stock_id = s.id
+                   JOIN themes t ON dst.theme_id = t.id
+                   WHERE dst.report_date = ?
+                   ORDER BY t.market, t.name_ko, dst.mention_count DESC""",
+                (report_date,),
+            )
         if not rows:
             return {}
 
         result = {"kr": {}, "us": {}}
         for row in rows:
-            row = dict(row)
             market_key = "kr" if row["market"] == "KR" else "us"
             theme_name = row["theme_name_ko"]
             if theme_name not in result[market_key]:
@@ -312,7 +571,7 @@ class Repository:
             result[market_key][theme_name].append({
                 "name": row["name_ko"] or row["name_en"] or row["ticker"],
                 "ticker": row["ticker"],
-                "sector": row.get("sector", "other"),
+                "sector": row["sector"],
                 "reason": row["reason"] or "",
                 "mention_count": row["mention_count"],
             })
@@ -329,21 +588,57 @@ class Repository:
         telegram_sent: bool = False,
         csv_exported: bool = False,
     ):
-        conn = await self.db.get_connection()
-        await conn.execute(
-            """INSERT OR REPLACE INTO daily_reports
-               (report_date, total_messages_analyzed, total_stocks_found,
-                total_themes, telegram_sent, csv_exported)
-               VALUES (?, ?, ?, ?, ?, ?)""",
-            (report_date, total_messages, total_stocks, total_themes,
-             int(telegram_sent), int(csv_exported)),
-        )
-        await conn.commit()
+        async with self.db.write() as conn:
+            await conn.execute(
+                """INSERT INTO daily_reports
+                   (report_date, total_messages_analyzed, total_stocks_found,
+                    total_themes, telegram_sent, csv_exported)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(report_date) DO UPDATE SET
+                     total_messages_analyzed = excluded.total_messages_analyzed,
+                     total_stocks_found = excluded.total_stocks_found,
+                     total_themes = excluded.total_themes,
+                     telegram_sent = excluded.telegram_sent,
+                     csv_exported = excluded.csv_exported""",
+                (report_date, total_messages, total_stocks, total_themes,
+                 int(telegram_sent), int(csv_exported)),
+            )
 
     async def get_report_status(self, report_date: str) -> Optional[dict]:
-        conn = await self.db.get_connection()
-        cursor = await conn.execute(
-            "SELECT * FROM daily_reports WHERE report_date = ?", (report_date,)
-        )
-        row = await cursor.fetchone()
+        async with self.db.acquire_read() as conn:
+            row = await fetch_one(
+                conn,
+                "SELECT * FROM daily_reports WHERE report_date = ?",
+                (report_date,),
+            )
         return dict(row) if row else None
+
+    # ── LLM response cache ──
+
+    async def get_llm_cache(self, key: str, max_age_days: int) -> Optional[str]:
+        async with self.db.acquire_read() as conn:
+            row = await fetch_one(
+                conn,
+                """SELECT response FROM llm_cache
+                   WHERE key = ? AND created_at >= datetime('now', ?)""",
+                (key, f"-{max_age_days} days"),
+            )
+        return row["response"] if row else None
+
+    async def set_llm_cache(self, key: str, response: str):
+        async with self.transaction() as conn:
+            await conn.execute(
+                """INSERT INTO llm_cache (key, response) VALUES (?, ?)
+                   ON CONFLICT(key) DO UPDATE SET
+                     response = excluded.response,
+                     created_at = datetime('now')""",
+                (key, response),
+            )
+
+    async def purge_llm_cache(self, max_age_days: int) -> int:
+        async with self.transaction() as conn:
+            cursor = await conn.execute(
+                "DELETE FROM llm_cache WHERE created_at < datetime('now', ?)",
+                (f"-{max_age_days} days",),
+            )
+        return cursor.rowcount
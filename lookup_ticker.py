@@ -1,30 +1,30 @@
-"""티커 조회 도구: 분류 결과 및 동일 테마 종목 확인."""
+"""
+티커 조회 도구: 분류 결과 및 동일 테마 종목 확인.
+
+사용법:
+  python lookup_ticker.py ASML
+  python lookup_ticker.py --repl   # 한 줄에 티커 하나씩 연속 조회 (커넥션 재사용)
+"""
+import argparse
 import asyncio
 import sys
 
-from config.settings import Settings
-from db.database import Database
-from db.repository import Repository
+import aiosqlite
+
+from config.settings import get_settings
+from db.database import Database, fetch_one
 
 if sys.platform == "win32":
     sys.stdout.reconfigure(encoding="utf-8", errors="replace")
 
 
-async def lookup(ticker: str):
-    settings = Settings()
-    db = Database(settings.db_path)
-    await db.initialize()
-    repo = Repository(db)
-    conn = await db.get_connection()
-
+async def lookup(conn: aiosqlite.Connection, ticker: str):
     # 1) 종목 기본 정보
-    cursor = await conn.execute(
-        "SELECT * FROM stocks WHERE UPPER(ticker) = UPPER(?)", (ticker,)
+    stock = await fetch_one(
+        conn, "SELECT * FROM stocks WHERE UPPER(ticker) = UPPER(?)", (ticker,)
     )
-    stock = await cursor.fetchone()
     if not stock:
         print(f"'{ticker}' 종목을 찾을 수 없습니다.")
-        await db.close()
         return
 
     stock = dict(stock)
@@ -35,21 +35,35 @@ async def lookup(ticker: str):
     print(f"  업종(yfinance): {stock.get('industry') or '미조회'}")
     print(f"{'='*50}")
 
-    # 2) 일별 분류 결과
-    cursor = await conn.execute(
-        """SELECT dst.report_date, dst.sector, dst.mention_count, dst.reason,
-                  t.name_ko as theme_name
+    # 2) 일별 분류 이력 + 최신 날짜 기준 동일 테마 종목을 한 번에 조회
+    rows = await conn.execute_fetchall(
+        """WITH latest AS (
+             SELECT MAX(report_date) AS report_date
+             FROM daily_stock_themes WHERE stock_id = :stock_id
+           ),
+           my_themes AS (
+             SELECT theme_id FROM daily_stock_themes
+             WHERE stock_id = :stock_id
+               AND report_date = (SELECT report_date FROM latest)
+           )
+           SELECT dst.stock_id, dst.report_date, dst.sector, dst.mention_count, dst.reason,
+                  t.name_ko as theme_name,
+                  s.ticker, s.name_ko, s.name_en, s.industry
            FROM daily_stock_themes dst
            JOIN themes t ON dst.theme_id = t.id
-           WHERE dst.stock_id = ?
-           ORDER BY dst.report_date DESC""",
-        (stock["id"],),
+           JOIN stocks s ON dst.stock_id = s.id
+           WHERE dst.stock_id = :stock_id
+              OR (dst.report_date = (SELECT report_date FROM latest)
+                  AND dst.theme_id IN (SELECT theme_id FROM my_themes))
+           ORDER BY dst.report_date DESC, t.name_ko, dst.mention_count DESC""",
+        {"stock_id": stock["id"]},
     )
-    classifications = [dict(r) for r in await cursor.fetchall()]
+    classifications, peers = [], []
+    for r in rows:
+        (classifications if r["stock_id"] == stock["id"] else peers).append(dict(r))
 
     if not classifications:
         print("\n  분류 이력이 없습니다.")
-        await db.close()
         return
 
     print(f"\n  [분류 이력]")
@@ -61,51 +75,49 @@ async def lookup(ticker: str):
 
     # 3) 동일 테마 종목 (최신 날짜 기준)
     latest_date = classifications[0]["report_date"]
-    # 이 종목이 속한 테마 ID 목록
-    cursor = await conn.execute(
-        "SELECT DISTINCT theme_id FROM daily_stock_themes WHERE stock_id = ? AND report_date = ?",
-        (stock["id"], latest_date),
-    )
-    theme_ids = [r["theme_id"] for r in await cursor.fetchall()]
-
-    if theme_ids:
-        placeholders = ",".join("?" for _ in theme_ids)
-        cursor = await conn.execute(
-            f"""SELECT s.ticker, s.name_ko, s.name_en, s.market, s.industry,
-                       dst.sector, dst.mention_count, t.name_ko as theme_name
-                FROM daily_stock_themes dst
-                JOIN stocks s ON dst.stock_id = s.id
-                JOIN themes t ON dst.theme_id = t.id
-                WHERE dst.report_date = ?
-                  AND dst.theme_id IN ({placeholders})
-                  AND dst.stock_id != ?
-                ORDER BY t.name_ko, dst.mention_count DESC""",
-            [latest_date] + theme_ids + [stock["id"]],
-        )
-        peers = [dict(r) for r in await cursor.fetchall()]
-
-        print(f"\n  [동일 테마 종목] ({latest_date} 기준)")
-        if peers:
-            current_theme = None
-            for p in peers:
-                if p["theme_name"] != current_theme:
-                    current_theme = p["theme_name"]
-                    print(f"\n  ▸ {current_theme}")
-                pname = p.get("name_ko") or p.get("name_en") or p["ticker"]
-                ind = f" ({p['industry']})" if p.get("industry") else ""
-                print(f"    - {pname} ({p['ticker']}) [{p['sector']}] "
-                      f"언급 {p['mention_count']}회{ind}")
-        else:
-            print("    동일 테마에 다른 종목이 없습니다.")
+    print(f"\n  [동일 테마 종목] ({latest_date} 기준)")
+    if peers:
+        current_theme = None
+        for p in peers:
+            if p["theme_name"] != current_theme:
+                current_theme = p["theme_name"]
+                print(f"\n  ▸ {current_theme}")
+            pname = p.get("name_ko") or p.get("name_en") or p["ticker"]
+            ind = f" ({p['industry']})" if p.get("industry") else ""
+            print(f"    - {pname} ({p['ticker']}) [{p['sector']}] "
+                  f"언급 {p['mention_count']}회{ind}")
+    else:
+        print("    동일 테마에 다른 종목이 없습니다.")
 
     print()
-    await db.close()
+
+
+async def main(ticker: str | None, repl: bool):
+    settings = get_settings()
+    # 조회 전용: 쓰기 커넥션/마이그레이션 없이 읽기 전용 커넥션만 사용
+    db = Database(settings.db_path, read_only=True)
+    try:
+        async with db.acquire_read() as conn:
+            if ticker:
+                await lookup(conn, ticker)
+            if repl:
+                while line := await asyncio.to_thread(sys.stdin.readline):
+                    if line.strip():
+                        await lookup(conn, line.strip())
+    finally:
+        await db.close()
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("사용법: python lookup_ticker.py <TICKER>")
-        print("예시:   python lookup_ticker.py ASML")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="티커 조회 도구")
+    parser.add_argument("ticker", nargs="?", help="조회할 티커 (예: ASML)")
+    parser.add_argument(
+        "--repl",
+        action="store_true",
+        help="stdin에서 티커를 한 줄씩 읽어 연속 조회",
+    )
+    args = parser.parse_args()
+    if not args.ticker and not args.repl:
+        parser.error("티커 또는 --repl 중 하나가 필요합니다")
 
-    asyncio.run(lookup(sys.argv[1]))
+    asyncio.run(main(args.ticker, args.repl))
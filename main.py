@@ -4,10 +4,7 @@ import signal
 import sys
 from pathlib import Path
 
-# Add project root to path
-sys.path.insert(0, str(Path(__file__).parent))
-
-from config.settings import Settings
+from config.settings import get_settings
 from db.database import Database
 from db.migrations import run_migrations
 from db.repository import Repository
@@ -18,25 +15,17 @@ from src.collector import MessageCollector
 from src.pipeline import Pipeline
 from src.reporter import ReportGenerator
 from src.scheduler import TaskScheduler
+from utils.log_utils import setup_queued_logging
 from utils.rate_limiter import RateLimiter
 from utils.stock_registry import StockRegistry
 
 
 def setup_logging():
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s [%(name)s] %(levelname)s: %(message)s",
-        handlers=[
-            logging.StreamHandler(),
-            logging.FileHandler(
-                "theme_analyzer.log", encoding="utf-8"
-            ),
-        ],
+    setup_queued_logging(
+        Path("theme_analyzer.log"),
+        # Reduce noisy loggers
+        noisy_loggers=("telethon", "httpx", "apscheduler"),
     )
-    # Reduce noisy loggers
-    logging.getLogger("telethon").setLevel(logging.WARNING)
-    logging.getLogger("httpx").setLevel(logging.WARNING)
-    logging.getLogger("apscheduler").setLevel(logging.WARNING)
 
 
 async def main():
@@ -45,7 +34,7 @@ async def main():
     logger.info("Theme Analyzer starting...")
 
     # Load settings
-    settings = Settings()
+    settings = get_settings()
 
     # Ensure directories exist
     settings.image_dir.mkdir(parents=True, exist_ok=True)
@@ -53,7 +42,7 @@ async def main():
     settings.db_path.parent.mkdir(parents=True, exist_ok=True)
 
     # Initialize database
-    db = Database(settings.db_path)
+    db = Database(settings.db_path, settings.db_synchronous)
     await db.initialize()
     await run_migrations(db)
     repo = Repository(db)
@@ -61,6 +50,9 @@ async def main():
     # Rate limiter
     rate_limiter = RateLimiter()
     rate_limiter.add_bucket("claude", rate=settings.claude_rpm / 60, capacity=5)
+    rate_limiter.add_bucket(
+        "claude_tokens", rate=settings.claude_tpm / 60, capacity=settings.claude_tpm
+    )
     rate_limiter.add_bucket("telegram", rate=0.5, capacity=5)
 
     # Stock registry
@@ -93,14 +85,19 @@ async def main():
         logger.info("Shutdown signal received")
         shutdown_event.set()
 
+    loop = asyncio.get_running_loop()
     if sys.platform != "win32":
-        loop = asyncio.get_event_loop()
         loop.add_signal_handler(signal.SIGINT, handle_signal)
         loop.add_signal_handler(signal.SIGTERM, handle_signal)
+    else:
+        # Windows 루프는 add_signal_handler 미지원 → 시그널 핸들러에서 루프로 전달
+        signal.signal(
+            signal.SIGINT, lambda *_: loop.call_soon_threadsafe(handle_signal)
+        )
 
     try:
+        # run()은 폴링을 시작하고 바로 반환 → 종료 신호까지 대기
         await bot.run()
-        # On Windows, use keyboard interrupt
         await shutdown_event.wait()
     except KeyboardInterrupt:
         logger.info("KeyboardInterrupt received")
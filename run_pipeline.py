@@ -17,15 +17,16 @@ import asyncio
 import logging
 import sys
 from datetime import datetime, timedelta
-from pathlib import Path
 from zoneinfo import ZoneInfo
 
 sys.stdout.reconfigure(encoding="utf-8", errors="replace")
-sys.path.insert(0, str(Path(__file__).parent))
 
 KST = ZoneInfo("Asia/Seoul")
 
-from config.settings import Settings
+# 동시에 분류할 날짜 수
+DATE_CONCURRENCY = 3
+
+from config.settings import BASE_DIR, get_settings
 from db.database import Database
 from db.migrations import run_migrations
 from db.repository import Repository
@@ -33,27 +34,17 @@ from src.analyzer import StockAnalyzer
 from src.classifier import ThemeClassifier
 from src.collector import MessageCollector
 from src.reporter import ReportGenerator
+from utils.log_utils import setup_queued_logging
 from utils.rate_limiter import RateLimiter
 from utils.stock_registry import StockRegistry
 
 
 def setup_logging():
-    log_dir = Path(__file__).parent / "logs"
+    log_dir = BASE_DIR / "logs"
     log_dir.mkdir(exist_ok=True)
-
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s [%(name)s] %(levelname)s: %(message)s",
-        handlers=[
-            logging.StreamHandler(),
-            logging.FileHandler(
-                log_dir / f"pipeline_{datetime.now(KST).strftime('%Y%m%d_%H%M')}.log",
-                encoding="utf-8",
-            ),
-        ],
+    setup_queued_logging(
+        log_dir / f"pipeline_{datetime.now(KST).strftime('%Y%m%d_%H%M')}.log"
     )
-    logging.getLogger("telethon").setLevel(logging.WARNING)
-    logging.getLogger("httpx").setLevel(logging.WARNING)
 
 
 async def main(lookback_hours: int, skip_collect: bool):
@@ -64,20 +55,23 @@ async def main(lookback_hours: int, skip_collect: bool):
     logger.info(f"파이프라인 시작: {now.strftime('%Y-%m-%d %H:%M KST')}")
     logger.info(f"lookback: {lookback_hours}시간, skip_collect: {skip_collect}")
 
-    settings = Settings()
+    settings = get_settings()
     settings.lookback_hours = lookback_hours
 
     settings.image_dir.mkdir(parents=True, exist_ok=True)
     settings.export_dir.mkdir(parents=True, exist_ok=True)
     settings.db_path.parent.mkdir(parents=True, exist_ok=True)
 
-    db = Database(settings.db_path)
+    db = Database(settings.db_path, settings.db_synchronous)
     await db.initialize()
     await run_migrations(db)
     repo = Repository(db)
 
     rate_limiter = RateLimiter()
     rate_limiter.add_bucket("claude", rate=settings.claude_rpm / 60, capacity=5)
+    rate_limiter.add_bucket(
+        "claude_tokens", rate=settings.claude_tpm / 60, capacity=settings.claude_tpm
+    )
     rate_limiter.add_bucket("telegram", rate=0.5, capacity=5)
 
     registry = StockRegistry(repo)
@@ -131,27 +125,36 @@ async def main(lookback_hours: int, skip_collect: bool):
             dates.append(d.strftime("%Y-%m-%d"))
         dates.reverse()
 
-        all_classification = {"kr": {}, "us": {}}
+        # lookback 전체의 날짜별 종목 언급을 한 번에 조회 → 언급 있는 날짜만 분류
+        mentions_by_date = await repo.get_daily_stock_mentions_range(dates[0], dates[-1])
+        dates = [d for d in dates if mentions_by_date.get(d)]
 
-        for report_date in dates:
-            mentions = await repo.get_daily_stock_mentions(report_date)
-            if not mentions:
-                continue
+        # 날짜별 분류는 서로 독립 → 동시 실행 (Claude RPM은 RateLimiter가 제한)
+        sem = asyncio.Semaphore(DATE_CONCURRENCY)
 
-            logger.info(f"[{report_date}] 종목 {len(mentions)}개 → 분류")
-            classification = await classifier.classify_daily(report_date)
+        async def _classify_date(report_date: str) -> dict:
+            async with sem:
+                logger.info(
+                    f"[{report_date}] 종목 {len(mentions_by_date[report_date])}개 → 분류"
+                )
+                return await classifier.classify_daily(report_date)
+
+        classifications = await asyncio.gather(*(_classify_date(d) for d in dates))
+
+        # 병합은 날짜순으로 (먼저 나온 날짜의 종목 순서 유지)
+        all_classification = {"kr": {}, "us": {}}
+        # 테마별 이미 담긴 티커 (병합 중 점진적으로 갱신)
+        seen: dict[str, dict[str, set[str]]] = {"kr": {}, "us": {}}
 
+        for classification in classifications:
             for market in ["kr", "us"]:
                 for theme, stocks in classification.get(market, {}).items():
-                    if theme not in all_classification[market]:
-                        all_classification[market][theme] = stocks
-                    else:
-                        existing_tickers = {
-                            s["ticker"] for s in all_classification[market][theme]
-                        }
-                        for s in stocks:
-                            if s["ticker"] not in existing_tickers:
-                                all_classification[market][theme].append(s)
+                    merged = all_classification[market].setdefault(theme, [])
+                    tickers = seen[market].setdefault(theme, set())
+                    for s in stocks:
+                        if s["ticker"] not in tickers:
+                            tickers.add(s["ticker"])
+                            merged.append(s)
 
         # ── Step 4: 리포트 + CSV ──
         logger.info("=" * 60)
@@ -162,8 +165,8 @@ async def main(lookback_hours: int, skip_collect: bool):
             report_date, all_classification
         )
 
-        total_kr = sum(len(v) for v in all_classification.get("kr", {}).values())
-        total_us = sum(len(v) for v in all_classification.get("us", {}).values())
+        total_kr = sum(map(len, all_classification["kr"].values()))
+        total_us = sum(map(len, all_classification["us"].values()))
         kr_themes = len(all_classification.get("kr", {}))
         us_themes = len(all_classification.get("us", {}))
 
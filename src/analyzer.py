@@ -1,18 +1,47 @@
-import json
+import asyncio
 import logging
+import re
 from pathlib import Path
 
-import anthropic
+import orjson
+from pydantic import TypeAdapter, ValidationError
+from typing_extensions import Required, TypedDict
 
 from config.settings import Settings
 from db.repository import Repository
-from utils.image_utils import image_to_base64, resize_if_needed
+from utils.claude_utils import cached_system, create_message, make_client
+from utils.image_utils import load_for_vision
 from utils.rate_limiter import RateLimiter
 from utils.stock_registry import StockRegistry
 
 logger = logging.getLogger(__name__)
 
-TEXT_ANALYSIS_PROMPT = """다음은 한국/미국 주식 관련 텔레그램 채널 메시지들입니다.
+# 이보다 긴 응답은 JSON 파싱(정규식 + 재시도)을 스레드에서 실행해 이벤트 루프를 막지 않음
+PARSE_IN_THREAD_THRESHOLD = 8192
+
+_JSON_ARRAY_RE = re.compile(r"\[.*\]", re.DOTALL)
+# 첫 줄 ```json / 마지막 줄 ``` (markdown 코드 펜스)
+_FENCE_RE = re.compile(r"\A```[^\n]*(?:\n|\Z)|\n[ \t]*```[^\n]*\Z")
+
+
+# Claude 응답 스키마. validate_json이 JSON 파싱과 타입 검증을 pydantic-core에서 한 번에 처리
+class _StockInfo(TypedDict, total=False):
+    name: Required[str]
+    market: str
+    context: str
+    sentiment: str
+
+
+class _TextItem(TypedDict, total=False):
+    msg_id: Required[int]
+    stocks: list[_StockInfo]
+
+
+_TEXT_RESULT = TypeAdapter(list[_TextItem])
+_IMAGE_RESULT = TypeAdapter(list[_StockInfo])
+
+# 정적 지시문은 system 프롬프트로 분리해 prompt caching 적용 (배치마다 동일)
+TEXT_ANALYSIS_SYSTEM_PROMPT = """다음은 한국/미국 주식 관련 텔레그램 채널 메시지들입니다.
 각 메시지에서 언급된 종목을 추출해주세요.
 
 규칙:
@@ -26,25 +55,26 @@ TEXT_ANALYSIS_PROMPT = """다음은 한국/미국 주식 관련 텔레그램 채
 5. 한국 종목은 한글 정식명으로 표기
 6. 종목이 없는 메시지는 빈 배열로 반환
 
-메시지들:
-{messages}
-
 반드시 아래 JSON 형식으로만 응답하세요. 다른 텍스트는 포함하지 마세요:
 [
-  {{
+  {
     "msg_id": <메시지 ID>,
     "stocks": [
-      {{
+      {
         "name": "<종목명 또는 티커>",
         "market": "KR" 또는 "US",
         "context": "<언급 맥락 1줄>",
         "sentiment": "positive" 또는 "negative" 또는 "neutral"
-      }}
+      }
     ]
-  }}
+  }
 ]"""
 
-IMAGE_ANALYSIS_PROMPT = """이 이미지는 주식 관련 텔레그램 채널에서 공유된 것입니다.
+TEXT_ANALYSIS_USER_PROMPT = """메시지들:
+{messages}"""
+_USER_PROMPT_PREFIX, _USER_PROMPT_SUFFIX = TEXT_ANALYSIS_USER_PROMPT.split("{messages}")
+
+IMAGE_ANALYSIS_SYSTEM_PROMPT = """이 이미지는 주식 관련 텔레그램 채널에서 공유된 것입니다.
 이미지에서 다음 정보를 추출해주세요:
 
 1. 보이는 모든 종목명/티커
@@ -68,6 +98,16 @@ IMAGE_ANALYSIS_PROMPT = """이 이미지는 주식 관련 텔레그램 채널에
   }
 ]"""
 
+IMAGE_ANALYSIS_USER_PROMPT = "이 이미지에서 종목 정보를 추출해주세요."
+
+
+# 이미지 분석 결과를 DB에 반영하는 단위 (이미지 수)
+ANALYZED_FLUSH_SIZE = 100
+# 실행당 조회할 미분석 메시지 수 (텍스트+이미지 합산)
+UNANALYZED_FETCH_LIMIT = 1000
+# Vision 슬롯을 기다리는 동안 미리 리사이즈/인코딩해 둘 이미지 수 (메모리 상한 겸용)
+IMAGE_PREPARE_AHEAD = 4
+
 
 class StockAnalyzer:
     def __init__(
@@ -81,52 +121,101 @@ class StockAnalyzer:
         self.repo = repo
         self.registry = registry
         self.rate_limiter = rate_limiter
-        self.client = anthropic.AsyncAnthropic(api_key=settings.anthropic_api_key)
+        self.client = make_client(settings.anthropic_api_key)
+        # (종목명, 시장) → stock_id. 해석 실패(None)도 저장해 재시도하지 않음. 실행마다 초기화
+        self._resolve_cache: dict[tuple[str, str], int | None] = {}
 
     async def analyze_pending_messages(self) -> dict:
-        text_msgs = await self.repo.get_unanalyzed_messages(has_image=False)
-        image_msgs = await self.repo.get_unanalyzed_messages(has_image=True)
+        self._resolve_cache.clear()
+        # 미분석 메시지를 한 번에 조회한 뒤 한 번의 순회로 분류
+        # text → 텍스트 배치, 이미지+텍스트 → 텍스트 배치, 이미지만 → Vision API
+        text_msgs, image_with_text, image_only = [], [], []
+        for m in await self.repo.get_unanalyzed_messages(limit=UNANALYZED_FETCH_LIMIT):
+            if not m["has_image"]:
+                text_msgs.append(m)
+            elif (m["message_text"] or "").strip():
+                image_with_text.append(m)
+            else:
+                image_only.append(m)
+        image_count = len(image_with_text) + len(image_only)
 
         logger.info(
-            f"Analyzing {len(text_msgs)} text + {len(image_msgs)} image messages"
+            f"Analyzing {len(text_msgs)} text + {image_count} image messages"
         )
 
-        total_stocks = 0
-        errors = 0
+        # 배치/이미지를 동시에 최대 claude_concurrency개 진행 (RPM은 RateLimiter가 제한)
+        sem = asyncio.Semaphore(self.settings.claude_concurrency)
+        bs = self.settings.batch_size
 
-        # Process text in batches
-        for i in range(0, len(text_msgs), self.settings.batch_size):
-            batch = text_msgs[i : i + self.settings.batch_size]
-            try:
-                count = await self._analyze_text_batch(batch)
-                total_stocks += count
-            except Exception as e:
-                logger.error(f"Text batch analysis error: {e}")
-                errors += 1
-
-        # Process images: text-with-image → text batch, image-only → Vision API
-        image_with_text = [m for m in image_msgs if m.get("message_text", "").strip()]
-        image_only = [m for m in image_msgs if not m.get("message_text", "").strip()]
-
-        # Images with text: just analyze the text (cheap, Haiku)
-        if image_with_text:
-            for i in range(0, len(image_with_text), self.settings.batch_size):
-                batch = image_with_text[i : i + self.settings.batch_size]
+        async def _run_text(batch: list, label: str) -> int:
+            async with sem:
                 try:
-                    count = await self._analyze_text_batch(batch)
-                    total_stocks += count
+                    return await self._analyze_text_batch(batch)
                 except Exception as e:
-                    logger.error(f"Image-text batch error: {e}")
-                    errors += 1
+                    logger.error(f"{label} analysis error: {e}")
+                    raise
+
+        # Text in batches + images with text: just analyze the text (cheap, Haiku)
+        tasks = [
+            _run_text(text_msgs[i : i + bs], "Text batch")
+            for i in range(0, len(text_msgs), bs)
+        ] + [
+            _run_text(image_with_text[i : i + bs], "Image-text batch")
+            for i in range(0, len(image_with_text), bs)
+        ]
 
         # Images without text: use Vision API (selective)
-        for msg in image_only:
-            try:
-                count = await self._analyze_image(msg)
-                total_stocks += count
-            except Exception as e:
-                logger.error(f"Image analysis error (msg {msg['id']}): {e}")
-                errors += 1
+        # 결과 저장 + analyzed 표시는 ANALYZED_FLUSH_SIZE개 이미지마다 한 트랜잭션으로
+        pending_ids: list[int] = []
+        pending_mentions: list[dict] = []
+
+        async def _flush_pending():
+            # 저장 중 다른 태스크가 추가하는 결과와 섞이지 않도록 먼저 떼어냄
+            ids, mentions = pending_ids[:], pending_mentions[:]
+            pending_ids.clear()
+            pending_mentions.clear()
+            await self._flush_image_results(ids, mentions)
+
+        vision_sem = asyncio.Semaphore(self.settings.claude_vision_concurrency)
+        # 인코딩 단계 → API 단계 사이 버퍼: 인코딩을 마치고 슬롯을 기다리는 이미지는 최대 이 개수
+        prepare_sem = asyncio.Semaphore(IMAGE_PREPARE_AHEAD)
+
+        async def _run_image(msg) -> int:
+            # 파일이 없거나 비어 있으면 슬롯/레이트 리밋을 기다리지 않고 바로 analyzed 처리
+            if not msg["image_path"] or not self._image_usable(Path(msg["image_path"])):
+                mentions = []
+            else:
+                try:
+                    # 앞선 이미지의 API 호출과 겹치도록 슬롯을 잡기 전에 인코딩
+                    async with prepare_sem:
+                        image = await asyncio.to_thread(
+                            load_for_vision,
+                            Path(msg["image_path"]),
+                            self.settings.max_image_size_kb,
+                        )
+                        await vision_sem.acquire()
+                    try:
+                        async with sem:
+                            mentions = await self._analyze_image(msg, image)
+                    finally:
+                        vision_sem.release()
+                except Exception as e:
+                    logger.error(f"Image analysis error (msg {msg['id']}): {e}")
+                    raise
+            pending_mentions.extend(mentions)
+            pending_ids.append(msg["id"])
+            if len(pending_ids) >= ANALYZED_FLUSH_SIZE:
+                await _flush_pending()
+            return len(mentions)
+
+        tasks += [_run_image(m) for m in image_only]
+        try:
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            await _flush_pending()
+
+        total_stocks = sum(r for r in results if not isinstance(r, BaseException))
+        errors = sum(1 for r in results if isinstance(r, BaseException))
 
         logger.info(
             f"Image split: {len(image_with_text)} text-analyzed, "
@@ -135,7 +224,7 @@ class StockAnalyzer:
 
         stats = {
             "text_messages": len(text_msgs),
-            "image_messages": len(image_msgs),
+            "image_messages": image_count,
             "stocks_extracted": total_stocks,
             "errors": errors,
         }
@@ -146,16 +235,22 @@ class StockAnalyzer:
         if not messages:
             return 0
 
-        combined = "\n---\n".join(
-            f"[MSG_ID:{m['id']}] {m['message_text']}" for m in messages
-        )
-
-        prompt = TEXT_ANALYSIS_PROMPT.format(messages=combined)
-
-        await self.rate_limiter.acquire("claude")
-        response = await self.client.messages.create(
+        # 템플릿 앞/뒤 + 메시지들을 한 번의 join으로 (배치 문자열 중간 복사 없음)
+        parts = [_USER_PROMPT_PREFIX]
+        for m in messages:
+            parts.append(f"[MSG_ID:{m['id']}] {m['message_text']}")
+            parts.append("\n---\n")
+        parts[-1] = _USER_PROMPT_SUFFIX
+        prompt = "".join(parts)
+
+        response = await create_message(
+            self.client,
+            self.rate_limiter,
             model=self.settings.claude_model,
             max_tokens=self.settings.claude_max_tokens,
+            system=cached_system(
+                TEXT_ANALYSIS_SYSTEM_PROMPT, self.settings.claude_cache_ttl
+            ),
             messages=[{"role": "user", "content": prompt}],
         )
 
@@ -171,7 +266,7 @@ class StockAnalyzer:
             return count1 + count2
 
         raw_text = response.content[0].text.strip()
-        parsed = self._parse_json_response(raw_text)
+        parsed = await self._parse_json_response(raw_text, _TEXT_RESULT)
         if parsed is None:
             logger.warning(f"Failed to parse text analysis response")
             return 0
@@ -179,42 +274,67 @@ class StockAnalyzer:
         # 배치 내 유효한 msg_id 집합
         valid_ids = {m["id"] for m in messages}
 
-        stock_count = 0
+        stock_infos = []
         for item in parsed:
             msg_id = item.get("msg_id")
             # Claude가 반환한 msg_id가 이 배치에 없으면 무시
             if msg_id not in valid_ids:
-                logger.debug(
-                    f"msg_id {msg_id} not in batch {valid_ids}, skipping"
-                )
+                logger.debug(f"msg_id {msg_id} not in batch {valid_ids}, skipping")
                 continue
-            for stock_info in item.get("stocks", []):
-                saved = await self._save_stock_mention(
-                    message_id=msg_id,
-                    stock_info=stock_info,
-                )
-                if saved:
-                    stock_count += 1
-
-        # Mark messages as analyzed
-        all_ids = [m["id"] for m in messages]
-        await self.repo.mark_messages_analyzed(all_ids)
-        return stock_count
-
-    async def _analyze_image(self, message: dict) -> int:
-        image_path = Path(message["image_path"])
-        if not image_path.exists():
+            stock_infos.extend((msg_id, s) for s in item.get("stocks", []))
+        # 종목 해석(퍼지 매칭/조회/upsert)은 트랜잭션 밖에서 → 동시 배치가 락에서 줄서지 않음.
+        # 종목 upsert는 멱등이라 아래 트랜잭션이 롤백되어도 함께 되돌릴 필요 없음
+        mentions = await self._build_stock_mentions(stock_infos)
+
+        # 배치 결과 저장 + analyzed 표시를 한 트랜잭션으로 (커밋 1회)
+        async with self.repo.transaction():
+            await self.repo.insert_stock_mentions(mentions, batch_mode=True)
+
+            # Mark messages as analyzed
+            all_ids = [m["id"] for m in messages]
+            await self.repo.mark_messages_analyzed(all_ids)
+        return len(mentions)
+
+    async def _flush_image_results(
+        self, message_ids: list[int], mentions: list[dict]
+    ):
+        """모아둔 이미지 분석 결과를 저장하고 analyzed 표시 (커밋 1회)."""
+        if not message_ids:
+            return
+        async with self.repo.transaction():
+            await self.repo.insert_stock_mentions(mentions, batch_mode=True)
+            await self.repo.mark_messages_analyzed(message_ids)
+
+    @staticmethod
+    def _image_usable(image_path: Path) -> bool:
+        """Vision 요청할 수 있는 이미지인지 (stat 1회로 존재 + 빈 파일 확인)."""
+        try:
+            size = image_path.stat().st_size
+        except OSError:
             logger.warning(f"Image not found: {image_path}")
-            await self.repo.mark_message_analyzed(message["id"])
-            return 0
+            return False
+        if size == 0:
+            logger.warning(f"Image is empty: {image_path}")
+            return False
+        return True
 
-        image_path = resize_if_needed(image_path, self.settings.max_image_size_kb)
-        image_data, media_type = image_to_base64(image_path)
+    async def _analyze_image(
+        self, message: dict, image: tuple[str, str]
+    ) -> list[dict]:
+        """이미지에서 종목 언급 row 목록 추출. 저장은 호출 측에서 일괄 처리.
 
-        await self.rate_limiter.acquire("claude")
-        response = await self.client.messages.create(
+        image는 load_for_vision 결과 (base64, media_type). 파일 확인/인코딩은 호출 측에서 수행.
+        """
+        image_data, media_type = image
+
+        response = await create_message(
+            self.client,
+            self.rate_limiter,
             model=self.settings.claude_vision_model,
             max_tokens=self.settings.claude_max_tokens,
+            system=cached_system(
+                IMAGE_ANALYSIS_SYSTEM_PROMPT, self.settings.claude_cache_ttl
+            ),
             messages=[
                 {
                     "role": "user",
@@ -227,104 +347,134 @@ class StockAnalyzer:
                                 "data": image_data,
                             },
                         },
-                        {"type": "text", "text": IMAGE_ANALYSIS_PROMPT},
+                        {"type": "text", "text": IMAGE_ANALYSIS_USER_PROMPT},
                     ],
                 }
             ],
         )
 
         raw_text = response.content[0].text.strip()
-        parsed = self._parse_json_response(raw_text)
+        parsed = await self._parse_json_response(raw_text, _IMAGE_RESULT)
         if parsed is None:
             logger.warning(f"Failed to parse image analysis for msg {message['id']}")
-            await self.repo.mark_message_analyzed(message["id"])
-            return 0
-
-        stock_count = 0
-        for stock_info in parsed:
-            saved = await self._save_stock_mention(
-                message_id=message["id"],
-                stock_info=stock_info,
-            )
-            if saved:
-                stock_count += 1
+            return []
 
         # Also analyze text if present
-        if message.get("message_text"):
+        if message["message_text"]:
             # Text accompanying the image - extract from it too
             pass
 
-        await self.repo.mark_message_analyzed(message["id"])
-        return stock_count
-
-    async def _save_stock_mention(self, message_id: int, stock_info: dict) -> bool:
-        name = stock_info.get("name", "").strip()
-        market = stock_info.get("market", "KR")
-        context = stock_info.get("context", "")
-        sentiment = stock_info.get("sentiment", "neutral")
-
-        if not name:
-            return False
-
-        stock_id = await self.registry.resolve_stock(name, market)
-        if stock_id is None:
-            logger.debug(f"Could not resolve stock: {name} ({market})")
-            return False
-
-        await self.repo.insert_stock_mention(
-            message_id=message_id,
-            stock_id=stock_id,
-            mention_context=context,
-            sentiment=sentiment,
-            confidence=0.8,
-        )
-        return True
-
-    def _parse_json_response(self, text: str) -> list | None:
-        import re
-
+        return await self._build_stock_mentions([(message["id"], s) for s in parsed])
+
+    async def _build_stock_mentions(
+        self, stock_infos: list[tuple[int, dict]]
+    ) -> list[dict]:
+        """(message_id, 종목 정보) 목록을 insert_stock_mentions용 row로 변환.
+
+        처음 보는 (종목명, 시장)만 모아 resolve_many 한 번으로 해석. 해석 실패는 제외.
+        """
+        keyed = []
+        for message_id, stock_info in stock_infos:
+            name = stock_info.get("name", "").strip()
+            if name:
+                keyed.append((message_id, (name, stock_info.get("market", "KR")), stock_info))
+
+        resolved: dict[tuple[str, str], int | None] = {}
+        wanted = set()
+        for _, key, _ in keyed:
+            if key in self._resolve_cache:
+                resolved[key] = self._resolve_cache[key]
+            else:
+                wanted.add(key)
+        if wanted:
+            new_ids = await self.registry.resolve_many(list(wanted))
+            self._resolve_cache.update(new_ids)
+            resolved.update(new_ids)
+
+        mentions = []
+        for message_id, key, stock_info in keyed:
+            stock_id = resolved[key]
+            if stock_id is None:
+                logger.debug(f"Could not resolve stock: {key[0]} ({key[1]})")
+                continue
+            mentions.append({
+                "message_id": message_id,
+                "stock_id": stock_id,
+                "mention_context": stock_info.get("context", ""),
+                "sentiment": stock_info.get("sentiment", "neutral"),
+                "confidence": 0.8,
+            })
+        return mentions
+
+    async def _parse_json_response(
+        self, text: str, schema: TypeAdapter
+    ) -> list | None:
+        if len(text) > PARSE_IN_THREAD_THRESHOLD:
+            return await asyncio.to_thread(self._parse_json_sync, text, schema)
+        return self._parse_json_sync(text, schema)
+
+    @classmethod
+    def _parse_json_sync(cls, text: str, schema: TypeAdapter) -> list | None:
+        """응답을 schema(list[...])로 파싱 + 검증. 형식이 어긋난 항목은 버림."""
         text = text.strip()
 
         # Remove markdown code fences
         if text.startswith("```"):
-            lines = text.split("\n")
-            lines = lines[1:]
-            if lines and lines[-1].strip().startswith("```"):
-                lines = lines[:-1]
-            text = "\n".join(lines).strip()
+            text = _FENCE_RE.sub("", text).strip()
 
+        if not text:
+            return None
+
+        # 정상 응답: 파싱과 검증을 한 번에
+        try:
+            return schema.validate_json(text)
+        except ValidationError:
+            pass
+
+        parsed = cls._recover_json(text)
+        if not isinstance(parsed, list):
+            logger.warning(f"Cannot parse JSON: {text[:300]}...")
+            return None
+
+        # 항목 단위로 검증해 올바른 것만 남김
+        valid = []
+        for item in parsed:
+            try:
+                valid += schema.validate_python([item])
+            except ValidationError:
+                logger.debug(f"Skipping malformed item: {str(item)[:200]}")
+        return valid
+
+    @staticmethod
+    def _recover_json(text: str) -> list | dict | None:
+        """잘리거나 앞뒤에 설명이 붙은 JSON 응답 복구. 실패 시 None."""
         # 1) Direct parse
+        data = text.encode()
         try:
-            return json.loads(text)
-        except json.JSONDecodeError:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
             pass
 
+        # 첫 글자로 시도할 복구 경로를 좁힘 ('[' → 배열/잘림 복구, 그 외 → 본문에서 추출)
+        first = text[0]
+
         # 2) Extract JSON array
-        match = re.search(r"\[.*\]", text, re.DOTALL)
-        if match:
-            try:
-                return json.loads(match.group())
-            except json.JSONDecodeError:
-                pass
+        if first != "{":
+            match = _JSON_ARRAY_RE.search(text)
+            if match:
+                try:
+                    return orjson.loads(match.group())
+                except orjson.JSONDecodeError:
+                    pass
 
-        # 3) Extract JSON object (for classifier responses)
-        match = re.search(r"\{.*\}", text, re.DOTALL)
-        if match:
-            try:
-                result = json.loads(match.group())
-                if isinstance(result, dict):
-                    return result
-            except json.JSONDecodeError:
-                pass
-
-        # 4) Try to fix truncated JSON by closing brackets
-        for suffix in ["]", "}]", "}]}]", '"}]']:
-            try:
-                result = json.loads(text + suffix)
-                if isinstance(result, list):
-                    return result
-            except json.JSONDecodeError:
-                continue
+        # 3) Try to fix truncated JSON by closing brackets (배열로 시작할 때만 list가 될 수 있음)
+        if first == "[":
+            for suffix in [b"]", b"}]", b"}]}]", b'"}]']:
+                try:
+                    result = orjson.loads(data + suffix)
+                    if isinstance(result, list):
+                        return result
+                except orjson.JSONDecodeError:
+                    continue
 
-        logger.warning(f"Cannot parse JSON: {text[:300]}...")
         return None
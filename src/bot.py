@@ -1,21 +1,55 @@
+import asyncio
+import gzip
 import logging
 import re
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
 from zoneinfo import ZoneInfo
 
 KST = ZoneInfo("Asia/Seoul")
 
-import yaml
 from telegram import Update
+from telegram.error import RetryAfter
 from telegram.ext import Application, CommandHandler, ContextTypes
 
 from config.settings import Settings
 from db.repository import Repository
 from src.reporter import ReportGenerator
+from utils.yaml_utils import load_yaml, save_yaml
 
 logger = logging.getLogger(__name__)
 
+_TME_URL_RE = re.compile(r"https?://t\.me/([a-zA-Z0-9_]+)")
+
+# 전송이 RetryAfter(채팅별 한도: 약 1msg/s, 그룹은 20msg/분)로 거부될 때 재시도 횟수
+TELEGRAM_SEND_RETRIES = 3
+
+# 이보다 큰 CSV는 gzip으로 압축해 전송 (텍스트 CSV는 업로드 바이트가 크게 줄어듦)
+CSV_GZIP_THRESHOLD = 5 * 1024 * 1024
+
+
+def _load_csv_document(path: Path) -> tuple[bytes, str]:
+    """전송할 (바이트, 파일명). 큰 파일은 .gz로 압축. 워커 스레드에서 호출."""
+    data = path.read_bytes()
+    if len(data) > CSV_GZIP_THRESHOLD:
+        return gzip.compress(data, compresslevel=6), f"{path.name}.gz"
+    return data, path.name
+
+
+async def _with_retry_after(send):
+    """send()를 호출하고 RetryAfter면 안내된 시간만큼 기다린 뒤 재시도."""
+    for attempt in range(TELEGRAM_SEND_RETRIES):
+        try:
+            return await send()
+        except RetryAfter as e:
+            if attempt == TELEGRAM_SEND_RETRIES - 1:
+                raise
+            delay = e.retry_after
+            if isinstance(delay, timedelta):
+                delay = delay.total_seconds()
+            logger.warning(f"Telegram rate limited, retrying in {delay:.0f}s")
+            await asyncio.sleep(delay)
+
 
 class ThemeAnalyzerBot:
     def __init__(
@@ -48,24 +82,37 @@ class ThemeAnalyzerBot:
         self.app.add_handler(CommandHandler("list", self._cmd_channels))
         logger.info("Bot initialized")
 
-    async def send_daily_report(self, message: str, csv_path: Path | None = None):
+    async def send_daily_report(self, message: str, csv_path: Path | None = None) -> bool:
+        """리포트 조각을 순서대로 보내고 CSV 첨부. 모든 조각이 전송됐으면 True.
+
+        한 채팅으로 보내므로 동시 전송 대신 순차 전송 (채팅별 한도가 적용됨).
+        일부 조각이 실패해도 나머지 조각과 CSV는 계속 보냄.
+        """
         bot = self.app.bot
+        chat_id = self.settings.telegram_report_chat_id
         chunks = ReportGenerator.split_message(message, 4096)
-        for chunk in chunks:
-            await bot.send_message(
-                chat_id=self.settings.telegram_report_chat_id,
-                text=chunk,
-                parse_mode="HTML",
-            )
+        failed = 0
+        for i, chunk in enumerate(chunks, 1):
+            try:
+                await _with_retry_after(
+                    lambda: bot.send_message(chat_id=chat_id, text=chunk, parse_mode="HTML")
+                )
+            except Exception as e:
+                failed += 1
+                logger.error(f"Failed to send report chunk {i}/{len(chunks)}: {e}")
 
         if csv_path and csv_path.exists():
-            with open(csv_path, "rb") as f:
-                await bot.send_document(
-                    chat_id=self.settings.telegram_report_chat_id,
-                    document=f,
-                    filename=csv_path.name,
+            # 파일 읽기는 워커 스레드에서 (이벤트 루프 블로킹 방지)
+            data, filename = await asyncio.to_thread(_load_csv_document, csv_path)
+            await _with_retry_after(
+                lambda: bot.send_document(
+                    chat_id=chat_id,
+                    document=data,
+                    filename=filename,
                     caption="📎 일일 테마 리포트 CSV",
                 )
+            )
+        return failed == 0
 
     async def _cmd_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(
@@ -114,7 +161,7 @@ class ThemeAnalyzerBot:
         if us_themes:
             lines.append("<b>🇺🇸 미국</b>")
             for t in us_themes:
-                name = t.get("name_en") or t["name_ko"]
+                name = t["name_en"] or t["name_ko"]
                 lines.append(f"  • {name}")
 
         await update.message.reply_text("\n".join(lines), parse_mode="HTML")
@@ -140,26 +187,20 @@ class ThemeAnalyzerBot:
 
     async def _cmd_csv(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Send both strength and history CSVs
-        strength_path = self.settings.export_dir / "themes_strength.csv"
-        history_path = self.settings.export_dir / "themes_history.csv"
+        csv_files = [
+            ("themes_strength.csv", "📎 종목 강도 점수 (시간 가중)"),
+            ("themes_history.csv", "📎 일별 누적 히스토리"),
+        ]
 
         sent = False
-        if strength_path.exists():
-            with open(strength_path, "rb") as f:
-                await update.message.reply_document(
-                    document=f,
-                    filename=strength_path.name,
-                    caption="📎 종목 강도 점수 (시간 가중)",
-                )
-            sent = True
-
-        if history_path.exists():
-            with open(history_path, "rb") as f:
-                await update.message.reply_document(
-                    document=f,
-                    filename=history_path.name,
-                    caption="📎 일별 누적 히스토리",
-                )
+        for name, caption in csv_files:
+            path = self.settings.export_dir / name
+            if not path.exists():
+                continue
+            data, filename = await asyncio.to_thread(_load_csv_document, path)
+            await update.message.reply_document(
+                document=data, filename=filename, caption=caption
+            )
             sent = True
 
         if not sent:
@@ -193,7 +234,7 @@ class ThemeAnalyzerBot:
     def _parse_username(raw: str) -> str:
         """Extract username from various formats: URL, @username, plain username."""
         # https://t.me/username or http://t.me/username
-        m = re.match(r"https?://t\.me/([a-zA-Z0-9_]+)", raw)
+        m = _TME_URL_RE.match(raw)
         if m:
             return m.group(1)
         return raw.lstrip("@")
@@ -222,7 +263,7 @@ class ThemeAnalyzerBot:
         if existing and not existing[0].get("is_active"):
             # Reactivate
             await self.repo.activate_channel(username)
-            self._sync_yaml_add(username, market_focus)
+            await asyncio.to_thread(self._sync_yaml_add_sync, username, market_focus)
             await update.message.reply_text(f"✅ @{username} 채널을 다시 활성화했습니다.")
             return
 
@@ -235,7 +276,7 @@ class ThemeAnalyzerBot:
                 market_focus=market_focus,
                 language="ko",
             )
-            self._sync_yaml_add(username, market_focus)
+            await asyncio.to_thread(self._sync_yaml_add_sync, username, market_focus)
             await update.message.reply_text(
                 f"✅ @{username} 채널을 추가했습니다. (market: {market_focus})\n"
                 "다음 수집 주기에 메시지를 가져옵니다."
@@ -256,7 +297,7 @@ class ThemeAnalyzerBot:
         success = await self.repo.deactivate_channel(username)
 
         if success:
-            self._sync_yaml_remove(username)
+            await asyncio.to_thread(self._sync_yaml_remove_sync, username)
             await update.message.reply_text(f"✅ @{username} 채널을 비활성화했습니다.")
         else:
             await update.message.reply_text(f"❌ @{username} 채널을 찾을 수 없습니다.")
@@ -277,14 +318,14 @@ class ThemeAnalyzerBot:
 
         await update.message.reply_text("\n".join(lines), parse_mode="HTML")
 
-    def _sync_yaml_add(self, username: str, market_focus: str = "BOTH"):
-        yaml_path = self.settings.base_dir / "config" / "channels.yaml"
+    @property
+    def _yaml_path(self) -> Path:
+        return self.settings.base_dir / "config" / "channels.yaml"
+
+    def _sync_yaml_add_sync(self, username: str, market_focus: str = "BOTH"):
+        yaml_path = self._yaml_path
         try:
-            if yaml_path.exists():
-                with open(yaml_path, encoding="utf-8") as f:
-                    config = yaml.safe_load(f) or {}
-            else:
-                config = {}
+            config = load_yaml(yaml_path) if yaml_path.exists() else {}
 
             channels = config.get("channels", [])
             # Check if already in YAML
@@ -298,24 +339,21 @@ class ThemeAnalyzerBot:
             })
             config["channels"] = channels
 
-            with open(yaml_path, "w", encoding="utf-8") as f:
-                yaml.dump(config, f, allow_unicode=True, default_flow_style=False)
+            save_yaml(yaml_path, config)
         except Exception as e:
             logger.warning(f"Failed to sync YAML (add {username}): {e}")
 
-    def _sync_yaml_remove(self, username: str):
-        yaml_path = self.settings.base_dir / "config" / "channels.yaml"
+    def _sync_yaml_remove_sync(self, username: str):
+        yaml_path = self._yaml_path
         try:
             if not yaml_path.exists():
                 return
-            with open(yaml_path, encoding="utf-8") as f:
-                config = yaml.safe_load(f) or {}
+            config = load_yaml(yaml_path)
 
             channels = config.get("channels", [])
             config["channels"] = [c for c in channels if c.get("username") != username]
 
-            with open(yaml_path, "w", encoding="utf-8") as f:
-                yaml.dump(config, f, allow_unicode=True, default_flow_style=False)
+            save_yaml(yaml_path, config)
         except Exception as e:
             logger.warning(f"Failed to sync YAML (remove {username}): {e}")
 
@@ -1,17 +1,101 @@
-import json
+import asyncio
+import hashlib
 import logging
+import re
+import unicodedata
 from pathlib import Path
 
-import anthropic
-import yaml
+import orjson
+from rapidfuzz import fuzz, process
 
 from config.settings import Settings
 from db.repository import Repository
+from utils.claude_utils import (
+    MessageBatcher,
+    cached_system,
+    create_message,
+    make_client,
+)
 from utils.industry_resolver import resolve_industries
 from utils.rate_limiter import RateLimiter
+from utils.yaml_utils import load_yaml
 
 logger = logging.getLogger(__name__)
 
+# 배치 결과 테마명 통합: 공백/구분자를 뺀 이름이 같거나 유사도가 이 점수 이상이면 같은 테마
+_THEME_KEY_RE = re.compile(r"[\s·/_\-]+")
+THEME_MERGE_SCORE = 90
+
+
+def _theme_key(name: str) -> str:
+    """테마명 비교용 키: NFKC(전각→반각 등) + 공백/구분자 제거 + 소문자."""
+    return _THEME_KEY_RE.sub("", unicodedata.normalize("NFKC", name)).lower()
+
+
+# 금지 테마 키워드 (시장 이벤트/매매 동향) - 하나라도 포함되면 "기타"로 이동 후 재분류
+BANNED_THEME_KEYWORDS = [
+    "신고가", "매도", "매수", "수급", "실적발표", "순매도", "순매수",
+    "기관", "외국인", "특수", "카테고리", "달성", "상위",
+]
+_BANNED_THEME_RE = re.compile("|".join(map(re.escape, BANNED_THEME_KEYWORDS)))
+
+# llm_cache 응답 재사용 기간 (일). 이보다 오래된 항목은 무시하고 정리
+LLM_CACHE_MAX_AGE_DAYS = 30
+
+# 응답 max_tokens 상한 = 기본 + 종목당 추정치 (한글 reason 포함 종목 1개 ≈ 60~80토큰)
+OUTPUT_TOKENS_BASE = 256
+OUTPUT_TOKENS_PER_STOCK = 80
+# 남은 1종목 테마가 이 개수 이하면 LLM 없이 "기타"로
+LOCAL_ORPHAN_LIMIT = 2
+
+# JSON 객체 범위 스캔에서 의미 있는 문자 (그 외 문자는 정규식 엔진이 건너뜀)
+_JSON_TOKEN_RE = re.compile(r'[{}\[\]"\\]')
+
+
+_JSON_CLOSERS = {"{": "}", "[": "]"}
+
+
+def _extract_json_object(text: str, repair: bool = False) -> str | None:
+    """text에서 첫 번째 '{'부터 짝이 맞는 '}'까지 잘라 반환 (문자열 내부 괄호 무시).
+
+    repair면 닫히지 않은 (잘린) JSON을 마지막으로 완성된 값까지 자르고 괄호를 닫아 반환.
+    """
+    start = text.find("{")
+    if start < 0:
+        return None
+    stack: list[str] = []
+    in_string = False
+    escaped_pos = -1
+    last_complete: tuple[int, int] | None = None  # (닫힌 위치, 그때 스택 깊이)
+    for m in _JSON_TOKEN_RE.finditer(text, start):
+        pos = m.start()
+        if pos == escaped_pos:
+            continue
+        c = m.group()
+        if in_string:
+            if c == "\\":
+                escaped_pos = pos + 1
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c in "{[":
+            stack.append(c)
+        elif c in "}]":
+            if not stack:
+                return None
+            stack.pop()
+            if not stack:
+                return text[start : pos + 1]
+            last_complete = (pos, len(stack))
+
+    if not repair or last_complete is None:
+        return None
+    pos, depth = last_complete
+    closers = "".join(_JSON_CLOSERS[b] for b in reversed(stack[:depth]))
+    return text[start : pos + 1] + closers
+
+
 # 고정 섹터 코드 - 코드에서 groupby/필터에 사용
 VALID_SECTORS = [
     "semiconductor", "ai", "energy", "battery", "bio",
@@ -19,6 +103,7 @@ VALID_SECTORS = [
     "finance", "software", "telecom", "consumer", "materials",
     "construction", "quantum", "cybersecurity", "blockchain", "other",
 ]
+VALID_SECTORS_SET = frozenset(VALID_SECTORS)
 
 # Claude가 한글/GICS 섹터를 반환할 때 영문 고정 코드로 매핑
 SECTOR_KO_TO_EN = {
@@ -91,27 +176,32 @@ PREDEFINED_THEMES_US = {
 }
 
 
-def _build_theme_guide(market: str) -> str:
+def _format_theme_guide(themes: dict[str, list[str]]) -> str:
     """미리 정의된 테마 목록을 프롬프트용 문자열로 변환."""
-    themes = PREDEFINED_THEMES_KR if market == "KR" else PREDEFINED_THEMES_US
-    lines = []
-    for sector, theme_list in themes.items():
-        for t in theme_list:
-            lines.append(f"  - {t} (sector: {sector})")
-    return "\n".join(lines)
+    return "\n".join(
+        f"  - {t} (sector: {sector})"
+        for sector, theme_list in themes.items()
+        for t in theme_list
+    )
+
+
+# 테마 목록은 고정 → 모듈 로드 시 1회만 생성
+_THEME_GUIDE_KR = _format_theme_guide(PREDEFINED_THEMES_KR)
+_THEME_GUIDE_US = _format_theme_guide(PREDEFINED_THEMES_US)
+
+
+def _build_theme_guide(market: str) -> str:
+    return _THEME_GUIDE_KR if market == "KR" else _THEME_GUIDE_US
 
 
-CLASSIFICATION_PROMPT = """당신은 주식 테마 분류 전문가입니다.
+# 시장별로 고정된 지시문 + 테마 목록은 system 프롬프트 (prompt caching 대상)
+CLASSIFICATION_SYSTEM_PROMPT = """당신은 주식 테마 분류 전문가입니다.
 시장: {market_label}
 
-아래 종목들을 **산업 테마**별로 분류해주세요.
+주어진 종목들을 **산업 테마**별로 분류해주세요.
 
 ## 테마 목록 (반드시 이 중에서 선택, 해당 없으면 가장 가까운 것 선택):
 {theme_guide}
-{existing_themes_section}
-
-## 오늘 언급된 종목들:
-{stock_list}
 
 ## 핵심 규칙:
 1. 테마는 반드시 위 목록에서 선택. 목록에 없는 새 테마는 정말 필요한 경우에만 최소한으로 생성
@@ -130,14 +220,12 @@ CLASSIFICATION_PROMPT = """당신은 주식 테마 분류 전문가입니다.
   ]
 }}"""
 
-MERGE_SMALL_THEMES_PROMPT = """아래에 종목이 1개뿐인 테마들이 있습니다.
-이 종목들을 기존 테마에 합치거나, 서로 묶어 2개 이상인 새 테마로 재분류해주세요.
+# 배치마다 달라지는 부분 (이전 배치 테마명 + 종목 목록)은 user 메시지로
+CLASSIFICATION_USER_PROMPT = """{existing_themes_section}## 오늘 언급된 종목들:
+{stock_list}"""
 
-기존 테마 목록 (여기에 합칠 수 있음):
-{existing_themes}
-
-재분류 대상 (1종목 테마):
-{orphan_list}
+# 소형 테마 통합 / 테마 세분화도 고정 규칙은 system (prompt caching), 대상 목록만 user로
+MERGE_SMALL_THEMES_SYSTEM_PROMPT = """종목이 1개뿐인 테마들의 종목을 기존 테마에 합치거나, 서로 묶어 2개 이상인 새 테마로 재분류해주세요.
 
 규칙:
 1. 기존 테마에 합칠 수 있으면 그 테마 이름을 그대로 사용
@@ -146,18 +234,19 @@ MERGE_SMALL_THEMES_PROMPT = """아래에 종목이 1개뿐인 테마들이 있
 4. sector는 반드시 영문 고정 코드: semiconductor, ai, energy, battery, bio, defense, auto, robot, media, shipbuilding, finance, software, telecom, consumer, materials, construction, quantum, cybersecurity, blockchain, other
 
 반드시 아래 JSON 형식으로만 응답하세요:
-{{
+{
   "테마이름": [
-    {{"name": "종목명", "ticker": "티커", "sector": "섹터코드", "reason": "분류 이유"}}
+    {"name": "종목명", "ticker": "티커", "sector": "섹터코드", "reason": "분류 이유"}
   ]
-}}"""
+}"""
 
-SPLIT_THEME_PROMPT = """테마 '{theme_name}'에 {stock_count}개 종목이 있어 세분화가 필요합니다.
+MERGE_SMALL_THEMES_PROMPT = """기존 테마 목록 (여기에 합칠 수 있음):
+{existing_themes}
 
-종목 목록:
-{stock_list}
+재분류 대상 (1종목 테마):
+{orphan_list}"""
 
-이 테마를 세분화된 하위 테마로 나눠주세요.
+SPLIT_THEME_SYSTEM_PROMPT = """종목이 많은 테마를 세분화된 하위 테마로 나눠주세요.
 
 규칙:
 1. 각 하위 테마는 최대 10개 종목
@@ -166,11 +255,16 @@ SPLIT_THEME_PROMPT = """테마 '{theme_name}'에 {stock_count}개 종목이 있
 4. 하위 테마에 1~2개 종목만 있다면 가장 가까운 테마에 합치세요
 
 반드시 아래 JSON 형식으로만 응답하세요:
-{{
+{
   "하위테마명": [
-    {{"name": "종목명", "ticker": "티커", "sector": "섹터코드", "reason": "분류 이유"}}
+    {"name": "종목명", "ticker": "티커", "sector": "섹터코드", "reason": "분류 이유"}
   ]
-}}"""
+}"""
+
+SPLIT_THEME_PROMPT = """테마 '{theme_name}'에 {stock_count}개 종목이 있어 세분화가 필요합니다.
+
+종목 목록:
+{stock_list}"""
 
 
 class ThemeClassifier:
@@ -183,7 +277,29 @@ class ThemeClassifier:
         self.settings = settings
         self.repo = repo
         self.rate_limiter = rate_limiter
-        self.client = anthropic.AsyncAnthropic(api_key=settings.anthropic_api_key)
+        self.client = make_client(settings.anthropic_api_key)
+        self._batcher = (
+            MessageBatcher(self.client, self.rate_limiter) if settings.use_batch_api else None
+        )
+        # 시장별 system 블록을 한 번만 만들어 재사용 → 날짜/배치가 달라도
+        # 바이트 단위로 동일한 prefix라 prompt cache hit 유지
+        self._classification_system = {
+            market: cached_system(
+                CLASSIFICATION_SYSTEM_PROMPT.format(
+                    market_label="한국(KR)" if market == "KR" else "미국(US)",
+                    theme_guide=_build_theme_guide(market),
+                ),
+                settings.claude_cache_ttl,
+            )
+            for market in ("KR", "US")
+        }
+        self._merge_system = cached_system(
+            MERGE_SMALL_THEMES_SYSTEM_PROMPT, settings.claude_cache_ttl
+        )
+        self._split_system = cached_system(
+            SPLIT_THEME_SYSTEM_PROMPT, settings.claude_cache_ttl
+        )
+        self._llm_cache_purged = False
 
     async def classify_daily(self, report_date: str) -> dict:
         # 이미 분류된 날짜면 DB에서 로드하여 재사용 (토큰 절약)
@@ -198,6 +314,10 @@ class ThemeClassifier:
             )
             return existing
 
+        if not self._llm_cache_purged:
+            self._llm_cache_purged = True
+            await self.repo.purge_llm_cache(LLM_CACHE_MAX_AGE_DAYS)
+
         mentions = await self.repo.get_daily_stock_mentions(report_date)
         if not mentions:
             logger.info(f"No stock mentions for {report_date}")
@@ -211,16 +331,17 @@ class ThemeClassifier:
 
         themes = self._load_themes()
 
-        kr_result = await self._classify_market(
-            kr_stocks, themes.get("kr_themes", {}), "KR"
-        )
-        us_result = await self._classify_market(
-            us_stocks, themes.get("us_themes", {}), "US"
+        # KR/US는 서로 독립 → 동시에 분류 (Claude 호출 속도는 RateLimiter가 제한)
+        kr_result, us_result = await asyncio.gather(
+            self._classify_market(kr_stocks, themes.get("kr_themes", {}), "KR"),
+            self._classify_market(us_stocks, themes.get("us_themes", {}), "US"),
         )
 
-        # Store in DB
-        await self._store_classifications(report_date, kr_result, "KR")
-        await self._store_classifications(report_date, us_result, "US")
+        # Store in DB - 한 트랜잭션으로 커밋 (트랜잭션끼리 직렬화되어
+        # 여러 날짜를 동시에 분류해도 get_or_create_theme 중복 생성 없음)
+        async with self.repo.transaction():
+            await self._store_classifications(report_date, kr_result, "KR")
+            await self._store_classifications(report_date, us_result, "US")
 
         logger.info(
             f"Classification for {report_date}: "
@@ -231,8 +352,8 @@ class ThemeClassifier:
     def _load_themes(self) -> dict:
         themes_path = self.settings.base_dir / "config" / "themes.yaml"
         try:
-            with open(themes_path, "r", encoding="utf-8") as f:
-                return yaml.safe_load(f) or {}
+            # 날짜별 분류마다 호출되므로 파일이 바뀌지 않았으면 캐시된 결과 사용
+            return load_yaml(themes_path)
         except FileNotFoundError:
             logger.warning("themes.yaml not found, using empty themes")
             return {}
@@ -243,7 +364,7 @@ class ThemeClassifier:
     @staticmethod
     def _fix_sector(sector: str) -> str:
         """한글 섹터 → 영문 코드 변환. 이미 영문이면 그대로."""
-        if sector in VALID_SECTORS:
+        if sector in VALID_SECTORS_SET:
             return sector
         return SECTOR_KO_TO_EN.get(sector, "other")
 
@@ -262,9 +383,6 @@ class ThemeClassifier:
             return {}
         stocks = valid_stocks
 
-        market_label = "한국(KR)" if market == "KR" else "미국(US)"
-        theme_guide = _build_theme_guide(market)
-
         # 종목이 많으면 배치 분할
         if len(stocks) <= self.CLASSIFY_BATCH_SIZE:
             batches = [stocks]
@@ -277,23 +395,12 @@ class ThemeClassifier:
                 f"{market} 종목 {len(stocks)}개 → {len(batches)}개 배치로 분할"
             )
 
-        merged: dict[str, list] = {}
-        accumulated_theme_names: list[str] = []  # 이전 배치에서 나온 테마명
-
-        for batch_idx, batch in enumerate(batches):
-            result = await self._classify_batch(
-                batch, theme_guide, market_label,
-                batch_idx, len(batches), accumulated_theme_names,
-            )
-            # 배치 결과 머지: 같은 테마면 종목 합침
-            for theme_name, theme_stocks in result.items():
-                if theme_name not in merged:
-                    merged[theme_name] = []
-                    accumulated_theme_names.append(theme_name)
-                existing_tickers = {s.get("ticker") for s in merged[theme_name]}
-                for s in theme_stocks:
-                    if s.get("ticker") not in existing_tickers:
-                        merged[theme_name].append(s)
+        # 배치끼리 서로의 결과를 기다리지 않고 동시에 분류 → 테마명은 사후에 통합
+        results = await asyncio.gather(*(
+            self._classify_batch(batch, market, batch_idx, len(batches), [])
+            for batch_idx, batch in enumerate(batches)
+        ))
+        merged = self._merge_batch_results(results)
 
         # Sector 코드 검증 + 한글→영문 변환
         for theme_stocks in merged.values():
@@ -301,14 +408,10 @@ class ThemeClassifier:
                 s["sector"] = self._fix_sector(s.get("sector", "other"))
 
         # 금지 테마 필터링: 시장 이벤트 테마 → "기타"로 이동
-        banned_keywords = [
-            "신고가", "매도", "매수", "수급", "실적발표", "순매도", "순매수",
-            "기관", "외국인", "특수", "카테고리", "달성", "상위",
-        ]
         cleaned: dict[str, list] = {}
         dumped: list = []
         for theme_name, theme_stocks in merged.items():
-            if any(kw in theme_name for kw in banned_keywords):
+            if _BANNED_THEME_RE.search(theme_name):
                 logger.info(f"금지 테마 필터링: '{theme_name}' ({len(theme_stocks)}종목)")
                 dumped.extend(theme_stocks)
             else:
@@ -325,19 +428,14 @@ class ThemeClassifier:
                     [{"ticker": s.get("ticker", ""), "name_ko": s.get("name", ""),
                       "mention_count": 1, "aggregated_context": s.get("reason", "")}
                      for s in reclassify],
-                    theme_guide, market_label, 0, 1,
+                    market, 0, 1,
                     list(cleaned.keys()),
                 )
-                for t_name, t_stocks in re_result.items():
+                for t_stocks in re_result.values():
                     for rs in t_stocks:
                         rs["sector"] = self._fix_sector(rs.get("sector", "other"))
-                    if t_name in cleaned:
-                        existing_tickers = {s.get("ticker") for s in cleaned[t_name]}
-                        for rs in t_stocks:
-                            if rs.get("ticker") not in existing_tickers:
-                                cleaned[t_name].append(rs)
-                    else:
-                        cleaned[t_name] = t_stocks
+                # 재분류 결과도 표기만 다른 기존 테마에 합쳐지도록 같은 규칙으로 머지
+                cleaned = self._merge_batch_results([cleaned, re_result])
 
         merged = cleaned
 
@@ -360,11 +458,41 @@ class ThemeClassifier:
 
         return final
 
+    @staticmethod
+    def _merge_batch_results(results: list[dict]) -> dict[str, list]:
+        """배치별 분류 결과 머지. 공백/대소문자만 다르거나 거의 같은 테마명은 한 테마로."""
+        merged: dict[str, list] = {}
+        tickers: dict[str, set] = {}  # merged의 테마명 → 이미 담긴 ticker (리스트와 함께 갱신)
+        canonical: dict[str, str] = {}  # 정규화한 테마명 → merged의 테마명
+        for result in results:
+            for theme_name, theme_stocks in result.items():
+                key = _theme_key(theme_name)
+                target = canonical.get(key)
+                if target is None and canonical:
+                    match = process.extractOne(
+                        key, canonical.keys(),
+                        scorer=fuzz.ratio, score_cutoff=THEME_MERGE_SCORE,
+                    )
+                    if match:
+                        target = canonical[match[0]]
+                        logger.debug(f"테마명 통합: '{theme_name}' -> '{target}'")
+                if target is None:
+                    target = theme_name
+                    merged[target] = []
+                    tickers[target] = set()
+                canonical.setdefault(key, target)
+                # 같은 테마면 종목 합침
+                seen = tickers[target]
+                for s in theme_stocks:
+                    if s.get("ticker") not in seen:
+                        merged[target].append(s)
+                        seen.add(s.get("ticker"))
+        return merged
+
     async def _classify_batch(
         self,
         stocks: list[dict],
-        theme_guide: str,
-        market_label: str,
+        market: str,
         batch_idx: int,
         total_batches: int,
         existing_theme_names: list[str],
@@ -383,37 +511,23 @@ class ThemeClassifier:
         # 이전 배치에서 이미 사용된 테마명 전달
         if existing_theme_names:
             existing_section = (
-                "\n\n이전 배치에서 이미 사용된 테마 (동일한 이름 사용 필수):\n"
+                "이전 배치에서 이미 사용된 테마 (동일한 이름 사용 필수):\n"
                 + "\n".join(f"  - {n}" for n in existing_theme_names)
-                + "\n"
+                + "\n\n"
             )
         else:
             existing_section = ""
 
-        prompt = CLASSIFICATION_PROMPT.format(
-            market_label=market_label,
-            theme_guide=theme_guide,
+        prompt = CLASSIFICATION_USER_PROMPT.format(
             existing_themes_section=existing_section,
             stock_list=stock_list,
         )
 
-        await self.rate_limiter.acquire("claude")
-        response = await self.client.messages.create(
-            model=self.settings.claude_model,
-            max_tokens=self.settings.claude_max_tokens,
-            messages=[{"role": "user", "content": prompt}],
+        classification = await self._request_json(
+            self._classification_system[market], prompt,
+            f"배치 {batch_idx+1}/{total_batches} ({len(stocks)}종목)",
+            len(stocks),
         )
-
-        raw = response.content[0].text.strip()
-
-        # stop_reason이 max_tokens이면 잘린 것 → 경고
-        if response.stop_reason == "max_tokens":
-            logger.warning(
-                f"배치 {batch_idx+1}/{total_batches}: 응답이 max_tokens에서 잘림 "
-                f"({len(stocks)}종목)"
-            )
-
-        classification = self._parse_json_response(raw)
         if classification is None:
             logger.error(
                 f"배치 {batch_idx+1}/{total_batches}: JSON 파싱 실패 "
@@ -447,6 +561,39 @@ class ThemeClassifier:
         if not orphans:
             return themes
 
+        # 같은 섹터 종목이 있는 가장 큰 테마로 먼저 로컬 배정 ("other"는 근거가 약해 제외)
+        sector_home: dict[str, str] = {}
+        for name, stocks in sorted(big_themes.items(), key=lambda kv: -len(kv[1])):
+            for s in stocks:
+                if s.get("sector", "other") != "other":
+                    sector_home.setdefault(s["sector"], name)
+        home_tickers = {
+            name: {s.get("ticker") for s in big_themes[name]}
+            for name in set(sector_home.values())
+        }
+        unmatched = []
+        for s in orphans:
+            home = sector_home.get(s.get("sector", "other"))
+            if home is None:
+                unmatched.append(s)
+                continue
+            s.pop("_original_theme", None)
+            if s.get("ticker") not in home_tickers[home]:
+                big_themes[home].append(s)
+                home_tickers[home].add(s.get("ticker"))
+        if len(orphans) > len(unmatched):
+            logger.info(f"1종목 테마 {len(orphans) - len(unmatched)}개 섹터 기준으로 기존 테마에 배정")
+        orphans = unmatched
+
+        if not orphans:
+            return big_themes
+        if len(orphans) <= LOCAL_ORPHAN_LIMIT:
+            big_themes.setdefault("기타", [])
+            for s in orphans:
+                s.pop("_original_theme", None)
+                big_themes["기타"].append(s)
+            return big_themes
+
         logger.info(f"1종목 테마 {len(orphans)}개 → 통합 재분류")
 
         existing_themes_str = "\n".join(
@@ -464,16 +611,10 @@ class ThemeClassifier:
             orphan_list=orphan_str,
         )
 
-        await self.rate_limiter.acquire("claude")
-        response = await self.client.messages.create(
-            model=self.settings.claude_model,
-            max_tokens=self.settings.claude_max_tokens,
-            messages=[{"role": "user", "content": prompt}],
+        result = await self._request_json(
+            self._merge_system, prompt, "소형 테마 통합", len(orphans)
         )
 
-        raw = response.content[0].text.strip()
-        result = self._parse_json_response(raw)
-
         if result is None:
             logger.warning("소형 테마 통합 실패 → '기타' 테마로 합침")
             big_themes["기타"] = big_themes.get("기타", [])
@@ -482,17 +623,11 @@ class ThemeClassifier:
                 big_themes["기타"].append(s)
             return big_themes
 
-        # 통합 결과를 big_themes에 합침
-        for theme_name, theme_stocks in result.items():
+        # 통합 결과를 big_themes에 합침 (배치 머지와 같은 테마명 통합/ticker 중복 제거)
+        for theme_stocks in result.values():
             for s in theme_stocks:
                 s["sector"] = self._fix_sector(s.get("sector", "other"))
-            if theme_name in big_themes:
-                existing_tickers = {s.get("ticker") for s in big_themes[theme_name]}
-                for s in theme_stocks:
-                    if s.get("ticker") not in existing_tickers:
-                        big_themes[theme_name].append(s)
-            else:
-                big_themes[theme_name] = theme_stocks
+        big_themes = self._merge_batch_results([big_themes, result])
 
         # _original_theme 필드 정리
         for stocks in big_themes.values():
@@ -515,15 +650,9 @@ class ThemeClassifier:
             stock_list=stock_list,
         )
 
-        await self.rate_limiter.acquire("claude")
-        response = await self.client.messages.create(
-            model=self.settings.claude_model,
-            max_tokens=self.settings.claude_max_tokens,
-            messages=[{"role": "user", "content": prompt}],
+        result = await self._request_json(
+            self._split_system, prompt, f"테마 분할 '{theme_name}'", len(stocks)
         )
-
-        raw = response.content[0].text.strip()
-        result = self._parse_json_response(raw)
         if result is None:
             # Fallback: keep original (may exceed 10)
             logger.warning(f"Could not split theme '{theme_name}', keeping as-is")
@@ -539,58 +668,138 @@ class ThemeClassifier:
     async def _store_classifications(
         self, report_date: str, classification: dict, market: str
     ):
+        """분류 결과 저장. 테마/종목 id를 먼저 모아서 구하고 배정은 한 번에 upsert."""
+        if not classification:
+            return
+
+        name_col = "name_ko" if market == "KR" else "name_en"
+        # ticker 없이 이름만 온 종목은 기존 종목에서 찾아 id 사용 (이름을 ticker로 새 종목을 만들지 않음)
+        named_ids: dict[str, int] = {}
+        for name in {
+            s.get("name", "")
+            for stocks in classification.values()
+            for s in stocks
+            if not s.get("ticker") and s.get("name")
+        }:
+            results = [r for r in await self.repo.search_stock(name) if r["market"] == market]
+            exact = [r for r in results if name in (r["name_ko"], r["name_en"])]
+            if exact or results:
+                named_ids[name] = (exact or results)[0]["id"]
+
+        rows = []
+        dropped = 0
         for theme_name, stocks in classification.items():
-            theme_id = await self.repo.get_or_create_theme(
-                name_ko=theme_name,
-                name_en=None,
-                market=market,
-            )
-
-            for stock_info in stocks:
-                ticker = stock_info.get("ticker", "")
-                name = stock_info.get("name", "")
-
-                # Find stock in DB
-                results = await self.repo.search_stock(ticker or name)
-                market_results = [r for r in results if r["market"] == market]
-                if market_results:
-                    stock_id = market_results[0]["id"]
+            for s in stocks:
+                if s.get("ticker") or s.get("name", "") in named_ids:
+                    rows.append((theme_name, s))
                 else:
-                    stock_id = await self.repo.get_or_create_stock(
-                        ticker=ticker or name,
-                        name_ko=name if market == "KR" else None,
-                        name_en=name if market == "US" else None,
-                        market=market,
-                    )
-
-                await self.repo.insert_daily_stock_theme(
-                    report_date=report_date,
-                    stock_id=stock_id,
-                    theme_id=theme_id,
-                    mention_count=stock_info.get("mention_count", 1),
-                    reason=stock_info.get("reason", ""),
-                    sector=stock_info.get("sector", "other"),
+                    dropped += 1
+        if dropped:
+            logger.info(f"{market} {report_date}: ticker를 찾지 못한 분류 종목 {dropped}개 제외")
+
+        async with self.repo.transaction():
+            theme_ids = {
+                theme_name: await self.repo.get_or_create_theme(
+                    name_ko=theme_name, name_en=None, market=market,
                 )
+                for theme_name in {theme_name for theme_name, _ in rows}
+            }
+            stock_ids = await self.repo.get_or_create_stocks([
+                {
+                    "ticker": s["ticker"],
+                    name_col: s.get("name") or None,
+                    "market": market,
+                }
+                for _, s in rows
+                if s.get("ticker")
+            ])
+
+            await self.repo.insert_daily_stock_themes([
+                {
+                    "report_date": report_date,
+                    "stock_id": (
+                        stock_ids[(s["ticker"], market)] if s.get("ticker")
+                        else named_ids[s["name"]]
+                    ),
+                    "theme_id": theme_ids[theme_name],
+                    "mention_count": s.get("mention_count", 1),
+                    "reason": s.get("reason", ""),
+                    "sector": s.get("sector", "other"),
+                }
+                for theme_name, s in rows
+            ])
+
+    async def _request_json(
+        self, system: list[dict], prompt: str, label: str, stock_count: int
+    ) -> dict | list | None:
+        """Claude 호출 후 JSON 파싱. 같은 (모델, system, prompt)면 llm_cache의 응답 재사용.
+
+        max_tokens는 응답에 들어갈 종목 수로 상한을 잡아 불필요하게 크게 예약하지 않음.
+        """
+        key = hashlib.sha256(
+            "\n".join(
+                [self.settings.claude_model, *(b["text"] for b in system), prompt]
+            ).encode()
+        ).hexdigest()
+        raw = await self.repo.get_llm_cache(key, LLM_CACHE_MAX_AGE_DAYS)
+        if raw is not None:
+            logger.debug(f"{label}: 캐시된 응답 사용")
+            return self._parse_json_response(raw)
+
+        params = {
+            "model": self.settings.claude_model,
+            "max_tokens": min(
+                self.settings.claude_max_tokens,
+                OUTPUT_TOKENS_BASE + OUTPUT_TOKENS_PER_STOCK * stock_count,
+            ),
+            "system": system,
+            "messages": [{"role": "user", "content": prompt}],
+        }
+        if self._batcher:
+            # 동시에 요청된 배치/시장의 프롬프트를 모아 Message Batches로 한 번에 제출
+            response = await self._batcher.create(**params)
+        else:
+            response = await create_message(
+                self.client, self.rate_limiter, use_stream=True, **params
+            )
+        raw = response.content[0].text.strip()
+
+        # stop_reason이 max_tokens이면 잘린 것 → 경고
+        truncated = response.stop_reason == "max_tokens"
+        if truncated:
+            logger.warning(f"{label}: 응답이 max_tokens에서 잘림")
+
+        parsed = self._parse_json_response(raw)
+        if parsed is None and truncated:
+            # 마지막으로 완성된 종목까지 살리고 괄호를 닫아 재시도
+            repaired = _extract_json_object(raw, repair=True)
+            if repaired:
+                try:
+                    parsed = orjson.loads(repaired)
+                    logger.info(f"{label}: 잘린 응답에서 일부 결과 복구")
+                except orjson.JSONDecodeError:
+                    pass
+        # 잘렸거나 파싱 실패한 응답은 저장하지 않음 → 다음 실행에서 다시 호출
+        if parsed is not None and not truncated:
+            await self.repo.set_llm_cache(key, raw)
+        return parsed
 
     def _parse_json_response(self, text: str) -> dict | list | None:
         text = text.strip()
         if text.startswith("```"):
-            lines = text.split("\n")
-            lines = lines[1:]
-            if lines and lines[-1].strip() == "```":
-                lines = lines[:-1]
-            text = "\n".join(lines)
+            text = (
+                text.removeprefix("```json").removeprefix("```")
+                .removesuffix("```").strip()
+            )
 
         try:
-            return json.loads(text)
-        except json.JSONDecodeError:
-            import re
-
-            match = re.search(r"\{.*\}", text, re.DOTALL)
-            if match:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            obj = _extract_json_object(text)
+            if obj:
                 try:
-                    return json.loads(match.group())
-                except json.JSONDecodeError:
+                    return orjson.loads(obj)
+                except orjson.JSONDecodeError:
                     pass
             logger.warning(f"Cannot parse JSON: {text[:200]}...")
             return None
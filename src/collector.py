@@ -1,24 +1,38 @@
 import asyncio
 import logging
+from collections.abc import Callable
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
 from telethon import TelegramClient
-from telethon.tl.types import MessageMediaPhoto
+from telethon.tl.types import MessageMediaPhoto, PeerChannel
 
 from config.settings import Settings
 from db.repository import Repository
 from utils.image_utils import resize_if_needed
+from utils.yaml_utils import load_yaml
 
 logger = logging.getLogger(__name__)
 
+# 메시지 INSERT를 모아서 한 트랜잭션으로 flush할 크기
+INSERT_BATCH_SIZE = 500
+# 동시에 수집할 채널 수 (실제 병목은 Telegram FloodWait)
+CHANNEL_CONCURRENCY = 2
+# 이 시간(초) 이하의 FloodWait는 Telethon이 자동으로 기다린 뒤 재시도
+FLOOD_SLEEP_THRESHOLD = 120
+# 이 기간 안에 갱신된 채널은 시드 시 username을 다시 조회하지 않음
+CHANNEL_REFRESH_DAYS = 7
+# 전체 채널 합산 동시 이미지 다운로드 수
+IMAGE_DOWNLOAD_CONCURRENCY = 4
+
 
 class MessageCollector:
     def __init__(self, settings: Settings, repo: Repository):
         self.settings = settings
         self.repo = repo
         self.client: TelegramClient | None = None
-        self._semaphore = asyncio.Semaphore(3)
+        self._semaphore = asyncio.Semaphore(CHANNEL_CONCURRENCY)
+        self._download_semaphore = asyncio.Semaphore(IMAGE_DOWNLOAD_CONCURRENCY)
 
     async def initialize(self):
         session_path = str(self.settings.base_dir / self.settings.telegram_session_name)
@@ -26,6 +40,7 @@ class MessageCollector:
             session_path,
             self.settings.telegram_api_id,
             self.settings.telegram_api_hash,
+            flood_sleep_threshold=FLOOD_SLEEP_THRESHOLD,
         )
         await self.client.start(phone=self.settings.telegram_phone)
         logger.info("Telethon client started")
@@ -35,23 +50,34 @@ class MessageCollector:
 
     async def _seed_channels_from_yaml(self):
         """channels.yaml의 채널 목록을 DB에 등록 (Telegram에서 실제 정보 조회)."""
-        import yaml
-
         yaml_path = self.settings.base_dir / "config" / "channels.yaml"
         if not yaml_path.exists():
             return
 
-        with open(yaml_path, encoding="utf-8") as f:
-            config = yaml.safe_load(f) or {}
+        config = load_yaml(yaml_path)
 
         channel_list = config.get("channels", [])
         if not channel_list:
             return
 
+        # 이미 등록돼 있고 설정이 같으며 최근 갱신된 채널은 resolveUsername 생략
+        refresh_cutoff = (
+            datetime.now(timezone.utc) - timedelta(days=CHANNEL_REFRESH_DAYS)
+        ).strftime("%Y-%m-%d %H:%M:%S")
+        known = {c["username"]: c for c in await self.repo.get_all_channels()}
+
         for ch in channel_list:
             username = ch.get("username")
             if not username:
                 continue
+            existing = known.get(username)
+            if (
+                existing
+                and existing["updated_at"] >= refresh_cutoff
+                and existing["market_focus"] == ch.get("market_focus", "BOTH")
+                and existing["language"] == ch.get("language", "ko")
+            ):
+                continue
             try:
                 entity = await self.client.get_entity(username)
                 await self.repo.upsert_channel(
@@ -65,13 +91,27 @@ class MessageCollector:
             except Exception as e:
                 logger.warning(f"Could not register channel @{username}: {e}")
 
-    async def collect_all_channels(self) -> dict:
+    async def collect_all_channels(
+        self,
+        on_channel_done: Callable[[int], None] | None = None,
+        full_scan: bool = False,
+    ) -> dict:
+        """활성 채널 전체 수집. on_channel_done은 채널 하나가 저장을 마칠 때마다 새 메시지 수로 호출.
+
+        full_scan=True면 저장된 최신 메시지 이후만 받는 증분 수집을 끄고 lookback 전체를 다시 훑음 (backfill용).
+        """
         channels = await self.repo.get_active_channels()
         if not channels:
             logger.warning("No active channels in DB")
             return {"total_channels": 0, "total_messages": 0, "errors": []}
 
-        tasks = [self._collect_channel(ch) for ch in channels]
+        async def _collect(ch: dict) -> int:
+            count = await self._collect_channel(ch, full_scan)
+            if on_channel_done:
+                on_channel_done(count)
+            return count
+
+        tasks = [_collect(ch) for ch in channels]
         results = await asyncio.gather(*tasks, return_exceptions=True)
 
         total_messages = 0
@@ -94,74 +134,108 @@ class MessageCollector:
         )
         return stats
 
-    async def _collect_channel(self, channel: dict) -> int:
+    async def _collect_channel(self, channel: dict, full_scan: bool = False) -> int:
         async with self._semaphore:
             cutoff = datetime.now(timezone.utc) - timedelta(
                 hours=self.settings.lookback_hours
             )
 
-            try:
-                entity = await self.client.get_entity(channel["username"])
-            except Exception as e:
-                logger.error(f"Cannot find channel {channel['username']}: {e}")
-                raise
-
-            # Update channel info in DB
-            await self.repo.upsert_channel(
-                telegram_id=entity.id,
-                username=channel.get("username"),
-                title=getattr(entity, "title", channel.get("title", "")),
-                market_focus=channel.get("market_focus", "BOTH"),
-                language=channel.get("language", "ko"),
+            entity = await self._resolve_channel(channel)
+
+            # 저장된 메시지가 이미 cutoff까지 거슬러 올라가 있을 때만 최신 메시지 이후만 받음.
+            # lookback을 늘린 경우(backfill 등)엔 그 앞 구간이 비어 있으니 날짜 기준으로 전부 훑음
+            min_id = 0
+            if not full_scan:
+                max_id, oldest = await self.repo.get_message_id_range(channel["id"])
+                if oldest and datetime.fromisoformat(oldest) <= cutoff:
+                    min_id = max_id
+            messages = []
+            async for message in self.client.iter_messages(
+                entity, limit=2000, min_id=min_id
+            ):
+                if message.date < cutoff:
+                    break
+                messages.append(message)
+
+            # min_id 이후라도 다른 프로세스가 먼저 저장했을 수 있어 한 번 더 걸러냄
+            new_ids = await self.repo.filter_new_messages(
+                channel["id"], [m.id for m in messages]
             )
 
-            count = 0
-            async for message in self.client.iter_messages(entity, limit=2000):
-                if message.date.replace(tzinfo=timezone.utc) < cutoff:
-                    break
+            new_messages = [m for m in messages if m.id in new_ids]
 
-                if await self.repo.message_exists(channel["id"], message.id):
-                    continue
-
-                # Download image if present
-                image_path = None
-                has_image = False
-                if message.media and isinstance(message.media, MessageMediaPhoto):
-                    image_path = await self._download_image(message, channel["id"])
-                    has_image = image_path is not None
-
-                text = message.text or message.message or ""
-
-                await self.repo.insert_message(
-                    channel_id=channel["id"],
-                    telegram_msg_id=message.id,
-                    message_text=text,
-                    has_image=has_image,
-                    image_path=str(image_path) if image_path else None,
-                    message_date=message.date.isoformat(),
-                )
+            # 이미지는 메시지마다 순차로 받지 않고 한꺼번에 병렬 다운로드
+            photos = [m for m in new_messages if type(m.media) is MessageMediaPhoto]
+            paths = await asyncio.gather(
+                *(self._download_image(m, channel["id"]) for m in photos)
+            )
+            image_paths = {m.id: p for m, p in zip(photos, paths)}
+
+            count = 0
+            pending: list[dict] = []
+            for message in new_messages:
+                image_path = image_paths.get(message.id)
+                has_image = image_path is not None
+
+                pending.append({
+                    "channel_id": channel["id"],
+                    "telegram_msg_id": message.id,
+                    # .text는 엔티티를 마크다운으로 다시 그려서 느림. 분석엔 원문이면 충분
+                    "message_text": message.message or "",
+                    "has_image": has_image,
+                    "image_path": str(image_path) if image_path else None,
+                    "message_date": message.date.isoformat(),
+                })
                 count += 1
 
-                # Small delay to avoid rate limits
-                if count % 50 == 0:
-                    await asyncio.sleep(1)
+                if len(pending) >= INSERT_BATCH_SIZE:
+                    await self.repo.insert_messages(pending)
+                    pending = []
+
+            await self.repo.insert_messages(pending)
 
             logger.info(f"Collected {count} messages from {channel.get('title', channel.get('username'))}")
             return count
 
+    async def _resolve_channel(self, channel: dict):
+        """저장된 telegram_id로 세션 캐시에서 입력 엔티티를 구성 (RPC 없음).
+
+        세션에 access_hash가 없을 때만 username으로 조회하고 채널 정보를 갱신.
+        """
+        try:
+            return await self.client.get_input_entity(PeerChannel(channel["telegram_id"]))
+        except ValueError:
+            pass
+
+        try:
+            entity = await self.client.get_entity(channel["username"])
+        except Exception as e:
+            logger.error(f"Cannot find channel {channel['username']}: {e}")
+            raise
+
+        await self.repo.upsert_channel(
+            telegram_id=entity.id,
+            username=channel.get("username"),
+            title=getattr(entity, "title", channel.get("title", "")),
+            market_focus=channel.get("market_focus", "BOTH"),
+            language=channel.get("language", "ko"),
+        )
+        return entity
+
     async def _download_image(self, message, channel_id: int) -> Path | None:
         try:
             filename = f"{channel_id}_{message.id}.jpg"
             file_path = self.settings.image_dir / filename
             self.settings.image_dir.mkdir(parents=True, exist_ok=True)
 
-            await self.client.download_media(
-                message, file=str(file_path)
-            )
+            async with self._download_semaphore:
+                await self.client.download_media(
+                    message, file=str(file_path)
+                )
 
             if file_path.exists():
-                file_path = resize_if_needed(
-                    file_path, self.settings.max_image_size_kb
+                file_path = await asyncio.to_thread(
+                    resize_if_needed, file_path, self.settings.max_image_size_kb
                 )
                 return file_path
         except Exception as e:
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from datetime import datetime
 from zoneinfo import ZoneInfo
@@ -30,20 +31,25 @@ class Pipeline:
         self.reporter = reporter
         self.bot = bot
         self.repo = repo
+        # 스케줄러/봇 명령이 겹쳐도 전체 파이프라인은 한 번에 하나만
+        self._run_lock = asyncio.Lock()
+        # 주기 수집과 파이프라인 수집이 같은 채널을 동시에 받지 않도록
+        self._collect_lock = asyncio.Lock()
 
     async def run_full(self, report_date: str | None = None) -> dict:
         """Run the complete pipeline: collect -> analyze -> classify -> report."""
         if report_date is None:
             report_date = datetime.now(KST).strftime("%Y-%m-%d")
 
+        async with self._run_lock:
+            return await self._run_full(report_date)
+
+    async def _run_full(self, report_date: str) -> dict:
         logger.info(f"Starting full pipeline for {report_date}")
 
-        # Step 1: Collect
-        collection_stats = await self.collector.collect_all_channels()
+        # Step 1-2: Collect + Analyze (수집 중에도 저장된 메시지부터 분석)
+        collection_stats, analysis_stats = await self._collect_and_analyze()
         logger.info(f"Collection: {collection_stats}")
-
-        # Step 2: Analyze
-        analysis_stats = await self.analyzer.analyze_pending_messages()
         logger.info(f"Analysis: {analysis_stats}")
 
         # Step 3: Classify
@@ -54,7 +60,7 @@ class Pipeline:
         message, csv_path = await self.reporter.generate_daily_report(
             report_date, classification
         )
-        await self.bot.send_daily_report(message, csv_path)
+        telegram_sent = await self.bot.send_daily_report(message, csv_path)
 
         # Step 5: Record stats
         total_stocks = (
@@ -69,7 +75,7 @@ class Pipeline:
             + analysis_stats.get("image_messages", 0),
             total_stocks=total_stocks,
             total_themes=total_themes,
-            telegram_sent=True,
+            telegram_sent=telegram_sent,
             csv_exported=csv_path is not None,
         )
 
@@ -82,8 +88,53 @@ class Pipeline:
             "total_themes": total_themes,
         }
 
+    async def _collect_and_analyze(self) -> tuple[dict, dict]:
+        """수집(Telegram)과 분석(Claude)을 겹쳐 실행.
+
+        채널 하나가 저장을 마치면 분석 라운드를 돌리고, 수집이 끝난 뒤 마지막 라운드로
+        남은 메시지를 처리. 분류는 이 함수가 끝난 뒤(모든 분석 완료 후)에 시작.
+        """
+        collected = asyncio.Event()
+
+        def _on_channel_done(count: int):
+            if count:
+                collected.set()
+
+        collect_task = asyncio.create_task(self._collect(_on_channel_done))
+        analysis_stats: dict = {}
+        try:
+            while True:
+                waiter = asyncio.create_task(collected.wait())
+                await asyncio.wait(
+                    {collect_task, waiter}, return_when=asyncio.FIRST_COMPLETED
+                )
+                waiter.cancel()
+                collect_done = collect_task.done()
+                collected.clear()
+
+                round_stats = await self.analyzer.analyze_pending_messages()
+                for key, value in round_stats.items():
+                    analysis_stats[key] = analysis_stats.get(key, 0) + value
+                if collect_done:
+                    break
+        except BaseException:
+            collect_task.cancel()
+            raise
+
+        return collect_task.result(), analysis_stats
+
+    async def _collect(self, on_channel_done=None) -> dict:
+        async with self._collect_lock:
+            return await self.collector.collect_all_channels(
+                on_channel_done=on_channel_done
+            )
+
     async def run_collect_only(self) -> dict:
-        return await self.collector.collect_all_channels()
+        # 이미 수집 중이면 (파이프라인 포함) 이번 주기는 건너뜀. 다음 주기에 min_id부터 이어받음
+        if self._collect_lock.locked():
+            logger.info("Collection already in progress, skipping")
+            return {"skipped": True}
+        return await self._collect()
 
     async def run_analyze_only(self) -> dict:
         return await self.analyzer.analyze_pending_messages()
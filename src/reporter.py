@@ -1,7 +1,10 @@
 import csv
 import logging
 import math
-from datetime import datetime, timedelta
+import sys
+from collections import defaultdict
+from datetime import date
+from operator import itemgetter
 from pathlib import Path
 
 from config.settings import Settings
@@ -11,6 +14,25 @@ logger = logging.getLogger(__name__)
 
 # 시간 가중치 감쇠 계수 (0.85^30 ≈ 0.007 → 1개월 전 데이터는 거의 무시)
 DECAY_FACTOR = 0.85
+# 가중치가 1e-4 미만이 되는 일수 (~57일). 그보다 오래된 row는 점수에 0으로 반영
+DECAY_MAX_DAYS = int(math.log(1e-4) / math.log(DECAY_FACTOR)) + 1
+# days_ago → 가중치 표 (모듈 로드 시 한 번만 계산)
+DECAY_WEIGHTS = tuple(DECAY_FACTOR ** d for d in range(DECAY_MAX_DAYS))
+
+# themes_history.csv 컬럼 순서
+HISTORY_FIELDS = [
+    "date", "market", "sector", "theme", "ticker", "stock_name",
+    "mention_count", "sentiment", "reason",
+]
+# 히스토리 파일이 이 크기 이하일 때만 파싱한 row를 실행 사이에 메모리에 유지
+HISTORY_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# 같은 값이 여러 row에 반복되는 컬럼 (로드 시 intern)
+_REPEATED_FIELDS = ("date", "market", "sector", "theme", "ticker", "stock_name", "sentiment")
+
+
+def _history_values(row: dict) -> list:
+    """히스토리 row → HISTORY_FIELDS 순서의 값 목록 (DictWriter의 row별 키 검사 없이 csv.writer로)."""
+    return [row.get(k, "") for k in HISTORY_FIELDS]
 
 
 class ReportGenerator:
@@ -19,6 +41,16 @@ class ReportGenerator:
         self.repo = repo
         self.history_path = settings.export_dir / "themes_history.csv"
         self.strength_path = settings.export_dir / "themes_strength.csv"
+        # (mtime_ns, rows): 파일이 그대로면 다음 실행에서 CSV를 다시 파싱하지 않음
+        self._history_cache: tuple[int, list[dict]] | None = None
+        # 마지막으로 읽거나 쓴 히스토리 파일의 mtime_ns (row 캐시를 버려도 유지 → 증분 경로 판단용)
+        self._history_mtime: int | None = None
+        # (report_date, 저장 후 history mtime_ns, 반올림 전 강도 집계, 저장 후 히스토리의 가장 최근 날짜)
+        # 다음 날 증분 갱신용. 과거 날짜 리포트로 만든 집계는 그 이후 row가 빠져 있어 쓰지 않음
+        self._strength_state: tuple[str, int, list[dict], str] | None = None
+        # (마지막으로 덧붙인 날짜, 그 row들이 시작하는 파일 오프셋, 덧붙인 뒤 mtime_ns)
+        # 같은 날짜를 다시 돌리면 그 지점부터 잘라내고 다시 씀
+        self._history_tail: tuple[str, int, int] | None = None
 
     async def generate_daily_report(
         self, report_date: str, classification: dict
@@ -28,25 +60,54 @@ class ReportGenerator:
 
         # 1) 기존 히스토리 로드
         history = self._load_history()
+        loaded_mtime = self._history_mtime
 
-        # 2) 어제 데이터 추출 (신규 판별용)
-        yesterday_entries = self._get_previous_entries(history, report_date)
+        # 2) 이전 데이터 추출 (신규 판별용) + 3) 기존 오늘 데이터 제거 - 한 번의 순회로
+        yesterday_entries, history, latest_date = self._partition_history(
+            history, report_date
+        )
+        # report_date가 가장 최근 날짜 (오늘 row도, 이후 row도 없음 → 파일 끝에 덧붙이기만 하면 됨)
+        append_only = latest_date is None or latest_date < report_date
 
-        # 3) 오늘 데이터 추가 (기존 오늘 데이터 제거 후 덮어쓰기)
-        history = [r for r in history if r["date"] != report_date]
+        # 3) 오늘 데이터 추가 (덮어쓰기)
         today_rows = self._build_today_rows(report_date, classification)
         history.extend(today_rows)
 
-        # 4) 히스토리 CSV 저장 (누적)
-        self._save_history(history)
+        # 4) 히스토리 CSV 저장 (누적). 끝에 덧붙이거나, 직전에 덧붙인 같은 날짜면 그 부분만 교체
+        tail = self._history_tail
+        if append_only and self.history_path.exists():
+            self._append_history(today_rows, history)
+        elif tail and tail[0] == report_date and tail[2] == loaded_mtime:
+            self._append_history(today_rows, history, truncate_at=tail[1])
+        else:
+            self._save_history(history)
 
         # 5) 강도 점수 계산 + strength CSV 저장
-        strength = self._calculate_strength(history, report_date)
+        # 직전 실행 이후 히스토리가 그대로이고, 직전 집계가 그때 히스토리의 최신 날짜 기준이며,
+        # 새 날짜만 붙었으면 직전 집계를 감쇠 후 오늘분만 더함
+        state = self._strength_state
+        if (
+            append_only
+            and state is not None
+            and state[1] == loaded_mtime
+            and state[0] == state[3]
+        ):
+            strength = self._update_strength(state[2], state[0], today_rows, report_date)
+        else:
+            strength = self._calculate_strength(history, report_date)
+        self._strength_state = (
+            report_date,
+            self.history_path.stat().st_mtime_ns,
+            strength,
+            max(latest_date or report_date, report_date),
+        )
         self._save_strength(strength)
 
         # 6) 텔레그램 메시지: 신규 항목만
+        # 분류 결과를 한 번 펼친 today_rows를 그대로 재사용 (중첩 순회/dict.get 반복 없이)
+        total_themes = len(classification.get("kr", {})) + len(classification.get("us", {}))
         telegram_msg = self._build_telegram_message(
-            report_date, classification, yesterday_entries
+            report_date, today_rows, yesterday_entries, total_themes
         )
 
         logger.info(f"CSV exported: {self.history_path}, {self.strength_path}")
@@ -59,21 +120,57 @@ class ReportGenerator:
         if not self.history_path.exists():
             return []
 
+        stat = self.history_path.stat()
+        mtime = stat.st_mtime_ns
+        if self._history_cache and self._history_cache[0] == mtime:
+            # row dict는 읽기만 하므로 리스트만 복사
+            return list(self._history_cache[1])
+
         rows = []
         with open(self.history_path, "r", encoding="utf-8-sig") as f:
             reader = csv.DictReader(f)
             for row in reader:
                 row["mention_count"] = int(row.get("mention_count", 1))
+                # 반복이 많은 컬럼은 문자열 하나를 공유 (사전 인코딩처럼 메모리 절약 + 비교 빠름)
+                for col in _REPEATED_FIELDS:
+                    value = row.get(col)
+                    if value is not None:
+                        row[col] = sys.intern(value)
                 rows.append(row)
-        return rows
+        self._remember_history(mtime, stat.st_size, rows)
+        return list(rows)
 
-    def _get_previous_entries(self, history: list[dict], report_date: str) -> set[tuple]:
-        """report_date 이전 모든 (market, theme, ticker) 조합을 반환."""
+    def _remember_history(self, mtime: int, size: int, rows: list[dict]):
+        """히스토리 mtime 기록. 파일이 HISTORY_CACHE_MAX_BYTES 이하일 때만 row를 메모리에 유지.
+
+        상주 프로세스가 커진 히스토리를 다음 실행까지 들고 있지 않도록 (그때는 매번 다시 파싱).
+        """
+        self._history_mtime = mtime
+        self._history_cache = (mtime, rows) if size <= HISTORY_CACHE_MAX_BYTES else None
+
+    @staticmethod
+    def _partition_history(
+        history: list[dict], report_date: str
+    ) -> tuple[frozenset[tuple], list[dict], str | None]:
+        """
+        히스토리를 한 번 순회해서 반환:
+        - report_date 이전 모든 (market, theme, ticker) 조합
+        - report_date row를 뺀 히스토리
+        - 기존 히스토리의 가장 최근 날짜 (비어 있으면 None)
+        """
         prev = set()
+        kept = []
+        latest_date = None
         for row in history:
-            if row["date"] < report_date:
+            row_date = row["date"]
+            if latest_date is None or row_date > latest_date:
+                latest_date = row_date
+            if row_date < report_date:
                 prev.add((row["market"], row["theme"], row["ticker"]))
-        return prev
+            elif row_date == report_date:
+                continue
+            kept.append(row)
+        return frozenset(prev), kept, latest_date
 
     def _build_today_rows(self, report_date: str, classification: dict) -> list[dict]:
         """오늘 분류 결과를 CSV row 형태로 변환."""
@@ -83,14 +180,16 @@ class ReportGenerator:
 
         for market_code, themes in [("KR", kr), ("US", us)]:
             for theme_name, stocks in themes.items():
+                # 캐시된 히스토리에 남는 row라 로드한 row와 같은 방식으로 intern
+                theme_name = sys.intern(theme_name)
                 for s in stocks:
                     rows.append({
                         "date": report_date,
                         "market": market_code,
-                        "sector": s.get("sector", "other"),
+                        "sector": sys.intern(s.get("sector") or "other"),
                         "theme": theme_name,
-                        "ticker": s.get("ticker", ""),
-                        "stock_name": s.get("name", ""),
+                        "ticker": sys.intern(s.get("ticker") or ""),
+                        "stock_name": sys.intern(s.get("name") or ""),
                         "mention_count": s.get("mention_count", 1),
                         "sentiment": s.get("sentiment", ""),
                         "reason": s.get("reason", ""),
@@ -99,15 +198,34 @@ class ReportGenerator:
 
     def _save_history(self, history: list[dict]):
         """누적 히스토리 CSV 저장."""
-        fieldnames = [
-            "date", "market", "sector", "theme", "ticker", "stock_name",
-            "mention_count", "sentiment", "reason",
-        ]
+        history = sorted(history, key=lambda r: r["date"])
         with open(self.history_path, "w", newline="", encoding="utf-8-sig") as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            for row in sorted(history, key=lambda r: r["date"]):
-                writer.writerow({k: row.get(k, "") for k in fieldnames})
+            writer = csv.writer(f)
+            writer.writerow(HISTORY_FIELDS)
+            writer.writerows(_history_values(row) for row in history)
+        # 파일과 같은 (날짜순) 순서로 캐시
+        stat = self.history_path.stat()
+        self._remember_history(stat.st_mtime_ns, stat.st_size, history)
+        self._history_tail = None
+
+    def _append_history(
+        self, rows: list[dict], history: list[dict], truncate_at: int | None = None
+    ):
+        """새 날짜의 row만 히스토리 CSV 끝에 추가 (전체 재작성 없음).
+
+        truncate_at이 있으면 그 오프셋 이후(직전에 덧붙인 같은 날짜 row)를 먼저 잘라냄.
+        """
+        offset = truncate_at if truncate_at is not None else self.history_path.stat().st_size
+        # 헤더(BOM)는 이미 있으므로 BOM 없는 utf-8로 이어 씀
+        with open(self.history_path, "a", newline="", encoding="utf-8") as f:
+            if truncate_at is not None:
+                f.truncate(truncate_at)
+            csv.writer(f).writerows(_history_values(row) for row in rows)
+        stat = self.history_path.stat()
+        mtime = stat.st_mtime_ns
+        self._remember_history(mtime, stat.st_size, history)
+        if rows:
+            self._history_tail = (rows[0]["date"], offset, mtime)
 
     # ── 강도 점수 계산 ──
 
@@ -121,21 +239,30 @@ class ReportGenerator:
         - 2주 전: ×0.10
         - 1개월 전: ×0.007 (거의 0)
         """
-        ref_date = datetime.strptime(report_date, "%Y-%m-%d")
+        ref_date = date.fromisoformat(report_date)
+        # 날짜 종류는 row 수보다 훨씬 적으므로 날짜별 가중치를 한 번만 계산 (미래 날짜는 None)
+        weights: dict[str, float | None] = {}
 
         # (market, theme, ticker) → 집계 데이터
         agg: dict[tuple, dict] = {}
 
         for row in history:
-            key = (row["market"], row["theme"], row["ticker"])
-            row_date = datetime.strptime(row["date"], "%Y-%m-%d")
-            days_ago = (ref_date - row_date).days
-
-            if days_ago < 0:
+            row_date = row["date"]
+            if row_date not in weights:
+                days_ago = (ref_date - date.fromisoformat(row_date)).days
+                if days_ago < 0:
+                    weights[row_date] = None
+                else:
+                    weights[row_date] = (
+                        DECAY_WEIGHTS[days_ago] if days_ago < DECAY_MAX_DAYS else 0.0
+                    )
+            weight = weights[row_date]
+            if weight is None:
                 continue  # 미래 데이터 무시
 
-            weight = DECAY_FACTOR ** days_ago
-            score = int(row.get("mention_count", 1)) * weight
+            key = (row["market"], row["theme"], row["ticker"])
+            mention_count = int(row.get("mention_count", 1))
+            score = mention_count * weight
 
             if key not in agg:
                 agg[key] = {
@@ -155,32 +282,85 @@ class ReportGenerator:
 
             entry = agg[key]
             entry["strength_score"] += score
-            entry["mention_total"] += int(row.get("mention_count", 1))
-            entry["first_seen"] = min(entry["first_seen"], row["date"])
-            entry["last_seen"] = max(entry["last_seen"], row["date"])
+            entry["mention_total"] += mention_count
+            if row_date < entry["first_seen"]:
+                entry["first_seen"] = row_date
+            if row_date > entry["last_seen"]:
+                entry["last_seen"] = row_date
             entry["days_count"] += 1
 
-            if row["date"] == report_date:
-                entry["last_mention_count"] = int(row.get("mention_count", 1))
+            if row_date == report_date:
+                entry["last_mention_count"] = mention_count
                 entry["last_reason"] = row.get("reason", "")
 
-        # 트렌드 판별
-        results = []
-        for key, entry in agg.items():
+        return self._finish_strength(list(agg.values()), report_date)
+
+    def _update_strength(
+        self,
+        prev: list[dict],
+        prev_date: str,
+        today_rows: list[dict],
+        report_date: str,
+    ) -> list[dict]:
+        """
+        증분 갱신: score(오늘) = score(prev_date) × DECAY^경과일 + 오늘 mention_count.
+
+        히스토리 전체 대신 직전 집계와 오늘 row만 사용 (DECAY_MAX_DAYS 절단 차이는 1e-4 미만).
+        """
+        decay = DECAY_FACTOR ** (
+            date.fromisoformat(report_date) - date.fromisoformat(prev_date)
+        ).days
+
+        agg: dict[tuple, dict] = {}
+        for entry in prev:
+            entry = entry.copy()
+            entry["strength_score"] *= decay
+            entry["last_mention_count"] = 0
+            entry["last_reason"] = ""
+            agg[(entry["market"], entry["theme"], entry["ticker"])] = entry
+
+        for row in today_rows:
+            key = (row["market"], row["theme"], row["ticker"])
+            mention_count = int(row.get("mention_count", 1))
+            entry = agg.get(key)
+            if entry is None:
+                entry = agg[key] = {
+                    "market": row["market"],
+                    "sector": row.get("sector", "other"),
+                    "theme": row["theme"],
+                    "ticker": row["ticker"],
+                    "stock_name": row.get("stock_name", ""),
+                    "strength_score": 0.0,
+                    "mention_total": 0,
+                    "first_seen": report_date,
+                    "last_seen": report_date,
+                    "days_count": 0,
+                    "last_mention_count": 0,
+                    "last_reason": "",
+                }
+            entry["strength_score"] += mention_count
+            entry["mention_total"] += mention_count
+            entry["last_seen"] = report_date
+            entry["days_count"] += 1
+            entry["last_mention_count"] = mention_count
+            entry["last_reason"] = row.get("reason", "")
+
+        return self._finish_strength(list(agg.values()), report_date)
+
+    @staticmethod
+    def _finish_strength(entries: list[dict], report_date: str) -> list[dict]:
+        """트렌드 판별 + 강도 순 정렬. strength_score는 저장할 때 반올림."""
+        for entry in entries:
             if entry["first_seen"] == report_date:
-                trend = "NEW"
+                entry["trend"] = "NEW"
             elif entry["last_seen"] == report_date:
-                trend = "ACTIVE"
+                entry["trend"] = "ACTIVE"
             else:
-                trend = "INACTIVE"
-
-            entry["trend"] = trend
-            entry["strength_score"] = round(entry["strength_score"], 2)
-            results.append(entry)
+                entry["trend"] = "INACTIVE"
 
-        # 강도 순 정렬
-        results.sort(key=lambda x: (-x["strength_score"],))
-        return results
+        # CSV는 전체 순위를 내보내므로 top-K가 아닌 전체 정렬 (reverse=True도 동점 순서 유지)
+        entries.sort(key=itemgetter("strength_score"), reverse=True)
+        return entries
 
     def _save_strength(self, strength: list[dict]):
         """강도 점수 CSV 저장. 매일 재계산."""
@@ -189,40 +369,44 @@ class ReportGenerator:
             "strength_score", "mention_total", "last_mention_count",
             "first_seen", "last_seen", "days_count", "trend", "last_reason",
         ]
+        score_idx = fieldnames.index("strength_score")
+
+        def _values(row: dict) -> list:
+            values = [row.get(k, "") for k in fieldnames]
+            values[score_idx] = round(values[score_idx], 2)
+            return values
+
         with open(self.strength_path, "w", newline="", encoding="utf-8-sig") as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            for row in strength:
-                writer.writerow({k: row.get(k, "") for k in fieldnames})
+            writer = csv.writer(f)
+            writer.writerow(fieldnames)
+            writer.writerows(_values(row) for row in strength)
 
     # ── 텔레그램 메시지 (신규 항목만) ──
 
     def _build_telegram_message(
         self,
         report_date: str,
-        classification: dict,
-        prev_entries: set[tuple],
+        today_rows: list[dict],
+        prev_entries: frozenset[tuple],
+        total_themes: int,
     ) -> str:
-        kr = classification.get("kr", {})
-        us = classification.get("us", {})
-
-        # KR/US 통합 - 신규 항목만 추출
-        new_themes: dict[str, list] = {}   # 완전 새로운 테마
-        added_themes: dict[str, list] = {}  # 기존 테마에 신규 종목
-
-        prev_theme_names = {t for _, t, _ in prev_entries}
-
-        for market_code, themes in [("KR", kr), ("US", us)]:
-            for theme_name, stocks in themes.items():
-                is_new_theme = theme_name not in prev_theme_names
-                for s in stocks:
-                    ticker = s.get("ticker", "")
-                    key = (market_code, theme_name, ticker)
-                    if key not in prev_entries:
-                        target = new_themes if is_new_theme else added_themes
-                        if theme_name not in target:
-                            target[theme_name] = []
-                        target[theme_name].append(s)
+        # KR/US 통합 - 신규 항목만 추출. 항목은 (표시 이름, 이유)
+        new_themes: defaultdict[str, list] = defaultdict(list)   # 완전 새로운 테마
+        added_themes: defaultdict[str, list] = defaultdict(list)  # 기존 테마에 신규 종목
+
+        prev_theme_names = frozenset(t for _, t, _ in prev_entries)
+
+        for row in today_rows:
+            theme_name = row["theme"]
+            ticker = row["ticker"]
+            if (row["market"], theme_name, ticker) in prev_entries:
+                continue
+            target = new_themes if theme_name not in prev_theme_names else added_themes
+            name = row["stock_name"] or ticker or "?"
+            # ticker가 이름과 다르면 괄호로 표시
+            if ticker and ticker != name:
+                name = f"{name} ({ticker})"
+            target[theme_name].append((name, row["reason"]))
 
         lines = [
             f"<b>일일 테마 업데이트</b> - {report_date}",
@@ -235,8 +419,7 @@ class ReportGenerator:
         for theme_name in sorted(new_themes.keys()):
             stocks = new_themes[theme_name]
             lines.append(f"🆕 <b>{theme_name}</b> ({len(stocks)}종목)")
-            for s in stocks[:10]:
-                self._append_stock_line(lines, s)
+            self._append_stock_lines(lines, stocks[:10])
             lines.append("")
             has_content = True
 
@@ -244,8 +427,7 @@ class ReportGenerator:
         for theme_name in sorted(added_themes.keys()):
             stocks = added_themes[theme_name]
             lines.append(f"📈 <b>{theme_name}</b> +{len(stocks)}종목")
-            for s in stocks[:10]:
-                self._append_stock_line(lines, s)
+            self._append_stock_lines(lines, stocks[:10])
             lines.append("")
             has_content = True
 
@@ -254,12 +436,11 @@ class ReportGenerator:
             lines.append("")
 
         # 요약
-        total = sum(len(v) for v in kr.values()) + sum(len(v) for v in us.values())
+        total = len(today_rows)
         new_count = (
             sum(len(v) for v in new_themes.values())
             + sum(len(v) for v in added_themes.values())
         )
-        total_themes = len(kr) + len(us)
         lines.append(
             f"📊 전체 {total}종목 중 <b>신규 {new_count}건</b> | 테마 {total_themes}개"
         )
@@ -267,14 +448,12 @@ class ReportGenerator:
         return "\n".join(lines)
 
     @staticmethod
-    def _append_stock_line(lines: list, s: dict):
-        name = s.get("name", s.get("ticker", "?"))
-        ticker = s.get("ticker", "")
-        reason = s.get("reason", "")
-        # ticker가 이름과 다르면 괄호로 표시
-        ticker_str = f" ({ticker})" if ticker and ticker != name else ""
-        reason_str = f" - {reason}" if reason else ""
-        lines.append(f"  • {name}{ticker_str}{reason_str}")
+    def _append_stock_lines(lines: list, stocks: list[tuple[str, str]]):
+        for name, reason in stocks:
+            if reason:
+                lines.append(f"  • {name} - {reason}")
+            else:
+                lines.append(f"  • {name}")
 
     @staticmethod
     def split_message(text: str, max_len: int = 4096) -> list[str]:
@@ -282,17 +461,22 @@ class ReportGenerator:
         if len(text) <= max_len:
             return [text]
 
+        # 조각마다 문자열을 이어 붙이지 않고 줄 목록 + 누적 길이만 관리 → 조각당 join 1회
         chunks = []
-        current = ""
+        parts: list[str] = []
+        length = 0
         for line in text.split("\n"):
-            if len(current) + len(line) + 1 > max_len:
-                if current:
-                    chunks.append(current)
-                current = line
+            if length + len(line) + 1 > max_len:
+                if length:
+                    chunks.append("\n".join(parts))
+                parts, length = [line], len(line)
+            elif length:
+                parts.append(line)
+                length += len(line) + 1
             else:
-                current = f"{current}\n{line}" if current else line
+                parts, length = [line], len(line)
 
-        if current:
-            chunks.append(current)
+        if length:
+            chunks.append("\n".join(parts))
 
         return chunks
@@ -1,4 +1,6 @@
+import asyncio
 import logging
+import time
 from datetime import datetime
 from zoneinfo import ZoneInfo
 
@@ -10,6 +12,7 @@ from apscheduler.triggers.interval import IntervalTrigger
 
 from config.settings import Settings
 from src.pipeline import Pipeline
+from utils.image_utils import remove_files_older_than
 
 logger = logging.getLogger(__name__)
 
@@ -81,19 +84,13 @@ class TaskScheduler:
 
     async def _cleanup_job(self):
         """Remove images older than 7 days."""
-        import os
-        import time
-
         image_dir = self.settings.image_dir
         if not image_dir.exists():
             return
 
         cutoff = time.time() - (7 * 24 * 3600)
-        removed = 0
-        for f in image_dir.iterdir():
-            if f.is_file() and f.stat().st_mtime < cutoff:
-                f.unlink(missing_ok=True)
-                removed += 1
+        # 디렉터리 순회/삭제 syscall은 이벤트 루프 밖에서
+        removed = await asyncio.to_thread(remove_files_older_than, image_dir, cutoff)
 
         if removed:
             logger.info(f"Cleanup: removed {removed} old images")
@@ -7,15 +7,16 @@ import asyncio
 import logging
 import sys
 from datetime import datetime, timedelta
-from pathlib import Path
 from zoneinfo import ZoneInfo
 
 sys.stdout.reconfigure(encoding="utf-8", errors="replace")
-sys.path.insert(0, str(Path(__file__).parent))
 
 KST = ZoneInfo("Asia/Seoul")
 
-from config.settings import Settings
+# 동시에 분류할 날짜 수
+DATE_CONCURRENCY = 3
+
+from config.settings import get_settings
 from db.database import Database
 from db.migrations import run_migrations
 from db.repository import Repository
@@ -48,7 +49,7 @@ async def main():
     logger.info(f"테스트 시작: {now.strftime('%Y-%m-%d %H:%M KST')}")
 
     # Settings 로드 후 lookback_hours를 60으로 변경
-    settings = Settings()
+    settings = get_settings()
     settings.lookback_hours = 60
     logger.info(f"lookback_hours = {settings.lookback_hours} (금요일 00:00 KST부터)")
 
@@ -57,7 +58,7 @@ async def main():
     settings.db_path.parent.mkdir(parents=True, exist_ok=True)
 
     # DB 초기화
-    db = Database(settings.db_path)
+    db = Database(settings.db_path, settings.db_synchronous)
     await db.initialize()
     await run_migrations(db)
     repo = Repository(db)
@@ -117,32 +118,43 @@ async def main():
             dates.append(d.strftime("%Y-%m-%d"))
         dates.reverse()  # 금→토→일 순서
 
-        all_classification = {"kr": {}, "us": {}}
+        # 날짜별 분류는 서로 독립 → 동시 실행 (Claude RPM은 RateLimiter가 제한)
+        sem = asyncio.Semaphore(DATE_CONCURRENCY)
 
-        for report_date in dates:
+        async def _classify_date(report_date: str) -> dict | None:
             mentions = await repo.get_daily_stock_mentions(report_date)
             if not mentions:
                 print(f"\n  [{report_date}] 종목 언급 없음 - 건너뜀")
-                continue
+                return None
+            async with sem:
+                print(f"\n  [{report_date}] 종목 언급 {len(mentions)}개 → 분류 중...")
+                return await classifier.classify_daily(report_date)
+
+        classifications = await asyncio.gather(*(_classify_date(d) for d in dates))
 
-            print(f"\n  [{report_date}] 종목 언급 {len(mentions)}개 → 분류 중...")
-            classification = await classifier.classify_daily(report_date)
+        # 출력/누적은 날짜순으로
+        all_classification = {"kr": {}, "us": {}}
+        seen: dict[str, dict[str, set[str]]] = {"kr": {}, "us": {}}
+
+        for report_date, classification in zip(dates, classifications):
+            if classification is None:
+                continue
 
             kr_count = sum(len(v) for v in classification.get("kr", {}).values())
             us_count = sum(len(v) for v in classification.get("us", {}).values())
+            print(f"\n  [{report_date}] 분류 결과")
             print(f"    KR: {len(classification.get('kr', {}))}테마 {kr_count}종목")
             print(f"    US: {len(classification.get('us', {}))}테마 {us_count}종목")
 
             # 누적
             for market in ["kr", "us"]:
                 for theme, stocks in classification.get(market, {}).items():
-                    if theme not in all_classification[market]:
-                        all_classification[market][theme] = stocks
-                    else:
-                        existing_tickers = {s["ticker"] for s in all_classification[market][theme]}
-                        for s in stocks:
-                            if s["ticker"] not in existing_tickers:
-                                all_classification[market][theme].append(s)
+                    merged = all_classification[market].setdefault(theme, [])
+                    tickers = seen[market].setdefault(theme, set())
+                    for s in stocks:
+                        if s["ticker"] not in tickers:
+                            tickers.add(s["ticker"])
+                            merged.append(s)
 
         # ── Step 4: 리포트 생성 ──
         logger.info("=" * 60)
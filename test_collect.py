@@ -1,13 +1,15 @@
 """채널 수집 테스트 - 각 채널에서 최근 메시지 5개만 가져와서 확인"""
 import asyncio
-import sys
-sys.path.insert(0, '.')
 
 from telethon import TelegramClient
-from config.settings import Settings
+from config.settings import get_settings
+from utils.yaml_utils import load_yaml
+
+# 동시에 확인할 채널 수 (Telegram FloodWait 방지)
+PROBE_CONCURRENCY = 8
 
 async def main():
-    settings = Settings()
+    settings = get_settings()
     client = TelegramClient(
         str(settings.base_dir / settings.telegram_session_name),
         settings.telegram_api_id,
@@ -15,27 +17,33 @@ async def main():
     )
     await client.start(phone=settings.telegram_phone)
 
-    import yaml
-    with open(settings.base_dir / "config" / "channels.yaml", encoding="utf-8") as f:
-        config = yaml.safe_load(f)
+    config = load_yaml(settings.base_dir / "config" / "channels.yaml")
+
+    sem = asyncio.Semaphore(PROBE_CONCURRENCY)
 
-    for ch in config["channels"]:
+    async def probe_channel(ch: dict) -> list[str]:
+        """채널 하나 확인. 출력이 섞이지 않도록 줄을 모아서 반환."""
         username = ch["username"]
-        print(f"\n{'='*50}")
-        print(f"채널: @{username}")
-        print(f"{'='*50}")
-        try:
-            entity = await client.get_entity(username)
-            print(f"  제목: {getattr(entity, 'title', 'N/A')}")
-            count = 0
-            async for msg in client.iter_messages(entity, limit=5):
-                count += 1
-                text = (msg.text or "")[:80].replace("\n", " ")
-                has_photo = "📷" if msg.photo else ""
-                print(f"  [{count}] {has_photo} {text}")
-            print(f"  -> {count}개 메시지 확인")
-        except Exception as e:
-            print(f"  ❌ 에러: {e}")
+        lines = [f"\n{'='*50}", f"채널: @{username}", f"{'='*50}"]
+        async with sem:
+            try:
+                entity = await client.get_entity(username)
+                lines.append(f"  제목: {getattr(entity, 'title', 'N/A')}")
+                count = 0
+                async for msg in client.iter_messages(entity, limit=5):
+                    count += 1
+                    text = (msg.text or "")[:80].replace("\n", " ")
+                    has_photo = "📷" if msg.photo else ""
+                    lines.append(f"  [{count}] {has_photo} {text}")
+                lines.append(f"  -> {count}개 메시지 확인")
+            except Exception as e:
+                lines.append(f"  ❌ 에러: {e}")
+        return lines
+
+    # 채널별 왕복을 동시에 진행하고 출력은 channels.yaml 순서대로
+    results = await asyncio.gather(*(probe_channel(ch) for ch in config["channels"]))
+    for lines in results:
+        print("\n".join(lines))
 
     await client.disconnect()
     print("\n✅ 테스트 완료!")
@@ -1,17 +1,15 @@
 """이미지 수집 + Claude Vision 분석 테스트"""
 import asyncio
-import sys
-sys.path.insert(0, '.')
 
 from telethon import TelegramClient
 from telethon.tl.types import MessageMediaPhoto
-from config.settings import Settings
-from utils.image_utils import resize_if_needed, image_to_base64
+from config.settings import get_settings
+from utils.image_utils import load_for_vision
+from utils.yaml_utils import load_yaml
 import anthropic
-import yaml
 
 async def main():
-    settings = Settings()
+    settings = get_settings()
     client = TelegramClient(
         str(settings.base_dir / settings.telegram_session_name),
         settings.telegram_api_id,
@@ -19,8 +17,7 @@ async def main():
     )
     await client.start(phone=settings.telegram_phone)
 
-    with open(settings.base_dir / "config" / "channels.yaml", encoding="utf-8") as f:
-        config = yaml.safe_load(f)
+    config = load_yaml(settings.base_dir / "config" / "channels.yaml")
 
     # 첫 번째 채널에서 이미지가 있는 메시지 1개 찾기
     settings.image_dir.mkdir(parents=True, exist_ok=True)
@@ -45,12 +42,13 @@ async def main():
                     await client.download_media(msg, file=str(file_path))
                     print(f"   다운로드: {file_path} ({file_path.stat().st_size / 1024:.0f}KB)")
 
-                    # 리사이즈
-                    file_path = resize_if_needed(file_path, settings.max_image_size_kb)
+                    # 리사이즈 + base64 인코딩 (CPU 작업 → 워커 스레드)
+                    image_data, media_type = await asyncio.to_thread(
+                        load_for_vision, file_path, settings.max_image_size_kb
+                    )
 
                     # Claude Vision 분석
                     print(f"\n🤖 Claude Vision 분석 중...")
-                    image_data, media_type = image_to_base64(file_path)
 
                     claude = anthropic.AsyncAnthropic(api_key=settings.anthropic_api_key)
                     response = await claude.messages.create(
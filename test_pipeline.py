@@ -3,17 +3,15 @@ import asyncio
 import logging
 import sys
 from datetime import datetime
-from pathlib import Path
 from zoneinfo import ZoneInfo
 
 KST = ZoneInfo("Asia/Seoul")
 
 sys.stdout.reconfigure(encoding="utf-8", errors="replace")
 sys.stderr.reconfigure(encoding="utf-8", errors="replace")
-sys.path.insert(0, str(Path(__file__).parent))
 
-from config.settings import Settings
-from db.database import Database
+from config.settings import get_settings
+from db.database import Database, fetch_one
 from db.migrations import run_migrations
 from db.repository import Repository
 from src.analyzer import StockAnalyzer
@@ -35,12 +33,12 @@ logger = logging.getLogger("test_pipeline")
 
 
 async def main():
-    settings = Settings()
+    settings = get_settings()
     settings.image_dir.mkdir(parents=True, exist_ok=True)
     settings.export_dir.mkdir(parents=True, exist_ok=True)
 
     # DB
-    db = Database(settings.db_path)
+    db = Database(settings.db_path, settings.db_synchronous)
     await db.initialize()
     await run_migrations(db)
     repo = Repository(db)
@@ -73,11 +71,11 @@ async def main():
     daily_mentions = await repo.get_daily_stock_mentions(report_date)
     if not daily_mentions:
         conn = await db.get_connection()
-        cur = await conn.execute(
-            "SELECT DISTINCT DATE(m.message_date) as d FROM stock_mentions sm "
-            "JOIN messages m ON sm.message_id = m.id ORDER BY d DESC LIMIT 1"
+        row = await fetch_one(
+            conn,
+            "SELECT DISTINCT m.message_day as d FROM stock_mentions sm "
+            "JOIN messages m ON sm.message_id = m.id ORDER BY d DESC LIMIT 1",
         )
-        row = await cur.fetchone()
         if row:
             report_date = row[0]
             logger.info(f"오늘 데이터 없음 → 최근 날짜 사용: {report_date}")
@@ -6,16 +6,14 @@ import asyncio
 import logging
 import sys
 from datetime import datetime, timedelta
-from pathlib import Path
 from zoneinfo import ZoneInfo
 
 sys.stdout.reconfigure(encoding="utf-8", errors="replace")
-sys.path.insert(0, str(Path(__file__).parent))
 
 KST = ZoneInfo("Asia/Seoul")
 
-from config.settings import Settings
-from db.database import Database
+from config.settings import get_settings
+from db.database import Database, fetch_one
 from db.migrations import run_migrations
 from db.repository import Repository
 from src.analyzer import StockAnalyzer
@@ -48,14 +46,14 @@ async def main():
     logger.info(f"빠른 테스트 시작: {now.strftime('%Y-%m-%d %H:%M KST')}")
     logger.info(f"채널당 메시지 제한: {MSGS_PER_CHANNEL}개")
 
-    settings = Settings()
+    settings = get_settings()
     settings.lookback_hours = 60
 
     settings.image_dir.mkdir(parents=True, exist_ok=True)
     settings.export_dir.mkdir(parents=True, exist_ok=True)
     settings.db_path.parent.mkdir(parents=True, exist_ok=True)
 
-    db = Database(settings.db_path)
+    db = Database(settings.db_path, settings.db_synchronous)
     await db.initialize()
     await run_migrations(db)
     repo = Repository(db)
@@ -66,40 +64,36 @@ async def main():
     registry = StockRegistry(repo)
     await registry.initialize()
 
-    conn = await db.get_connection()
-
     try:
-        # ── 분석/분류 데이터 초기화 ──
-        await conn.execute("UPDATE messages SET is_analyzed = 0")
-        await conn.execute("DELETE FROM stock_mentions")
-        await conn.execute("DELETE FROM daily_stock_themes")
-        await conn.commit()
+        # ── 분석/분류 데이터 초기화 + 채널당 N개만 분석 대상으로 (한 트랜잭션) ──
+        async with db.transaction() as conn:
+            await conn.execute("UPDATE messages SET is_analyzed = 0")
+            await conn.execute("DELETE FROM stock_mentions")
+            await conn.execute("DELETE FROM daily_stock_themes")
+            # 활성 채널별 최신 N개 메시지만 남기고 나머지 is_analyzed=1 (채널 루프 없이 1문장)
+            await conn.execute(
+                """WITH ranked AS (
+                       SELECT m.id, ROW_NUMBER() OVER (
+                           PARTITION BY m.channel_id ORDER BY m.message_date DESC
+                       ) AS rn
+                       FROM messages m
+                       JOIN channels c ON c.id = m.channel_id
+                       WHERE c.is_active = 1
+                   )
+                   UPDATE messages SET is_analyzed = 1
+                   WHERE id IN (SELECT id FROM ranked WHERE rn > ?)""",
+                (MSGS_PER_CHANNEL,),
+            )
+            row = await fetch_one(
+                conn,
+                """SELECT COUNT(*) FROM messages m
+                   JOIN channels c ON c.id = m.channel_id
+                   WHERE c.is_active = 1 AND m.is_analyzed = 0""",
+            )
+            total_target = row[0]
         logger.info("분석/분류 데이터 초기화 완료")
 
-        # ── 채널당 N개만 분석 대상으로 남기고 나머지는 analyzed 처리 ──
         channels = await repo.get_active_channels()
-        total_target = 0
-        for ch in channels:
-            # 채널별 최신 N개 메시지만 남기고 나머지 is_analyzed=1
-            cursor = await conn.execute(
-                """SELECT id FROM messages
-                   WHERE channel_id = ?
-                   ORDER BY message_date DESC
-                   LIMIT ?""",
-                (ch["id"], MSGS_PER_CHANNEL),
-            )
-            keep_ids = [row["id"] for row in await cursor.fetchall()]
-            total_target += len(keep_ids)
-
-            if keep_ids:
-                placeholders = ",".join("?" for _ in keep_ids)
-                await conn.execute(
-                    f"""UPDATE messages SET is_analyzed = 1
-                        WHERE channel_id = ? AND id NOT IN ({placeholders})""",
-                    [ch["id"]] + keep_ids,
-                )
-
-        await conn.commit()
         logger.info(f"분석 대상: {total_target}개 메시지 ({len(channels)}채널 × {MSGS_PER_CHANNEL}개)")
         print(f"\n=== 분석 대상: {total_target}개 메시지 ===")
 
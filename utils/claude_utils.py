@@ -0,0 +1,185 @@
+import asyncio
+import importlib.util
+import logging
+
+import anthropic
+import httpx
+
+from utils.rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+# 429(RateLimitError) 재시도 횟수 / 첫 대기(초, 매 시도마다 2배)
+RATE_LIMIT_RETRIES = 3
+RATE_LIMIT_BASE_DELAY = 2.0
+# Claude HTTP 커넥션 풀 (동시 배치 요청이 TLS 연결을 재사용하도록 keep-alive 여유 있게)
+HTTP_MAX_CONNECTIONS = 64
+HTTP_MAX_KEEPALIVE = 32
+# h2 패키지가 있으면 HTTP/2로 동시 요청을 한 연결에 다중화
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+# Message Batches API: 요청을 모으는 대기 시간 / 처리 상태 폴링 간격 (초)
+BATCH_COLLECT_WINDOW = 2.0
+BATCH_POLL_INTERVAL = 30.0
+# 배치가 이 시간(초) 안에 끝나지 않으면 취소하고 일반 요청으로 대체 (배치 자체 만료는 24시간)
+BATCH_TIMEOUT = 3600.0
+# 이미지 1장당 입력 토큰 추정치 (긴 변 1568px 기준 약 1600토큰)
+IMAGE_TOKEN_ESTIMATE = 1600
+
+
+def cached_system(text: str, ttl: str = "5m") -> list[dict]:
+    """정적 시스템 프롬프트를 prompt caching 블록으로 변환 (ttl: "5m" 또는 "1h")."""
+    return [
+        {
+            "type": "text",
+            "text": text,
+            "cache_control": {"type": "ephemeral", "ttl": ttl},
+        }
+    ]
+
+
+def make_client(api_key: str) -> anthropic.AsyncAnthropic:
+    """커넥션 풀 한도를 지정한 AsyncAnthropic 클라이언트 생성."""
+    http_client = anthropic.DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        ),
+        http2=HTTP2_AVAILABLE,
+    )
+    return anthropic.AsyncAnthropic(api_key=api_key, http_client=http_client)
+
+
+def estimate_input_tokens(messages: list[dict], system: list[dict] | None = None) -> int:
+    """입력 토큰 대략 추정 (텍스트 3자당 1토큰, 이미지는 고정값). TPM 버킷용."""
+    chars = sum(len(b["text"]) for b in system or [])
+    images = 0
+    for m in messages:
+        content = m["content"]
+        if isinstance(content, str):
+            chars += len(content)
+            continue
+        for block in content:
+            if block["type"] == "text":
+                chars += len(block["text"])
+            elif block["type"] == "image":
+                images += 1
+    return chars // 3 + images * IMAGE_TOKEN_ESTIMATE
+
+
+async def create_message(
+    client: anthropic.AsyncAnthropic,
+    rate_limiter: RateLimiter,
+    use_stream: bool = False,
+    **kwargs,
+):
+    """RPM/TPM 버킷을 먼저 통과한 뒤 messages.create 호출.
+
+    use_stream이면 스트리밍으로 받아 완성된 Message 반환 (긴 응답의 HTTP 타임아웃 방지).
+    429가 나면 RATE_LIMIT_RETRIES회까지 지수 백오프로 재시도.
+    """
+    est_tokens = estimate_input_tokens(kwargs["messages"], kwargs.get("system"))
+    for attempt in range(RATE_LIMIT_RETRIES):
+        await rate_limiter.acquire("claude")
+        if rate_limiter.has_bucket("claude_tokens"):
+            await rate_limiter.acquire("claude_tokens", est_tokens)
+        try:
+            if use_stream:
+                async with client.messages.stream(**kwargs) as stream:
+                    return await stream.get_final_message()
+            return await client.messages.create(**kwargs)
+        except anthropic.RateLimitError:
+            if attempt == RATE_LIMIT_RETRIES - 1:
+                raise
+            delay = RATE_LIMIT_BASE_DELAY * (2 ** attempt)
+            logger.warning(
+                f"Claude rate limited (attempt {attempt + 1}/{RATE_LIMIT_RETRIES}), "
+                f"retrying in {delay:.0f}s"
+            )
+            await asyncio.sleep(delay)
+
+
+class MessageBatcher:
+    """동시에 들어온 messages.create 요청을 Message Batches API 한 번으로 제출.
+
+    비용 50% 할인 대신 결과까지 수 분 이상 걸릴 수 있어 지연이 괜찮은 작업(일일 분류 등)용.
+    """
+
+    def __init__(self, client: anthropic.AsyncAnthropic, rate_limiter: RateLimiter):
+        self.client = client
+        # BATCH_TIMEOUT 초과 시 create_message로 대체할 때 사용
+        self.rate_limiter = rate_limiter
+        self._pending: list[tuple[dict, asyncio.Future]] = []
+        self._flush_task: asyncio.Task | None = None
+
+    async def create(self, **params):
+        """messages.create와 같은 인자. 배치 처리가 끝나면 Message 반환."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((params, future))
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_after_window())
+        return await future
+
+    async def _flush_after_window(self):
+        await asyncio.sleep(BATCH_COLLECT_WINDOW)
+        pending, self._pending = self._pending, []
+        self._flush_task = None
+        try:
+            batch = await self.client.messages.batches.create(
+                requests=[
+                    {"custom_id": str(i), "params": params}
+                    for i, (params, _) in enumerate(pending)
+                ]
+            )
+            logger.info(f"Submitted message batch {batch.id} ({len(pending)} requests)")
+            deadline = asyncio.get_running_loop().time() + BATCH_TIMEOUT
+            while batch.processing_status != "ended":
+                if asyncio.get_running_loop().time() >= deadline:
+                    logger.warning(
+                        f"Message batch {batch.id} not done in {BATCH_TIMEOUT:.0f}s, "
+                        f"cancelling and sending {len(pending)} requests directly"
+                    )
+                    try:
+                        await self.client.messages.batches.cancel(batch.id)
+                    except Exception as e:
+                        logger.warning(f"Failed to cancel message batch {batch.id}: {e}")
+                    await asyncio.gather(
+                        *(self._create_directly(params, future) for params, future in pending)
+                    )
+                    return
+                await asyncio.sleep(BATCH_POLL_INTERVAL)
+                batch = await self.client.messages.batches.retrieve(batch.id)
+
+            async for entry in await self.client.messages.batches.results(batch.id):
+                future = pending[int(entry.custom_id)][1]
+                # 호출자가 이미 취소한 future에 set_*하면 InvalidStateError
+                if future.done():
+                    continue
+                if entry.result.type == "succeeded":
+                    future.set_result(entry.result.message)
+                else:
+                    future.set_exception(
+                        RuntimeError(f"Batch request {entry.custom_id} {entry.result.type}")
+                    )
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(RuntimeError("Batch result missing"))
+
+    async def _create_directly(self, params: dict, future: asyncio.Future):
+        """배치 대신 일반 요청으로 처리해 future에 결과 전달."""
+        if future.done():
+            return
+        try:
+            message = await create_message(
+                self.client, self.rate_limiter, use_stream=True, **params
+            )
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+        else:
+            if not future.done():
+                future.set_result(message)
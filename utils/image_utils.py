@@ -1,5 +1,6 @@
 import base64
 import logging
+import os
 from pathlib import Path
 
 from PIL import Image
@@ -8,21 +9,35 @@ logger = logging.getLogger(__name__)
 
 MAX_DIMENSION = 1568  # Claude Vision recommended max
 
+# 확장자 → Vision API media_type
+_MEDIA_TYPES = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+}
+
 
 def resize_if_needed(image_path: Path, max_size_kb: int = 1024) -> Path:
     file_size_kb = image_path.stat().st_size / 1024
     if file_size_kb <= max_size_kb:
         return image_path
 
+    # 이전 실행에서 만든 리사이즈본이 원본보다 새것이면 재사용
+    resized_path = image_path.with_suffix(".resized.jpg")
+    if (
+        resized_path.exists()
+        and resized_path.stat().st_mtime_ns >= image_path.stat().st_mtime_ns
+    ):
+        return resized_path
+
     with Image.open(image_path) as img:
-        ratio = min(MAX_DIMENSION / max(img.size), 1.0)
-        if ratio < 1.0:
-            new_size = (int(img.width * ratio), int(img.height * ratio))
-            img = img.resize(new_size, Image.LANCZOS)
-
-        # Save as JPEG for smaller size
-        resized_path = image_path.with_suffix(".resized.jpg")
-        img.convert("RGB").save(resized_path, "JPEG", quality=85)
+        # 제자리 축소 (MAX_DIMENSION 이하면 그대로). JPEG는 draft로 1/2·1/4·1/8 디코딩 후 리샘플
+        img.thumbnail((MAX_DIMENSION, MAX_DIMENSION), Image.Resampling.LANCZOS)
+
+        # Save as JPEG for smaller size (크기 초과 파일이라 해상도가 작아도 재인코딩)
+        img.convert("RGB").save(resized_path, "JPEG", quality=85, optimize=True)
         logger.debug(
             f"Resized {image_path.name}: {file_size_kb:.0f}KB -> "
             f"{resized_path.stat().st_size / 1024:.0f}KB"
@@ -32,19 +47,35 @@ def resize_if_needed(image_path: Path, max_size_kb: int = 1024) -> Path:
 
 def image_to_base64(image_path: Path) -> tuple[str, str]:
     """Returns (base64_data, media_type)."""
-    suffix = image_path.suffix.lower()
-    media_type_map = {
-        ".jpg": "image/jpeg",
-        ".jpeg": "image/jpeg",
-        ".png": "image/png",
-        ".gif": "image/gif",
-        ".webp": "image/webp",
-    }
-    media_type = media_type_map.get(suffix, "image/jpeg")
-    data = base64.standard_b64encode(image_path.read_bytes()).decode("utf-8")
+    media_type = _MEDIA_TYPES.get(image_path.suffix.lower(), "image/jpeg")
+    data = base64.standard_b64encode(image_path.read_bytes()).decode("ascii")
     return data, media_type
 
 
+def load_for_vision(image_path: Path, max_size_kb: int = 1024) -> tuple[str, str]:
+    """resize_if_needed + image_to_base64. 리사이즈 결과는 .resized.jpg로 재사용됨."""
+    return image_to_base64(resize_if_needed(image_path, max_size_kb))
+
+
 def cleanup_resized(image_dir: Path):
     for f in image_dir.glob("*.resized.jpg"):
         f.unlink(missing_ok=True)
+
+
+def remove_files_older_than(image_dir: Path, cutoff: float) -> int:
+    """mtime이 cutoff(epoch초)보다 오래된 파일 삭제. 삭제한 파일 수 반환.
+
+    scandir의 DirEntry가 디렉터리를 읽을 때 받은 파일 종류를 재사용 (파일마다 Path 객체 생성 없음).
+    """
+    removed = 0
+    with os.scandir(image_dir) as it:
+        for entry in it:
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            if entry.stat(follow_symlinks=False).st_mtime < cutoff:
+                try:
+                    os.unlink(entry.path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+    return removed
@@ -1,62 +1,91 @@
 import asyncio
 import logging
+import time
 from concurrent.futures import ThreadPoolExecutor
 
 from db.repository import Repository
 
 logger = logging.getLogger(__name__)
 
+# yfinance 동시 요청 수 (Yahoo 429 방지)
 _executor = ThreadPoolExecutor(max_workers=2)
+# 조회는 성공했지만 업종이 없던 티커 → 조회 시각 (ETF 등). NO_INDUSTRY_TTL 동안 재조회 생략
+NO_INDUSTRY_TTL = 24 * 60 * 60
+_no_industry: dict[str, float] = {}
+# 이번 프로세스에서 조회에 성공한 티커 → 업종 (업종은 거의 안 바뀜, 업종 없음은 위 TTL로 따로 관리)
+_industry_cache: dict[str, str] = {}
 
 
 def _fetch_yfinance_industry(ticker: str) -> str | None:
-    """yfinance에서 업종(industry) 조회. 동기 함수 (스레드풀에서 실행)."""
-    try:
-        import yfinance as yf
+    """yfinance에서 업종(industry) 조회. 동기 함수 (스레드풀에서 실행).
 
-        info = yf.Ticker(ticker).info
-        return info.get("industry")
-    except Exception as e:
-        logger.debug(f"yfinance lookup failed for {ticker}: {e}")
-        return None
+    429/네트워크 오류 등은 그대로 raise (일시적 실패를 '업종 없음'으로 캐싱하지 않도록).
+    """
+    import yfinance as yf
+
+    info = yf.Ticker(ticker).info
+    return info.get("industry")
 
 
 async def resolve_industries(stocks: list[dict], repo: Repository) -> list[dict]:
     """
     US 종목의 industry를 조회하여 stocks 리스트에 추가.
     - DB에 이미 industry가 있으면 그대로 사용
-    - 없으면 yfinance에서 조회 후 DB에 캐싱
+    - 없으면 yfinance에서 조회 (티커당 1회, 스레드풀 크기만큼 동시) 후 DB에 일괄 캐싱
     - KR 종목은 스킵
     """
-    loop = asyncio.get_event_loop()
-    need_lookup: list[dict] = []
+    loop = asyncio.get_running_loop()
+    # 티커 → 해당 티커의 stock dict들 (같은 티커가 여러 번 와도 조회는 1회)
+    need_lookup: dict[str, list[dict]] = {}
+    updates: dict[int, str] = {}
 
     for s in stocks:
         if s.get("industry"):
             continue
         if s.get("market") != "US":
             continue
-        need_lookup.append(s)
+        cached = _industry_cache.get(s["ticker"])
+        if cached:
+            s["industry"] = cached
+            updates[s["stock_id"]] = cached
+            continue
+        failed_at = _no_industry.get(s["ticker"])
+        if failed_at is not None and time.monotonic() - failed_at < NO_INDUSTRY_TTL:
+            continue
+        need_lookup.setdefault(s["ticker"], []).append(s)
 
     if not need_lookup:
+        if updates:
+            await repo.update_stock_industries(updates)
         return stocks
 
     logger.info(f"yfinance 업종 조회: {len(need_lookup)}개 US 종목")
 
-    for s in need_lookup:
-        ticker = s["ticker"]
-        try:
-            industry = await loop.run_in_executor(
-                _executor, _fetch_yfinance_industry, ticker
-            )
-            if industry:
-                s["industry"] = industry
-                await repo.update_stock_industry(s["stock_id"], industry)
-                logger.debug(f"{ticker} → {industry}")
-        except Exception as e:
-            logger.debug(f"Industry resolve failed for {ticker}: {e}")
-
-    resolved = sum(1 for s in need_lookup if s.get("industry"))
-    logger.info(f"yfinance 업종 조회 완료: {resolved}/{len(need_lookup)}개 성공")
+    tickers = list(need_lookup)
+    results = await asyncio.gather(
+        *(loop.run_in_executor(_executor, _fetch_yfinance_industry, t) for t in tickers),
+        return_exceptions=True,
+    )
+
+    for ticker, industry in zip(tickers, results):
+        if isinstance(industry, BaseException):
+            # 일시적 실패일 수 있으므로 negative 캐시하지 않고 다음 실행에서 재조회
+            logger.debug(f"yfinance lookup failed for {ticker}: {industry}")
+            continue
+        if not industry:
+            # 정상 응답인데 업종이 없음 (ETF 등)
+            _no_industry[ticker] = time.monotonic()
+            continue
+        _industry_cache[ticker] = industry
+        for s in need_lookup[ticker]:
+            s["industry"] = industry
+            updates[s["stock_id"]] = industry
+        logger.debug(f"{ticker} → {industry}")
+
+    if updates:
+        await repo.update_stock_industries(updates)
+
+    resolved = sum(1 for t in tickers if need_lookup[t][0].get("industry"))
+    logger.info(f"yfinance 업종 조회 완료: {resolved}/{len(tickers)}개 성공")
 
     return stocks
@@ -0,0 +1,38 @@
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+
+LOG_FORMAT = "%(asctime)s [%(name)s] %(levelname)s: %(message)s"
+LOG_MAX_BYTES = 10 * 1024 * 1024  # 10MB
+
+
+def setup_queued_logging(
+    log_path: Path,
+    noisy_loggers: tuple[str, ...] = ("telethon", "httpx"),
+) -> None:
+    """
+    콘솔 + 파일 로깅 설정. 실제 write/flush는 QueueListener 스레드에서 처리하여
+    이벤트 루프가 로그 I/O로 멈추지 않도록 함.
+    """
+    formatter = logging.Formatter(LOG_FORMAT)
+    stream_handler = logging.StreamHandler()
+    file_handler = RotatingFileHandler(
+        log_path, maxBytes=LOG_MAX_BYTES, backupCount=3,
+        encoding="utf-8", delay=True,
+    )
+    stream_handler.setFormatter(formatter)
+    file_handler.setFormatter(formatter)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, stream_handler, file_handler)
+    listener.start()
+    atexit.register(listener.stop)
+
+    queue_handler = QueueHandler(log_queue)
+    # 최종 포맷은 listener 쪽 핸들러가 담당 (여기선 메시지만 확정)
+    queue_handler.setFormatter(logging.Formatter("%(message)s"))
+    logging.basicConfig(level=logging.INFO, handlers=[queue_handler])
+    for name in noisy_loggers:
+        logging.getLogger(name).setLevel(logging.WARNING)
@@ -22,6 +22,14 @@ class TokenBucket:
             return True
         return False
 
+    def acquire_or_wait(self, n: int = 1) -> float:
+        """n개를 꺼낼 수 있으면 꺼내고 0.0, 아니면 기다릴 시간(초). monotonic() 1회."""
+        self._refill()
+        if self.tokens >= n:
+            self.tokens -= n
+            return 0.0
+        return (n - self.tokens) / self.rate
+
     def time_until_available(self, n: int = 1) -> float:
         self._refill()
         if self.tokens >= n:
@@ -33,13 +41,26 @@ class TokenBucket:
 class RateLimiter:
     def __init__(self):
         self._buckets: dict[str, TokenBucket] = {}
+        # 버킷별 대기열: 토큰이 모자랄 때 맨 앞 태스크만 잠들고 나머지는 락에서 순서대로 대기
+        self._waiters: dict[str, asyncio.Lock] = {}
 
     def add_bucket(self, name: str, rate: float, capacity: int):
         """rate: tokens/second, capacity: max burst size."""
         self._buckets[name] = TokenBucket(rate, capacity)
+        self._waiters[name] = asyncio.Lock()
+
+    def has_bucket(self, name: str) -> bool:
+        return name in self._buckets
 
     async def acquire(self, bucket_name: str, tokens: int = 1):
         bucket = self._buckets[bucket_name]
-        while not bucket.consume(tokens):
-            wait_time = bucket.time_until_available(tokens)
-            await asyncio.sleep(wait_time)
+        # capacity보다 큰 요청은 영원히 통과 못 하므로 capacity로 제한
+        tokens = min(tokens, bucket.capacity)
+        waiters = self._waiters[bucket_name]
+        # 대기 중인 태스크가 없고 토큰이 있으면 바로 통과
+        if not waiters.locked() and bucket.acquire_or_wait(tokens) == 0:
+            return
+        # K개 태스크가 같은 시간만큼 자고 동시에 깨어나 한 개만 통과하는 일이 없도록 FIFO로
+        async with waiters:
+            while (wait_time := bucket.acquire_or_wait(tokens)) > 0:
+                await asyncio.sleep(wait_time)
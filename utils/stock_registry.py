@@ -14,12 +14,28 @@ from utils.text_utils import (
 
 logger = logging.getLogger(__name__)
 
+# 한국 종목명 퍼지 매칭 최소 점수 (fuzz.ratio)
+FUZZY_SCORE_CUTOFF = 80
+
+
+def _ci_key(name: str) -> str:
+    return name.replace(" ", "").lower()
+
 
 class StockRegistry:
     def __init__(self, repo: Repository):
         self.repo = repo
         self._kr_name_to_ticker: dict[str, str] = {}
         self._kr_ticker_to_name: dict[str, str] = {}
+        # 퍼지 매칭 후보 (호출마다 dict keys 뷰를 넘기지 않도록 initialize에서 고정)
+        self._kr_names: tuple[str, ...] = ()
+        # 그중 ASCII 문자(영문/숫자 등)가 하나라도 들어간 종목명 (영문 입력의 퍼지 후보)
+        self._kr_ascii_names: tuple[str, ...] = ()
+        # 공백 제거 + 소문자 키 → 정식 종목명 ("sk 하이닉스" → "SK하이닉스")
+        self._kr_name_ci: dict[str, str] = {}
+        # 시장별 티커 집합 (거래소 판별용, initialize에서 한 번만 로드)
+        self._kospi_set: set[str] = set()
+        self._kosdaq_set: set[str] = set()
         self._initialized = False
 
     async def initialize(self):
@@ -33,16 +49,27 @@ class StockRegistry:
 
             try:
                 from pykrx import stock as pykrx_stock
+                from pykrx.website import krx
 
-                for market_name in ["KOSPI", "KOSDAQ"]:
-                    tickers = pykrx_stock.get_market_ticker_list(market=market_name)
-                    for ticker in tickers:
-                        name = pykrx_stock.get_market_ticker_name(ticker)
+                # get_market_ticker_list가 내부에서 받는 티커→종목명 시리즈를 직접 사용
+                # (티커마다 get_market_ticker_name을 부르지 않고 시장별 요청 1회)
+                date = pykrx_stock.get_nearest_business_day_in_a_week()
+                for market_name, ticker_set in [
+                    ("KOSPI", self._kospi_set), ("KOSDAQ", self._kosdaq_set)
+                ]:
+                    names = krx.get_market_ticker_and_name(date, market_name)
+                    ticker_set.update(names.index)
+                    for ticker, name in names.items():
                         self._kr_name_to_ticker[name] = ticker
                         self._kr_ticker_to_name[ticker] = name
             finally:
                 root_logger.setLevel(prev_level)
 
+            self._kr_names = tuple(self._kr_name_to_ticker)
+            self._kr_ascii_names = tuple(
+                n for n in self._kr_names if any(map(str.isascii, n))
+            )
+            self._kr_name_ci = {_ci_key(n): n for n in self._kr_names}
             logger.info(
                 f"Loaded {len(self._kr_name_to_ticker)} Korean stocks from pykrx"
             )
@@ -61,12 +88,82 @@ class StockRegistry:
         if not name:
             return None
 
+        match = self._match(name, market_hint)
+        if match:
+            return await self.repo.get_or_create_stock(**match)
+        return await self._resolve_unmatched(name, market_hint)
+
+    async def resolve_many(
+        self, pairs: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], Optional[int]]:
+        """resolve_stock의 배치 버전. (종목명, 시장) → stock ID (해석 불가면 None).
+
+        메모리 매칭된 종목은 get_or_create_stocks 한 번으로 upsert.
+        정확 매칭이 안 된 한국 종목명은 모아서 퍼지 매칭 1회.
+        """
+        result: dict[tuple[str, str], Optional[int]] = {}
+        matches: dict[tuple[str, str], dict] = {}
+        unmatched: list[tuple[tuple[str, str], str]] = []
+        fuzzy_pending: list[tuple[tuple[str, str], str]] = []
+        for pair in pairs:
+            raw_name, market_hint = pair
+            name = normalize_stock_name(raw_name)
+            if not name:
+                result[pair] = None
+                continue
+            if market_hint == "KR":
+                match = self._match_kr(name, fuzzy=False)
+                if not match:
+                    fuzzy_pending.append((pair, name))
+                    continue
+            else:
+                match = self._match_us(name)
+            if match:
+                matches[pair] = match
+            else:
+                unmatched.append((pair, name))
+
+        if fuzzy_pending:
+            matched_names = self._fuzzy_match_kr(
+                [resolve_kr_alias(name) or name for _, name in fuzzy_pending]
+            )
+            for (pair, name), matched_name in zip(fuzzy_pending, matched_names):
+                if matched_name:
+                    matches[pair] = self._kr_stock(
+                        self._kr_name_to_ticker[matched_name], matched_name
+                    )
+                else:
+                    unmatched.append((pair, name))
+
+        if matches:
+            ids = await self.repo.get_or_create_stocks(list(matches.values()))
+            for pair, match in matches.items():
+                result[pair] = ids[(match["ticker"], match["market"])]
+        for pair, name in unmatched:
+            result[pair] = await self._resolve_unmatched(name, pair[1])
+        return result
+
+    def _match(self, name: str, market_hint: str) -> Optional[dict]:
+        """메모리 사전만으로 종목 식별. get_or_create_stock 인자 dict 또는 None."""
+        if market_hint == "KR":
+            return self._match_kr(name)
+        return self._match_us(name)
+
+    async def _resolve_unmatched(self, name: str, market_hint: str) -> Optional[int]:
+        """사전에 없는 종목: 미국은 DB 검색, 한국은 해석 불가."""
         if market_hint == "KR":
-            return await self._resolve_kr(name)
-        else:
-            return await self._resolve_us(name)
+            logger.debug(f"Could not resolve KR stock: '{name}'")
+            return None
+
+        results = await self.repo.search_stock(name)
+        us_results = [r for r in results if r["market"] == "US"]
+        if us_results:
+            return us_results[0]["id"]
+
+        logger.debug(f"Could not resolve US stock: '{name}'")
+        return None
 
-    async def _resolve_kr(self, name: str) -> Optional[int]:
+    def _match_kr(self, name: str, fuzzy: bool = True) -> Optional[dict]:
         # 1) 약어 사전
         alias_resolved = resolve_kr_alias(name)
         if alias_resolved:
@@ -75,82 +172,111 @@ class StockRegistry:
         # 2) pykrx 정확 매칭
         ticker = self._kr_name_to_ticker.get(name)
         if ticker:
-            exchange = self._determine_kr_exchange(ticker)
-            return await self.repo.get_or_create_stock(
-                ticker=ticker, name_ko=name, name_en=None,
-                market="KR", exchange=exchange,
-            )
+            return self._kr_stock(ticker, name)
 
         # 3) 티커 직접 입력 (6자리 숫자)
         if name.isdigit() and len(name) == 6:
             stock_name = self._kr_ticker_to_name.get(name)
             if stock_name:
-                exchange = self._determine_kr_exchange(name)
-                return await self.repo.get_or_create_stock(
-                    ticker=name, name_ko=stock_name, name_en=None,
-                    market="KR", exchange=exchange,
-                )
-
-        # 4) 퍼지 매칭 (80% 이상)
-        if self._kr_name_to_ticker:
+                return self._kr_stock(name, stock_name)
+
+        # 4) 대소문자/공백만 다른 이름 (퍼지 매칭 전에 dict 조회로)
+        canonical = self._kr_name_ci.get(_ci_key(name))
+        if canonical:
+            return self._kr_stock(self._kr_name_to_ticker[canonical], canonical)
+
+        # 5) 퍼지 매칭 (80% 이상)
+        if fuzzy:
+            matched_name = self._fuzzy_match_kr([name])[0]
+            if matched_name:
+                return self._kr_stock(self._kr_name_to_ticker[matched_name], matched_name)
+
+        return None
+
+    def _fuzzy_match_kr(self, names: list[str]) -> list[Optional[str]]:
+        """이름별 가장 비슷한 pykrx 종목명 (FUZZY_SCORE_CUTOFF 미만이면 None).
+
+        ASCII로만 된 이름은 ASCII 문자가 들어간 종목명과만 비교
+        (한글뿐인 종목명과는 공통 문자가 없어 점수가 0이라 결과는 같음).
+        """
+        best: list[Optional[tuple[str, float]]] = [None] * len(names)
+        ascii_idx: list[int] = []
+        other_idx: list[int] = []
+        for i, name in enumerate(names):
+            (ascii_idx if name.isascii() else other_idx).append(i)
+
+        for idx, choices in ((ascii_idx, self._kr_ascii_names), (other_idx, self._kr_names)):
+            if idx and choices:
+                matches = self._fuzzy_best([names[i] for i in idx], choices)
+                for i, match in zip(idx, matches):
+                    best[i] = match
+
+        result: list[Optional[str]] = []
+        for name, match in zip(names, best):
+            if match is None:
+                result.append(None)
+                continue
+            logger.debug(f"Fuzzy matched: '{name}' -> '{match[0]}' ({match[1]:.0f}%)")
+            result.append(match[0])
+        return result
+
+    @staticmethod
+    def _fuzzy_best(
+        names: list[str], choices: tuple[str, ...]
+    ) -> list[Optional[tuple[str, float]]]:
+        """이름별 (최고 점수 후보, 점수). 여러 개면 cdist 한 번으로 전체 점수 행렬을 계산 (C++ 쪽에서 멀티스레드)."""
+        if len(names) == 1:
             match = process.extractOne(
-                name,
-                self._kr_name_to_ticker.keys(),
+                names[0],
+                choices,
                 scorer=fuzz.ratio,
-                score_cutoff=80,
+                processor=None,
+                score_cutoff=FUZZY_SCORE_CUTOFF,
             )
-            if match:
-                matched_name = match[0]
-                ticker = self._kr_name_to_ticker[matched_name]
-                exchange = self._determine_kr_exchange(ticker)
-                logger.debug(f"Fuzzy matched: '{name}' -> '{matched_name}' ({match[1]:.0f}%)")
-                return await self.repo.get_or_create_stock(
-                    ticker=ticker, name_ko=matched_name, name_en=None,
-                    market="KR", exchange=exchange,
-                )
-
-        logger.debug(f"Could not resolve KR stock: '{name}'")
-        return None
+            return [(match[0], match[1]) if match else None]
+
+        scores = process.cdist(
+            names,
+            choices,
+            scorer=fuzz.ratio,
+            processor=None,
+            score_cutoff=FUZZY_SCORE_CUTOFF,
+            workers=-1,
+        )
+        best = []
+        for row, idx in zip(scores, scores.argmax(axis=1)):
+            score = row[idx]
+            best.append((choices[idx], score) if score else None)
+        return best
 
-    async def _resolve_us(self, name: str) -> Optional[int]:
+    def _kr_stock(self, ticker: str, name_ko: str) -> dict:
+        return {
+            "ticker": ticker, "name_ko": name_ko, "name_en": None,
+            "market": "KR", "exchange": self._determine_kr_exchange(ticker),
+        }
+
+    def _match_us(self, name: str) -> Optional[dict]:
         # 1) 한글 약어 → 티커
         ticker = resolve_us_ko_alias(name)
         if ticker:
-            return await self.repo.get_or_create_stock(
-                ticker=ticker, name_ko=name, name_en=None,
-                market="US", exchange=None,
-            )
+            return {
+                "ticker": ticker, "name_ko": name, "name_en": None,
+                "market": "US", "exchange": None,
+            }
 
         # 2) 이미 영문 티커인 경우
         if name.isupper() and 1 <= len(name) <= 5 and name.isalpha():
-            return await self.repo.get_or_create_stock(
-                ticker=name, name_ko=None, name_en=None,
-                market="US", exchange=None,
-            )
+            return {
+                "ticker": name, "name_ko": None, "name_en": None,
+                "market": "US", "exchange": None,
+            }
 
-        # 3) DB에서 검색
-        results = await self.repo.search_stock(name)
-        us_results = [r for r in results if r["market"] == "US"]
-        if us_results:
-            return us_results[0]["id"]
-
-        logger.debug(f"Could not resolve US stock: '{name}'")
+        # 3) DB 검색은 _resolve_unmatched에서
         return None
 
     def _determine_kr_exchange(self, ticker: str) -> str:
-        try:
-            from pykrx import stock as pykrx_stock
-
-            root_logger = logging.getLogger()
-            prev_level = root_logger.level
-            root_logger.setLevel(logging.CRITICAL)
-            try:
-                kospi = pykrx_stock.get_market_ticker_list(market="KOSPI")
-            finally:
-                root_logger.setLevel(prev_level)
-
-            if ticker in kospi:
-                return "KOSPI"
+        if ticker in self._kospi_set:
+            return "KOSPI"
+        if ticker in self._kosdaq_set:
             return "KOSDAQ"
-        except Exception:
-            return "UNKNOWN"
+        return "UNKNOWN"
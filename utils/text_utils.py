@@ -1,5 +1,19 @@
 import re
 
+# 호출마다 패턴 캐시 조회/noise set 생성을 하지 않도록 모듈 로드 시 한 번만 준비
+_WS_RE = re.compile(r"\s+")
+_PAREN_RE = re.compile(r"\(.*?\)")
+# $NVDA 패턴 | 단독 대문자 단어 (2자 이상) - 한 번의 스캔으로
+_TICKER_RE = re.compile(r"\$([A-Z]{1,5})\b|\b([A-Z]{2,5})\b")
+
+# 티커처럼 보이지만 일반 약어인 단어
+_NOISE = frozenset({
+    "THE", "AND", "FOR", "BUT", "NOT", "ARE", "WAS", "HAS", "HAD",
+    "HBM", "AI", "ETF", "IPO", "CEO", "CFO", "GDP", "CPI", "PPI",
+    "FOMC", "FED", "SEC", "USD", "KRW", "JPY", "EUR", "API", "EPS",
+    "PER", "PBR", "ROE", "ROA", "BPS", "SMA", "RSI", "MACD",
+})
+
 # 한국 종목 약어/별명 → 정식명
 KR_ALIASES: dict[str, str] = {
     "삼전": "삼성전자",
@@ -68,10 +82,7 @@ US_KO_ALIASES: dict[str, str] = {
 
 def normalize_stock_name(raw: str) -> str:
     """기본 정규화: 공백 정리, 괄호 내용 제거."""
-    raw = raw.strip()
-    raw = re.sub(r"\s+", " ", raw)
-    raw = re.sub(r"\(.*?\)", "", raw).strip()
-    return raw
+    return _PAREN_RE.sub("", _WS_RE.sub(" ", raw.strip())).strip()
 
 
 def resolve_kr_alias(name: str) -> str | None:
@@ -86,21 +97,19 @@ def resolve_us_ko_alias(name: str) -> str | None:
 
 def is_likely_us_ticker(text: str) -> bool:
     """대문자 1~5자 영문 → 미국 티커일 가능성."""
-    return bool(re.match(r"^[A-Z]{1,5}$", text))
+    # 정규식 대신 C로 구현된 str 메서드로 (싼 검사부터 short-circuit)
+    return 1 <= len(text) <= 5 and text.isascii() and text.isalpha() and text.isupper()
 
 
 def extract_potential_tickers(text: str) -> list[str]:
     """텍스트에서 미국 티커 후보 추출 ($NVDA 또는 단독 대문자)."""
-    # $NVDA 패턴
-    dollar_tickers = re.findall(r"\$([A-Z]{1,5})\b", text)
-    # 단독 대문자 단어 (2자 이상)
-    standalone = re.findall(r"\b([A-Z]{2,5})\b", text)
-    # 일반적인 영단어 제외
-    noise = {
-        "THE", "AND", "FOR", "BUT", "NOT", "ARE", "WAS", "HAS", "HAD",
-        "HBM", "AI", "ETF", "IPO", "CEO", "CFO", "GDP", "CPI", "PPI",
-        "FOMC", "FED", "SEC", "USD", "KRW", "JPY", "EUR", "API", "EPS",
-        "PER", "PBR", "ROE", "ROA", "BPS", "SMA", "RSI", "MACD",
-    }
-    standalone = [t for t in standalone if t not in noise]
-    return list(dict.fromkeys(dollar_tickers + standalone))  # dedupe, preserve order
+    dollar_tickers: dict[str, None] = {}
+    standalone: dict[str, None] = {}
+    for dollar, word in _TICKER_RE.findall(text):
+        if dollar:
+            dollar_tickers[dollar] = None
+        elif word not in _NOISE:  # 일반적인 영단어 제외 ($가 붙은 건 그대로)
+            standalone[word] = None
+    # $티커 먼저, 그 뒤 단독 티커 (dedupe, preserve order)
+    dollar_tickers.update(standalone)
+    return list(dollar_tickers)
@@ -0,0 +1,42 @@
+import copy
+from pathlib import Path
+
+import yaml
+
+# libyaml(C) 바인딩이 있으면 사용 (순수 Python 파서 대비 수 배 빠름)
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+YAML_DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+# 경로 → ((st_mtime_ns, st_size), 파싱 결과). 파일이 바뀌지 않았으면 다시 파싱하지 않음
+_yaml_cache: dict[Path, tuple[tuple[int, int], dict]] = {}
+
+
+def _file_key(path: Path) -> tuple[int, int]:
+    # float mtime은 해상도가 낮아 같은 틱 안의 수정을 놓칠 수 있으므로 ns + 크기로 비교
+    st = path.stat()
+    return st.st_mtime_ns, st.st_size
+
+
+def load_yaml(path: Path) -> dict:
+    """YAML 파일 로드. 파일이 그대로면 다시 파싱하지 않음.
+
+    캐시와 공유하지 않는 사본을 반환하므로 호출자가 자유롭게 수정해도 됨.
+    파일이 없으면 FileNotFoundError.
+    """
+    key = _file_key(path)
+    cached = _yaml_cache.get(path)
+    if cached and cached[0] == key:
+        return copy.deepcopy(cached[1])
+    with open(path, encoding="utf-8") as f:
+        data = yaml.load(f, Loader=YAML_LOADER) or {}
+    _yaml_cache[path] = (key, data)
+    return copy.deepcopy(data)
+
+
+def save_yaml(path: Path, data: dict):
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.dump(
+            data, f, Dumper=YAML_DUMPER,
+            allow_unicode=True, default_flow_style=False,
+        )
+    _yaml_cache[path] = (_file_key(path), copy.deepcopy(data))